@@ -0,0 +1,167 @@
+"""
+Micro-benchmark for Socket_Singleton's lock backends.
+
+Races N contender processes for the same lock and reports, per backend:
+- acquisition latency of a single attempt to become the host under contention
+- winners per round (must always be exactly 1)
+- handover throughput: every contender polls until it has held the lock once
+- exclusivity violations seen during the handover phase (must be 0)
+
+Usage:
+    python benchmark_locks.py [--contenders 100] [--rounds 20] [--backends port,file,abstract]
+"""
+
+import argparse
+import os
+import socket
+import tempfile
+from multiprocessing import Barrier, Process, Queue, Value
+from statistics import median
+from time import perf_counter, sleep
+
+from src.Socket_Singleton import (
+    AbstractSocketLock,
+    FileLock,
+    MultipleSingletonsError,
+    Socket_Singleton,
+)
+
+
+class Contender:
+    """
+    A contender's claim on the singleton: holding it means being the host. Goes through
+    Socket_Singleton itself, so every backend is measured the way the library uses it.
+    """
+
+    def __init__(self, lock, port):
+        self.lock = lock
+        self.port = port
+        self._app = None
+
+    def acquire(self):
+        try:
+            self._app = Socket_Singleton(port=self.port, lock=self.lock, client=False, strict=False)
+        except MultipleSingletonsError:
+            return False
+        return True
+
+    def release(self):
+        if self._app is not None:
+            self._app.release()
+            self._app = None
+
+
+def make_lock(backend, key):
+    """Backend for Socket_Singleton's lock parameter (None: the bound port is the lock)."""
+    if backend == "port":
+        return None
+    if backend == "file":
+        return FileLock(os.path.join(tempfile.gettempdir(), f"{key}.lock"))
+    return AbstractSocketLock(key)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def contender(backend, key, port, rounds, barrier, results, inside, violations):
+    lock = Contender(make_lock(backend, key), port)
+
+    # Phase 1: everyone tries once, at the same moment
+    for round_ in range(rounds):
+        barrier.wait()
+        start = perf_counter()
+        acquired = lock.acquire()
+        results.put((round_, acquired, perf_counter() - start))
+        barrier.wait()
+        if acquired:
+            lock.release()
+
+    # Phase 2: everyone polls until it has held the lock once
+    barrier.wait()
+    while not lock.acquire():
+        sleep(0.0005)
+    with inside.get_lock():
+        if inside.value:
+            with violations.get_lock():
+                violations.value += 1
+        inside.value += 1
+    sleep(0)
+    with inside.get_lock():
+        inside.value -= 1
+    lock.release()
+    barrier.wait()
+
+
+def run(backend, contenders, rounds):
+    key = f"socket_singleton-bench-{os.getpid()}-{backend}"
+    port = free_port()
+    make_lock(backend, key)  # Raises ValueError if unsupported here
+    barrier = Barrier(contenders + 1)
+    results = Queue()
+    inside, violations = Value("i", 0), Value("i", 0)
+    processes = [
+        Process(
+            target=contender,
+            args=(backend, key, port, rounds, barrier, results, inside, violations),
+        )
+        for _ in range(contenders)
+    ]
+    for process in processes:
+        process.start()
+
+    for _ in range(rounds):
+        barrier.wait()
+        barrier.wait()
+    barrier.wait()
+    start = perf_counter()
+    barrier.wait()
+    handover = perf_counter() - start
+
+    samples = [results.get() for _ in range(contenders * rounds)]
+    for process in processes:
+        process.join()
+    if backend == "file":
+        os.remove(os.path.join(tempfile.gettempdir(), f"{key}.lock"))
+
+    winners = [0] * rounds
+    for round_, acquired, _ in samples:
+        winners[round_] += acquired
+    latencies = sorted(latency for _, _, latency in samples)
+    return {
+        "median_us": median(latencies) * 1e6,
+        "p99_us": latencies[int(len(latencies) * 0.99) - 1] * 1e6,
+        "winners": (min(winners), max(winners)),
+        "handovers_per_s": contenders / handover,
+        "violations": violations.value,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--contenders", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--backends", default="port,file,abstract")
+    options = parser.parse_args()
+
+    print(
+        f"{'backend':<10}{'median us':>12}{'p99 us':>12}{'winners':>10}"
+        f"{'handovers/s':>14}{'violations':>12}"
+    )
+    for backend in options.backends.split(","):
+        try:
+            result = run(backend, options.contenders, options.rounds)
+        except ValueError as err:
+            print(f"{backend:<10}skipped: {err}")
+            continue
+        low, high = result["winners"]
+        print(
+            f"{backend:<10}{result['median_us']:>12.1f}{result['p99_us']:>12.1f}"
+            f"{f'{low}-{high}':>10}{result['handovers_per_s']:>14.0f}{result['violations']:>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -10,9 +10,9 @@ with open(readme_path, encoding="utf-8") as readme:
 
 setup(
     name="Socket_Singleton",
-    version="2.0.0",
+    version="3.0.0",
     description="Allow a single instance of a Python application to run at once",
-    py_modules=["Socket_Singleton"],
+    py_modules=["Socket_Singleton", "Socket_Singleton_client"],
     package_dir={"": "src"},
     license="MIT",
     classifiers=[
@@ -1,10 +1,170 @@
+import abc
+import atexit
 import errno
+import hmac
+import json
+import logging
+import mmap
+import os
+import selectors
+import socket as _socket
+import stat
+import struct
+import sys
+import tempfile
+import time
+import weakref
+import zlib
+from array import array
+from collections import Counter, OrderedDict, deque
+from collections.abc import Sequence
+from heapq import heapify, heappop, heappush
+from itertools import count
+from logging.handlers import QueueHandler, QueueListener
+from queue import Empty, SimpleQueue
 from socket import socket
-from sys import argv
-from threading import Thread, Timer
+from sys import argv, platform
+from threading import Condition, Event, Lock, RLock, Thread, current_thread
+from time import monotonic, sleep
+from types import MethodType, ModuleType
+from urllib.parse import quote
+
+try:
+    import fcntl
+except ImportError:  # Windows - spool appends are not serialized between processes
+    fcntl = None
+
+try:
+    from lz4 import frame as lz4_frame
+except ImportError:  # lz4 is optional - zlib compression is always available
+    lz4_frame = None
 
 _WSAEADDRINUSE = 10048
 
+# Handoff control protocol (see Socket_Singleton.handoff):
+_HANDOFF_REQUEST = b"SS-HANDOFF\x00"
+_HANDOFF_ACK = b"\x06"
+_LENGTH = struct.Struct("!I")
+# Pending argument set: sequence number, queue priority, is-a-Message, encoded length
+_HANDOFF_ENTRY = struct.Struct("!QBBI")
+
+# Framed protocol. Legacy clients send NUL-joined UTF-8, which can never contain a 0xFF
+# byte, so a leading 0xFF selects framing. Header: marker, frame kind, flags, payload length.
+_FRAME = struct.Struct("!BBHI")
+_FRAME_MARKER = 0xFF
+_FRAME_SHM_REQUEST = 1
+_FRAME_SHM_GRANT = 2
+_FRAME_REJECT = 3
+_FRAME_DOORBELL = 4
+_FRAME_HELLO = 5
+_FRAME_WELCOME = 6
+_FRAME_ARGS = 7
+_FRAME_ACK = 8
+_FRAME_MESSAGE = 9
+_FRAME_REPLY = 10
+_FRAME_SUBSCRIBE = 11
+_FRAME_PUBLISH = 12
+# Broker protocol (see SingletonBroker)
+_FRAME_CLAIM = 13
+_FRAME_ROUTE = 14
+_FRAME_LIST = 15
+# Identity handshake for named singletons - both directions carry the same kind
+_FRAME_IDENTIFY = 16
+# HELLO flag: the client wants cumulative acknowledgements
+_FLAG_ACK = 0x1
+# ACK payload: number of argument sets processed on this connection so far
+_ACK = struct.Struct("!Q")
+# MESSAGE/ARGS flags: the payload is compressed with this codec. On WELCOME the same bits
+# advertise the codecs the host can decompress.
+_FLAG_ZLIB = 0x2
+_FLAG_LZ4 = 0x4
+_FLAG_COMPRESSED = _FLAG_ZLIB | _FLAG_LZ4
+# MESSAGE flag: the client waits for a REPLY frame with the cacheable observers' results
+_FLAG_REPLY = 0x8
+# Favour speed - argument sets are redundant enough that level 1 gets most of the gain
+_ZLIB_LEVEL = 1
+
+# Structured message header: version, flags, reserved, client pid, then (offset, length)
+# of the argv, cwd, env and metadata fields within the payload
+_MESSAGE_HEADER = struct.Struct("!BBHI8I")
+_MESSAGE_VERSION = 1
+# Message header flags: the low bits carry the client's priority
+_MESSAGE_PRIORITY = 0x03
+
+# Host queue priority lanes: 0 (normal) to _PRIORITY_LEVELS - 1 (most urgent)
+_PRIORITY_LEVELS = 4
+# With a quarantine policy, an observer call running this many times observer_budget
+# is treated as blocked: the watchdog quarantines it and replaces the server thread
+_WATCHDOG_FACTOR = 10
+
+# Typed value codec (see _pack_value)
+_INT64 = struct.Struct("!q")
+_FLOAT64 = struct.Struct("!d")
+_SIZE = struct.Struct("!I")
+# Deepest nesting of lists and maps a decoded value may have
+_MAX_VALUE_DEPTH = 32
+
+# Largest message (or frame payload) the host buffers for a single client. Also the
+# limit on a compressed payload's decompressed size.
+_MAX_MESSAGE_SIZE = 1024 * 1024
+
+# Size of the server thread's receive buffer, and how many spare per-connection
+# buffers (for partial frames) the pool keeps for reuse
+_RECEIVE_SIZE = 64 * 1024
+_POOLED_BUFFERS = 16
+
+# Shared-memory lane layout (native byte order - same machine). Each lane is a header
+# holding producer/consumer sequence counters and the consumer's "waiting" flag, followed
+# by a byte ring of (length, CRC32, payload) entries.
+_SHM_HEAD = 0
+_SHM_TAIL = 8
+_SHM_WAITING = 16
+_SHM_LANE_HEADER_SIZE = 64
+_SHM_COUNTER = struct.Struct("Q")
+_SHM_FLAG = struct.Struct("I")
+_SHM_ENTRY = struct.Struct("II")
+# Safety-net poll interval for assigned lanes (doorbells normally wake the host)
+_SHM_POLL_INTERVAL = 0.05
+# Drain passes an entry may fail its checks before the lane is resynchronised
+_SHM_STALL_PASSES = 3
+
+# Spool record header: payload length, CRC32 of payload
+_SPOOL_RECORD = struct.Struct("!II")
+
+# Journal record header: payload length, record kind, sequence number
+_JOURNAL_RECORD = struct.Struct("!IBQ")
+_JOURNAL_RECEIVED = 1
+_JOURNAL_COMPLETED = 2
+_JOURNAL_SEGMENT_SIZE = 4 * 1024 * 1024
+_JOURNAL_BUFFER_SIZE = 64 * 1024
+
+# SO_LINGER value for an abortive close (RST) of connections refused admission
+_LINGER_RESET = struct.pack("ii", 1, 0)
+# Per-peer admission buckets kept before refilled (idle) ones are forgotten
+_ADMISSION_PEERS = 1024
+# struct ucred (Linux SO_PEERCRED): pid, uid, gid of a Unix socket peer
+_PEERCRED = struct.Struct("iii")
+
+# Named singletons derive their port from the name and user id, within the ephemeral
+# range, and probe this many consecutive ports past unrelated programs
+_NAMED_PORTS = (49152, 65536)
+_PORT_PROBES = 8
+# Seconds to wait for a bound port's owner to answer the identity handshake
+_IDENTIFY_TIMEOUT = 1.0
+
+# Seconds to wait for a broker's answer to a slot claim before binding directly
+_BROKER_TIMEOUT = 2.0
+
+# Seconds a client waits for each endpoint before trying the next cheapest one
+_CONNECT_TIMEOUT = 2.0
+
+# Log records per event type and window (seconds) before further ones are suppressed
+_LOG_BURST = 10
+_LOG_WINDOW = 1.0
+
+# Upper bound for release() waiting on the server thread to close the listening socket
+_JOIN_TIMEOUT = 5.0
+
 
 class Socket_Singleton:
     """
@@ -17,10 +177,14 @@ class Socket_Singleton:
     Args:
         address: IP address to bind to. Defaults to "127.0.0.1" (localhost).
             Useful for containers, VMs, and multi-homed environments.
-        port: Port number for the socket listener. Defaults to 1337.
+        port: Port number for the socket listener. Defaults to 1337, or, with `name`,
+            to a port derived from the name and user id (see `name`).
             Prefer using ports in the range 49152-65535 (ephemeral ports).
         timeout: Duration in seconds to hold the socket. Defaults to 0 (no timeout).
             If > 0, countdown starts immediately after successful binding.
+        idle_timeout: Seconds without activity (an accepted client or a received
+            argument set) after which the host releases - "exit when unused" for
+            on-demand helpers. Defaults to 0 (no idle timeout).
         client: If False, client processes won't send arguments to the host. Defaults to True.
         strict: If False, raises MultipleSingletonsError instead of SystemExit. Defaults to True.
         release_threshold: Release the port after this many client connections.
@@ -28,17 +192,218 @@ class Socket_Singleton:
         max_clients: Stop processing arguments after this many client connections.
             Defaults to 0 (process all arguments). Connections still accepted but
             arguments ignored. Useful for rudimentary rate limiting/throttling..
-        verbose: If True, print warnings for connection failures, encoding errors,
-            and observer exceptions. Defaults to False (silent operation).
+        verbose: If True, also echo this instance's log records (connection failures,
+            rejected or undecodable data, observer errors, ...) to stdout. They are
+            logged on the "Socket_Singleton" logger either way. Defaults to False.
         secret: Optional secret string for client verification. If provided, clients
             must send this secret before their arguments. Defaults to None (no verification).
             Useful for preventing unauthorized applications from injecting arguments.
+        handoff: Optional filesystem path for a Unix domain control socket. If provided,
+            the host listens there for a successor process requesting a handoff.
+            Defaults to None (no handoff). Requires Unix domain sockets with SCM_RIGHTS.
+        takeover: If True and the port is already bound, request a handoff from the
+            host's control socket at `handoff` instead of acting as a client. The
+            listening socket and any undelivered arguments are transferred, so the port
+            is never unbound. Defaults to False.
+        on_handoff: Optional callable invoked (with this instance) after the host has
+            handed its listening socket to a successor. Defaults to None.
+        standby: If True, a process that loses the bind race stays alive as a follower
+            instead of exiting or raising, and takes over as host when the current host
+            goes away. Defaults to False.
+        on_promoted: Optional callable invoked (with this instance) when a standby
+            follower becomes the host. Called from the follower's watch thread.
+        failover_interval: Seconds between a follower's probes of the port. Bounds the
+            time between the host releasing the port and a follower taking over.
+            Defaults to 0.5.
+        spool: Optional directory for a crash-safe, on-disk spool. If provided, clients
+            that cannot reach the host append their arguments to a spool file instead of
+            dropping them, and a host drains the spool when it binds. Defaults to None.
+        journal: Optional directory for an append-only journal of argument sets the host
+            received and finished dispatching. Entries received but not completed before
+            a crash can be re-dispatched with replay(). Defaults to None.
+        shm_lanes: Number of shared-memory ring-buffer lanes the host offers to
+            SharedMemoryChannel clients. Defaults to 0 (shared-memory transport disabled).
+        shm_lane_size: Capacity in bytes of each shared-memory lane. Defaults to 65536.
+        env: Names of environment variables a client forwards to the host along with
+            its arguments, working directory and pid. Defaults to () (none).
+        metadata: Optional dict of typed key/value metadata a client sends along with
+            its arguments (str keys; None, bool, int, float, str, bytes, list and dict
+            values). Defaults to None.
+        compression_threshold: A client compresses (with zlib) messages of at least this
+            many bytes before sending them. Defaults to 0 (no compression).
+        admission_rate: Sustained number of client connections per second the host
+            admits (token bucket). Connections over the limit are closed at accept time,
+            before their arguments are read, and counted in stats. Defaults to 0
+            (no limit).
+        admission_burst: Number of connections admitted in a burst above
+            admission_rate. Defaults to None (max(1, admission_rate)).
+        admission_per_peer: If True, keep a separate token bucket per remote address
+            instead of one for all clients. Defaults to False.
+        priority: Optional callable deriving a queue priority (0-3, higher is dispatched
+            first) from each argument set the host receives. The higher of this and the
+            priority the client sent (see Connection.send) is used. Defaults to None.
+        observer_budget: Soft time budget in seconds for a single observer call. Calls
+            over budget are counted in stats (and reported if verbose). Defaults to 0
+            (not timed).
+        quarantine: What to do with an observer that exceeds observer_budget
+            quarantine_after times: "isolate" moves it to its own worker thread, off the
+            server thread; "detach" untraces it. An observer call still running after
+            _WATCHDOG_FACTOR times observer_budget is quarantined at once, and the host
+            carries on in a new server thread. Defaults to None (only report).
+        quarantine_after: Number of over-budget calls before an observer is quarantined.
+            Defaults to 3.
+        on_quarantine: Optional callable invoked (with the observer and the quarantine
+            action) when an observer is quarantined. Defaults to None.
+        cache_size: Number of results of cacheable observers (see trace) kept, keyed on
+            the observer and argument tuple, with least-recently-used eviction.
+            Defaults to 0 (no caching).
+        cache_ttl: Seconds a cached result stays valid. Defaults to 0 (until evicted).
+        subscriber_buffer: Bytes of unsent argument sets the host buffers for a
+            subscriber process (see subscribe()) before disconnecting it as too slow.
+            Defaults to 1048576 (1 MiB).
+        name: Optional name of this singleton. Without an explicit `port`, the port
+            is derived from the name and user id, probing a few ports past unrelated
+            programs. The host writes a discovery file (see discover()), and a bound
+            port only counts as "already running" if its owner identifies as a
+            Socket_Singleton with this name. Also names the slot on a `broker`.
+            Defaults to None.
+        broker: Optional port of a SingletonBroker on `address`. If provided (with
+            `name`), the singleton lock is the broker's named slot instead of a port of
+            its own, and client arguments are routed to the slot's owner through the
+            broker. Falls back to binding `port` if no broker is reachable. Cannot be
+            combined with max_clients or release_threshold; `clients` counts the
+            argument sets routed to this host. Defaults to None.
+        lock: Optional lock backend deciding which instance is the host, leaving the
+            port purely for message transport: "file" (fcntl.flock on a lock file),
+            "abstract" (Linux abstract-namespace socket), or a LockBackend instance.
+            With `name` and no explicit `port`, the host listens on an ephemeral port
+            found through the discovery file. Defaults to None (the bound port is the
+            lock).
+        clock: Optional callable returning monotonic seconds, used for timeouts,
+            admission, the result cache and observer budgets. If it also has
+            call_later() (e.g. ManualClock), timers are scheduled on it instead of the
+            shared scheduler thread. Defaults to None (time.monotonic).
+        transport: Optional transport for the host and its one-shot clients. A
+            LoopbackTransport keeps everything in-process - no ports, no network.
+            Defaults to None (TCP).
+        endpoints: Additional endpoints the host listens on, multiplexed with
+            `address`/`port` in the same accept loop: ("address", port) tuples (IPv4 or
+            IPv6) and Unix socket paths. Binding `address`/`port` remains the lock.
+            Clients given the same endpoints connect to the cheapest reachable one -
+            Unix sockets, then loopback TCP, then the rest. Defaults to () (none).
+        legacy_client: If True, a client sends the NUL-delimited payload (secret, then
+            arguments) of Socket_Singleton 2.x instead of a Message, so hosts still
+            running 2.x receive its arguments intact - e.g. while upgrading through a
+            handoff. The host sees no cwd, pid, env or metadata. Defaults to False.
+        queue_limit: Number of queued argument sets (see get()) at which the host
+            stops reading from pipelined clients, until pull consumers have taken half
+            of them. Their unread frames wait in the socket buffers, so clients block
+            instead of the queue growing. Defaults to 0 (unbounded).
     """
 
+    # A long-lived host keeps one of these for weeks: no per-instance __dict__
+    __slots__ = (
+        # Constructor parameters
+        "address",
+        "name",
+        "port",
+        "timeout",
+        "idle_timeout",
+        "client",
+        "strict",
+        "release_threshold",
+        "max_clients",
+        "verbose",
+        "secret",
+        "handoff",
+        "takeover",
+        "on_handoff",
+        "standby",
+        "on_promoted",
+        "failover_interval",
+        "spool",
+        "journal",
+        "shm_lanes",
+        "shm_lane_size",
+        "env",
+        "metadata",
+        "compression_threshold",
+        "admission_rate",
+        "admission_burst",
+        "admission_per_peer",
+        "priority",
+        "observer_budget",
+        "quarantine",
+        "quarantine_after",
+        "on_quarantine",
+        "cache_size",
+        "cache_ttl",
+        "subscriber_buffer",
+        "broker",
+        "endpoints",
+        "legacy_client",
+        "queue_limit",
+        # Host, client and follower state
+        "_clock",
+        "_scheduler",
+        "_transport",
+        "_lock",
+        "_ephemeral",
+        "_arguments",
+        "_sequence",
+        "_journal",
+        "_replayable",
+        "_spooled",
+        "_observers",
+        "_overruns",
+        "_cache",
+        "_replies",
+        "_outbox",
+        "_subscribers",
+        "_pulling",
+        "_paused",
+        "_closed",
+        "_ready",
+        "_async_waiters",
+        "_clients",
+        "_stats",
+        "_admission",
+        "_listening",
+        "_thread",
+        "_timer",
+        "_idle_timer",
+        "_watchdog",
+        "_watchdog_lock",
+        "_calling",
+        "_abandoned",
+        "_handover",
+        "_dispatch_waiters",
+        "_active",
+        "_control",
+        "_control_thread",
+        "_handing_off",
+        "_standby_thread",
+        "_standby_stop",
+        "_standby_lock",
+        "_wake_r",
+        "_wake_w",
+        "_selector",
+        "_peers",
+        "_unacked",
+        "_shm",
+        "_buffers",
+        "_receive_buffer",
+        "_receive_view",
+        "_brokered",
+        "_listeners",
+        "_sock",
+        "__weakref__",
+    )
+
     def __init__(
         self,
         address: str = "127.0.0.1",
-        port: int = 1337,
+        port: int = None,
         timeout: int = 0,
         client: bool = True,
         strict: bool = True,
@@ -46,6 +411,39 @@ class Socket_Singleton:
         max_clients: int = 0,
         verbose: bool = False,
         secret: str = None,
+        handoff: str = None,
+        takeover: bool = False,
+        on_handoff=None,
+        standby: bool = False,
+        on_promoted=None,
+        failover_interval: float = 0.5,
+        spool: str = None,
+        journal: str = None,
+        shm_lanes: int = 0,
+        shm_lane_size: int = 65536,
+        env: tuple = (),
+        metadata: dict = None,
+        compression_threshold: int = 0,
+        admission_rate: float = 0,
+        admission_burst: int = None,
+        admission_per_peer: bool = False,
+        priority=None,
+        observer_budget: float = 0,
+        quarantine: str = None,
+        quarantine_after: int = 3,
+        on_quarantine=None,
+        cache_size: int = 0,
+        cache_ttl: float = 0,
+        subscriber_buffer: int = 1048576,
+        name: str = None,
+        broker: int = None,
+        lock=None,
+        idle_timeout: float = 0,
+        clock=None,
+        transport=None,
+        endpoints=(),
+        legacy_client: bool = False,
+        queue_limit: int = 0,
     ):
         """
         Initialize the singleton instance.
@@ -62,17 +460,60 @@ class Socket_Singleton:
             - Send arguments to existing host (if client=True)
             - Exit immediately (if strict=True) or raise MultipleSingletonsError
             - Never become a host or start a server thread
+
+        Successor instances (takeover=True):
+            - Receive the existing host's listening socket over the handoff control socket
+            - Become the host without the port ever being unbound
+
+        Follower instances (standby=True):
+            - Send arguments to existing host (if client=True)
+            - Stay alive, probing the port, and become the host once it is free
         """
 
         self.address = str(address)
-        self.port = int(port)
+        self.name = str(name) if name is not None else None
+        if port is not None:
+            self.port = int(port)
+        else:
+            self.port = _derive_port(self.name) if self.name is not None else 1337
         self.timeout = int(timeout)
+        self.idle_timeout = float(idle_timeout)
         self.client = bool(client)
         self.strict = bool(strict)
         self.release_threshold = int(release_threshold)
         self.max_clients = int(max_clients)
         self.verbose = bool(verbose)
         self.secret = str(secret) if secret is not None else None
+        self.handoff = str(handoff) if handoff is not None else None
+        self.takeover = bool(takeover)
+        self.on_handoff = on_handoff
+        self.standby = bool(standby)
+        self.on_promoted = on_promoted
+        self.failover_interval = float(failover_interval)
+        self.spool = str(spool) if spool is not None else None
+        self.journal = str(journal) if journal is not None else None
+        self.shm_lanes = int(shm_lanes)
+        self.shm_lane_size = int(shm_lane_size)
+        self.env = tuple(str(name) for name in env)
+        self.metadata = dict(metadata) if metadata is not None else None
+        self.compression_threshold = int(compression_threshold)
+        self.admission_rate = float(admission_rate)
+        if admission_burst is None:
+            admission_burst = max(1, int(self.admission_rate))
+        self.admission_burst = int(admission_burst)
+        self.admission_per_peer = bool(admission_per_peer)
+        self.priority = priority
+        self.observer_budget = float(observer_budget)
+        self.quarantine = str(quarantine) if quarantine is not None else None
+        self.quarantine_after = int(quarantine_after)
+        self.on_quarantine = on_quarantine
+        self.cache_size = int(cache_size)
+        self.cache_ttl = float(cache_ttl)
+        self.subscriber_buffer = int(subscriber_buffer)
+        self.broker = int(broker) if broker is not None else None
+        self.endpoints = tuple(_endpoint(endpoint) for endpoint in endpoints)
+        self.legacy_client = bool(legacy_client)
+        self.queue_limit = int(queue_limit)
 
         if not (0 <= self.port <= 65535):
             raise ValueError("port must be between 0 and 65535 (inclusive)")
@@ -82,45 +523,590 @@ class Socket_Singleton:
             raise ValueError("release_threshold must be greater than or equal to 0")
         if self.max_clients < 0:
             raise ValueError("max_clients must be greater than or equal to 0")
+        if self.secret is not None:
+            try:
+                self.secret.encode("utf-8")
+            except UnicodeEncodeError:
+                raise ValueError("secret must be valid UTF-8 text") from None
+        if self.failover_interval <= 0:
+            raise ValueError("failover_interval must be greater than 0")
+        if self.shm_lanes < 0:
+            raise ValueError("shm_lanes must be greater than or equal to 0")
+        if self.shm_lane_size < 1024:
+            raise ValueError("shm_lane_size must be at least 1024")
+        if self.compression_threshold < 0:
+            raise ValueError("compression_threshold must be greater than or equal to 0")
+        if self.admission_rate < 0:
+            raise ValueError("admission_rate must be greater than or equal to 0")
+        if self.admission_burst < 1:
+            raise ValueError("admission_burst must be at least 1")
+        if self.priority is not None and not callable(self.priority):
+            raise TypeError("priority must be callable")
+        if self.observer_budget < 0:
+            raise ValueError("observer_budget must be greater than or equal to 0")
+        if self.quarantine not in (None, "isolate", "detach"):
+            raise ValueError('quarantine must be None, "isolate" or "detach"')
+        if self.quarantine_after < 1:
+            raise ValueError("quarantine_after must be at least 1")
+        if self.cache_size < 0:
+            raise ValueError("cache_size must be greater than or equal to 0")
+        if self.cache_ttl < 0:
+            raise ValueError("cache_ttl must be greater than or equal to 0")
+        if self.subscriber_buffer < 1:
+            raise ValueError("subscriber_buffer must be at least 1")
+        if self.idle_timeout < 0:
+            raise ValueError("idle_timeout must be greater than or equal to 0")
+        if self.queue_limit < 0:
+            raise ValueError("queue_limit must be greater than or equal to 0")
+        if self.broker is not None and self.name is None:
+            raise ValueError("broker requires a name")
+        if self.broker is not None and (self.max_clients or self.release_threshold):
+            raise ValueError("max_clients and release_threshold cannot be combined with broker")
+        if lock is not None and (self.broker is not None or self.handoff is not None):
+            raise ValueError("lock backends cannot be combined with broker or handoff")
+        if transport is not None and (self.broker is not None or self.handoff is not None):
+            raise ValueError("transports cannot be combined with broker or handoff")
+        if self.endpoints and (
+            self.broker is not None or self.handoff is not None or transport is not None
+        ):
+            raise ValueError("endpoints cannot be combined with broker, handoff or transport")
+        self._clock = clock if clock is not None else monotonic
+        self._scheduler = clock if hasattr(clock, "call_later") else _SCHEDULER
+        self._transport = transport if transport is not None else _TCP
+        self._lock = _lock_backend(lock, self.name or str(self.port))
+        # A named, lock-backed host needs no well-known port: clients use discovery
+        self._ephemeral = self._lock is not None and self.name is not None and port is None
+        if self.takeover and self.handoff is None:
+            raise ValueError("takeover requires a handoff path")
+        if self.handoff is not None and not _supports_handoff():
+            raise NotImplementedError(
+                "handoff requires Unix domain sockets with SCM_RIGHTS support"
+            )
 
         # Store arguments as tuples - each tuple represents one client's complete argument set
-        # Internally, this functions as a queue. See self.arguments() for external access.
+        # Internally, this functions as a queue of (sequence number, arguments) entries,
+        # with one FIFO lane per priority. See self.arguments() for external access.
         # Note: Host's own arguments are not stored here - only arguments from client processes.
-        self._arguments = []
+        self._arguments = _ArgumentQueue()
+        self._sequence = count()
+        self._journal = None
+        self._replayable = {}
+        # Drained spool records not yet delivered: (_Spool, bytes read, sequence numbers)
+        self._spooled = None
+        # observer -> (args, kwargs, wants_message, isolated worker or None, cacheable)
         self._observers = {}
+        self._overruns = Counter()
+        self._cache = _ResultCache(self.cache_size, self.cache_ttl) if self.cache_size else None
+        # Reply-mode requests: sequence number -> client connection awaiting the results
+        self._replies = {}
+        # Frames produced off the server thread, sent by it when woken
+        self._outbox = deque()
+        # Subscriber processes: connection -> routes (frozenset of first arguments) or None
+        self._subscribers = {}
+        # Pull consumers (get()/messages()): set once one has asked for argument sets
+        self._pulling = False
+        # Reading from pipelined clients paused while the queue is over queue_limit
+        self._paused = False
+        self._closed = False
+        self._ready = Condition()
+        self._async_waiters = set()
         self._clients = 0
+        self._stats = Counter()
+        self._admission = {}
         self._listening = False
         self._thread = None
         self._timer = None
-        self._sock = socket()
+        self._idle_timer = None
+        # Observer watchdog: its timer, and the server thread's current observer call as
+        # (thread, key, observer, started, delivery); threads it replaced while blocked
+        self._watchdog = None
+        self._watchdog_lock = Lock()
+        self._calling = None
+        self._abandoned = set()
+        # Argument sets the watchdog took over part-way: (seq, item, entries, results)
+        self._handover = deque()
+        # Events of threads waiting for the server thread to dispatch (_request_dispatch)
+        self._dispatch_waiters = deque()
+        self._active = self._clock()
+        self._control = None
+        self._control_thread = None
+        self._handing_off = False
+        self._standby_thread = None
+        self._standby_stop = Event()
+        # Held by a promotion and by release(), so neither lands in the middle of the
+        # other. Reentrant: a host that fails to start releases itself.
+        self._standby_lock = RLock()
+        self._wake_r = self._wake_w = None
+        self._selector = None
+        self._peers = {}
+        # Connections owed an acknowledgement, sent once the selector pass is dispatched
+        self._unacked = set()
+        self._shm = None
+        self._buffers = _BufferPool()
+        self._receive_buffer = self._receive_view = None
+        self._brokered = False
+        # Listening sockets of the additional endpoints: [(socket, endpoint)]
+        self._listeners = []
+        self._sock = self._transport.socket()
+
+        # A broker's named slot is the lock when one is reachable; else bind directly
+        claimed = self._claim_slot() if self.broker is not None else None
+        if claimed is not None:
+            if claimed:
+                self._start_host()
+                return
+            self._already_running()
 
         try:
-            self._sock.bind((self.address, self.port))
+            if self._lock is not None:
+                self._bind_locked(self._sock)
+            elif self.name is None:
+                self._sock.bind((self.address, self.port))
+            else:
+                self._bind_named(probe=port is None)
 
         except OSError as err:
             if err.errno not in (errno.EADDRINUSE, _WSAEADDRINUSE):
                 raise
 
+            if self._ephemeral:
+                self._find_host()
+
+            if self.takeover and self._take_over():
+                return
+
             if self.client:
                 self._create_client()
 
-            if self.strict:
-                raise SystemExit
+            if self.standby:
+                self._standby_thread = Thread(target=self._follow, daemon=True)
+                self._standby_thread.start()
+                return
+
+            self._already_running()
+
+        else:
+            self._start_host()
+
+    def _bind_named(self, probe):
+        """
+        Bind a named singleton's port, skipping ports held by unrelated programs.
+
+        A port that is already bound is only ours to use as a client if its owner
+        identifies as a Socket_Singleton with this name. The discovery file, if
+        present and its host process is alive, names the host's port so it is tried
+        (and identified) first.
+
+        Args:
+            probe: If True, try _PORT_PROBES consecutive ports from the derived one.
+
+        Raises:
+            OSError: EADDRINUSE if the name's host is running (self.port is its port),
+                or EADDRNOTAVAIL if every candidate port belongs to another program.
+        """
+
+        ports = [self.port + offset for offset in range(_PORT_PROBES if probe else 1)]
+        record = Socket_Singleton.discover(self.name)
+        if not self._live(record):
+            record = None
+        if record is not None and record["port"] in ports:
+            ports.remove(record["port"])
+            ports.insert(0, record["port"])
+
+        for port in ports:
+            try:
+                self._sock.bind((self.address, port))
+            except OSError as err:
+                if err.errno not in (errno.EADDRINUSE, _WSAEADDRINUSE):
+                    raise
+                identity = _identify(self.address, port, _IDENTIFY_TIMEOUT, self._transport)
+                if identity is not None and identity.get("name") == self.name:
+                    self.port = port
+                    raise
+                self._warn(
+                    "port_taken",
+                    "Port %d is held by another program, probing on for %r",
+                    port,
+                    self.name,
+                    level=logging.INFO,
+                )
             else:
-                raise MultipleSingletonsError(
-                    "\nApplication is already bound & listening "
-                    f"@ {self.address} on port {self.port}. Multiple "
-                    f"instances are disallowed in the current context."
-                ) from None
+                self.port = port
+                return
+
+        raise OSError(
+            errno.EADDRNOTAVAIL,
+            f"No free port for {self.name!r} @ {self.address} in {ports[0]}-{ports[-1]}",
+        )
+
+    def _bind_locked(self, sock):
+        """
+        Acquire the lock backend, then bind the transport port.
+
+        Raises:
+            OSError: EADDRINUSE if another instance holds the lock, or EADDRNOTAVAIL
+                if the lock was acquired but the transport port is taken.
+        """
+
+        if not self._lock.acquire():
+            raise OSError(errno.EADDRINUSE, f"{self._lock!r} is held by another instance")
+        try:
+            sock.bind((self.address, 0 if self._ephemeral else self.port))
+        except OSError as err:
+            self._lock.release()
+            raise OSError(
+                errno.EADDRNOTAVAIL,
+                f"Acquired {self._lock!r} but cannot listen "
+                f"@ {self.address} on port {self.port}: {err}",
+            ) from None
+        self.port = sock.getsockname()[1]
+
+    def _find_host(self):
+        """
+        Wait briefly for the lock holder's discovery file, and adopt its port.
+
+        The record may be a crashed host's, and its pid reused since: the port must
+        pass the identity handshake.
+        """
+
+        deadline = monotonic() + _IDENTIFY_TIMEOUT
+        while True:
+            record = Socket_Singleton.discover(self.name)
+            if record is not None and isinstance(record.get("port"), int):
+                identity = _identify(
+                    self.address, record["port"], _IDENTIFY_TIMEOUT, self._transport
+                )
+                if identity is not None and identity.get("name") == self.name:
+                    self.port = record["port"]
+                    return
+            if monotonic() >= deadline:
+                self._warn("discovery_missing", "No discovery file for %r", self.name)
+                return
+            sleep(0.01)
+
+    def _live(self, record):
+        """
+        True if a discovery record's host process is alive and listens on self.address,
+        so its port is worth trying first. Not proof that the port is the host's: the
+        pid may have been reused, so the port still has to pass the identity handshake.
+        """
+
+        return (
+            record is not None
+            and record.get("address") == self.address
+            and isinstance(record.get("port"), int)
+            and _pid_alive(record.get("pid"))
+        )
+
+    def _write_discovery(self):
+        """Record this host's pid and port in the discovery file (see discover())."""
+
+        record = {
+            "name": self.name,
+            "pid": os.getpid(),
+            "address": self.address,
+            "port": self.port,
+            "transport": "tcp",
+            "endpoints": list(self.endpoints),
+            "started": time.time(),
+        }
+        try:
+            path = _discovery_path(self.name)
+            # Write-then-rename, so readers never see a partial record
+            with open(f"{path}.{os.getpid()}", "w", encoding="utf-8") as discovery:
+                json.dump(record, discovery)
+            os.replace(f"{path}.{os.getpid()}", path)
+        except OSError as err:
+            self._warn(
+                "discovery_failed", "Failed to write discovery file for %r: %s", self.name, err
+            )
+
+    def _remove_discovery(self):
+        """Remove the discovery file, unless a newer host has already replaced it."""
+
+        record = Socket_Singleton.discover(self.name)
+        if record is not None and record.get("pid") == os.getpid():
+            try:
+                os.remove(_discovery_path(self.name))
+            except OSError:
+                pass
+
+    def _warn(self, event, message, *args, level=logging.WARNING):
+        """Log an event for this instance (see _log_event)."""
+
+        _log_event(event, self.verbose, message, *args, level=level, port=self.port)
 
+    def _already_running(self):
+        """Exit (strict) or raise MultipleSingletonsError: another instance is the host."""
+
+        if self.strict:
+            raise SystemExit
         else:
-            self._listening = True
-            self._thread = Thread(target=self._create_server, daemon=True)
-            self._timer = Timer(self.timeout, self.release)
-            self._thread.start()
+            where = (
+                f"in slot {self.name!r} of the broker on port {self.broker}"
+                if self._brokered is None
+                else f"@ {self.address} on port {self.port}"
+            )
+            raise MultipleSingletonsError(
+                f"\nApplication is already bound & listening {where}. Multiple "
+                f"instances are disallowed in the current context."
+            ) from None
+
+    def _claim_slot(self):
+        """
+        Claim this singleton's named slot on the broker.
+
+        If the slot is already owned, this process is a client: its arguments are
+        routed to the owner over the same broker connection.
+
+        Returns:
+            True if the slot is ours (self._sock is now the broker connection), False
+            if another process owns it, or None if no broker is reachable.
+        """
+
+        try:
+            sock = _socket.create_connection((self.address, self.broker), _BROKER_TIMEOUT)
+        except OSError:
+            return None
+
+        try:
+            claim = _pack_value([self.name, self.secret, os.getpid()])
+            sock.sendall(_frame(_FRAME_CLAIM, claim))
+            marker, kind, _, length = _FRAME.unpack(_recv_exactly(sock, _FRAME.size))
+            _recv_exactly(sock, length)
+        except OSError:
+            sock.close()
+            return None
+
+        if marker == _FRAME_MARKER and kind == _FRAME_WELCOME:
+            sock.settimeout(None)
+            self._sock.close()
+            self._sock = sock
+            self._brokered = True
+            return True
+
+        # Slot taken - route our arguments to its owner, then behave as a client
+        self._brokered = None
+        with sock:
+            if self.client:
+                try:
+                    message, flags = self._client_message()
+                    route = _pack_value([self.name, self.secret])
+                    sock.sendall(
+                        _frame(_FRAME_ROUTE, route) + _frame(_FRAME_MESSAGE, message, flags)
+                    )
+                except OSError:
+                    self._warn(
+                        "route_failed",
+                        "Failed to route arguments to slot %r on the broker on port %d",
+                        self.name,
+                        self.broker,
+                    )
+        return False
+
+    def _start_host(self):
+        """
+        Start serving on self._sock, which is already bound (or was handed to us).
+
+        Opens the journal and drains the spool (if configured) before any live traffic
+        is accepted, then starts the server thread, the handoff control thread
+        (if configured), and the timeout timer (if configured).
+        """
+
+        if self.journal is not None:
+            self._open_journal()
+
+        if self.spool is not None:
+            self._drain_spool()
+
+        if self.shm_lanes:
+            self._shm = _ShmRing(self.shm_lanes, self.shm_lane_size)
+
+        # Listen before returning so clients can connect as soon as we are the host.
+        # A brokered host receives its clients' messages over the broker connection.
+        if not self._brokered:
+            self._sock.listen()
+            self._open_endpoints()
+        # Self-pipe used to wake the server thread's selector (release, handoff)
+        self._wake_r, self._wake_w = _socket.socketpair()
+        self._listening = True
+        self._thread = Thread(target=self._create_server, daemon=True)
+        self._thread.start()
+
+        if self.handoff is not None and not self._brokered:
+            try:
+                self._open_control()
+            except OSError:
+                self.release()
+                raise
+
+        # Timers of every instance share one scheduler thread
+        if self.timeout > 0:
+            self._timer = self._scheduler.call_later(self.timeout, self.release)
+        if self.idle_timeout > 0:
+            self._active = self._clock()
+            self._idle_timer = self._scheduler.call_later(self.idle_timeout, self._idle_check)
+
+        if self.name is not None and not self._brokered:
+            self._write_discovery()
+
+    def _open_endpoints(self):
+        """
+        Listen on the additional endpoints (see the `endpoints` parameter).
+
+        We hold the primary endpoint, so a socket already at a Unix socket path is stale
+        (any other file is left alone). An endpoint that cannot be bound is skipped -
+        clients fall back to another.
+        """
+
+        for endpoint in self.endpoints:
+            listener = _endpoint_socket(endpoint)
+            try:
+                if isinstance(endpoint, str):
+                    _unlink_socket(endpoint)
+                else:
+                    if platform != "win32":
+                        # Not the lock: a predecessor's TIME_WAIT connections mustn't block
+                        listener.setsockopt(_socket.SOL_SOCKET, _socket.SO_REUSEADDR, 1)
+                    if listener.family == _socket.AF_INET6:
+                        # Leave the IPv4 side of a dual-stack port to its own endpoint
+                        listener.setsockopt(_socket.IPPROTO_IPV6, _socket.IPV6_V6ONLY, 1)
+                listener.bind(endpoint)
+                listener.listen()
+            except OSError as err:
+                listener.close()
+                self._warn("endpoint_failed", "Cannot listen on %r: %s", endpoint, err)
+                continue
+            self._listeners.append((listener, endpoint))
+
+    def _close_endpoints(self):
+        """Close the additional endpoints' listening sockets and remove Unix socket paths."""
+
+        listeners, self._listeners = self._listeners, []
+        for listener, endpoint in listeners:
+            listener.close()
+            if isinstance(endpoint, str):
+                try:
+                    _unlink_socket(endpoint)
+                except FileExistsError:
+                    pass
+
+    def _idle_check(self):
+        """Scheduler callback: release if idle for idle_timeout, else check again later."""
+
+        if not self._listening:
+            return
+        idle = self._clock() - self._active
+        if idle >= self.idle_timeout:
+            self._warn(
+                "idle_release",
+                "Idle for %.1fs on port %d, releasing",
+                idle,
+                self.port,
+                level=logging.INFO,
+            )
+            self.release()
+        else:
+            # Activity only stamps self._active; the timer is re-armed lazily, here
+            self._idle_timer = self._scheduler.call_later(
+                self.idle_timeout - idle, self._idle_check
+            )
+
+    def _cancel_timers(self):
+        """Cancel the timeout and idle timers, if scheduled."""
+
+        if self._timer is not None:
+            self._timer.cancel()
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+        with self._watchdog_lock:
+            if self._watchdog is not None:
+                self._watchdog.cancel()
+                self._watchdog = None
+
+    def _follow(self):
+        """
+        Standby thread: probe the port until the host goes away, then become the host.
+
+        The probe is a bind attempt, which doubles as the election - when several
+        followers race for a freed port, exactly one bind succeeds and the rest keep
+        following the new host. Failover time is bounded by failover_interval.
+        """
+
+        while not self._standby_stop.wait(self.failover_interval):
+            sock = self._transport.socket()
+            try:
+                if self._lock is not None:
+                    self._bind_locked(sock)
+                else:
+                    sock.bind((self.address, self.port))
+            except OSError as err:
+                sock.close()
+                if err.errno not in (errno.EADDRINUSE, _WSAEADDRINUSE):
+                    self._warn(
+                        "standby_probe_failed",
+                        "Standby probe failed @ %s on port %d: %s",
+                        self.address,
+                        self.port,
+                        err,
+                    )
+                continue
+
+            with self._standby_lock:
+                if self._standby_stop.is_set():
+                    # Released while probing
+                    sock.close()
+                    if self._lock is not None:
+                        self._lock.release()
+                    return
+
+                self._sock.close()
+                self._sock = sock
+                self._start_host()
+
+            if self.on_promoted is not None:
+                try:
+                    self.on_promoted(self)
+                except Exception as exc:
+                    self._warn(
+                        "callback_error",
+                        "on_promoted callback raised exception: %s: %s",
+                        type(exc).__name__,
+                        exc,
+                    )
+            return
+
+    def _open_journal(self):
+        """
+        Open the journal and collect entries received but not completed before a crash.
+
+        Entries already in the queue (received in a handoff) are not replayable -
+        they will be dispatched normally.
+        """
+
+        self._journal = _Journal(self.journal)
+        queued = {seq for seq, _ in self._arguments}
+        self._replayable = {
+            seq: args for seq, args in self._journal.recover().items() if seq not in queued
+        }
+        # Never reuse a sequence number still referenced by the journal or the queue
+        start = max(queued | set(self._replayable) | {self._journal.last_sequence}) + 1
+        self._sequence = count(start)
 
-            if self.timeout > 0:
-                self._timer.start()
+    def _close_wake(self):
+        """Close the selector wake-up socket pair."""
+
+        self._wake_r.close()
+        self._wake_w.close()
+
+    def _wake(self):
+        """Wake the server thread's selector so it re-checks its state."""
+
+        try:
+            self._wake_w.send(b"\x00")
+        except OSError:
+            # Wake pipe already closed - the server thread has exited
+            pass
 
     def __str__(self):
         """Human-readable string representation."""
@@ -145,6 +1131,10 @@ class Socket_Singleton:
             f"max_clients={self.max_clients}, "
             f"verbose={self.verbose}, "
             f"secret={'***' if self.secret else None}, "
+            f"handoff={self.handoff!r}, "
+            f"standby={self.standby}, "
+            f"spool={self.spool!r}, "
+            f"journal={self.journal!r}, "
             f"observers={len(self._observers)}, "
             f"clients={self._clients}, "
             f"listening={getattr(self, '_listening', False)})"
@@ -169,252 +1159,4605 @@ class Socket_Singleton:
         """
         Server thread that listens for client connections and processes arguments.
 
-        Continuously accepts connections from client processes, receives their
-        arguments, and publishes them to registered observers. Runs in a daemon
-        thread until release() is called or thresholds are reached.
+        Multiplexes the listening sockets and all open client connections in a single
+        selector loop, receives their arguments, and publishes them to registered
+        observers. Runs in a daemon thread until release() is called, thresholds are
+        reached, or the listening socket is handed off to a successor.
         """
 
-        with self._sock as sock:
-            sock.listen()
-            while self._listening:
-                connection, _ = sock.accept()
-                with connection:
-                    self._clients += 1
-
-                    # We can release the port after a certain number of clients have connected.
-                    # Singleton will be unlocked:
-                    if (self.release_threshold) and (self._clients >= self.release_threshold):
-                        self.release()
-                        break  # Exit immediately - release() sets _listening=False but accept() blocks
-
-                    # We can stop processing arguments after a certain number of clients have connected.
-                    # Singleton will remain locked:
-                    within_max_clients = (not self.max_clients) or (
-                        self._clients <= self.max_clients
-                    )
-                    has_observers = len(self._observers) > 0
-                    should_process_args = within_max_clients and has_observers
-
-                    data = connection.recv(1024)
-                    if should_process_args:
-                        # Defensively decode:
-                        try:
-                            # Receive all arguments from this client as a single package
-                            # Use null byte (\x00) as delimiter to avoid issues with newlines
-                            decoded = data.decode("utf-8", errors="replace").rstrip("\x00")
-                            # Split by null byte to get individual args
-                            parts = decoded.split("\x00")
-
-                            # If secret is required, verify it
-                            if self.secret is not None:
-                                if not parts or parts[0] != self.secret:
-                                    # Secret mismatch - silently ignore this connection
-                                    if self.verbose:
-                                        print(
-                                            f"Socket_Singleton: Client verification failed "
-                                            f"on port {self.port}, ignoring connection"
-                                        )
-                                    continue
-                                # Remove secret from parts, keep only arguments
-                                parts = parts[1:]
-
-                            # Filter out empty strings
-                            args = tuple(arg for arg in parts if arg)
-                            if args:
-                                self._append_args(args)
-                        except (UnicodeDecodeError, AttributeError):
-                            # Invalid data received - skip this client's arguments
-                            if self.verbose:
-                                print(
-                                    f"Socket_Singleton: Failed to decode data from client "
-                                    f"on port {self.port}, skipping arguments"
-                                )
-                            pass
+        sock = self._sock
+        self._receive_buffer = bytearray(_RECEIVE_SIZE)
+        self._receive_view = memoryview(self._receive_buffer)
+        # Non-blocking accept: during a handoff the listening socket is briefly shared
+        # with the successor process, which may win the race for a pending connection.
+        sock.setblocking(False)
 
-    def _create_client(self):
+        selector = self._selector = selectors.DefaultSelector()
+        try:
+            if self._brokered:
+                # The broker connection is this host's only (pre-verified) client
+                peer = self._peers[sock] = _Peer(True, False)
+                peer.framed = peer.verified = True
+                self._update_interest(sock, peer)
+            else:
+                selector.register(sock, selectors.EVENT_READ, self._accept)
+            for listener, _ in self._listeners:
+                listener.setblocking(False)
+                selector.register(listener, selectors.EVENT_READ, self._accept)
+            selector.register(self._wake_r, selectors.EVENT_READ, self._drain_wake)
+        except BaseException:
+            self._stop_server()
+            raise
+
+        self._serve()
+
+    def _serve(self):
         """
-        Client behavior when port is already bound.
+        The server thread's selector loop (see _create_server).
 
-        Connects to the existing host server and sends this process's command-line
-        arguments. Called automatically when binding fails due to port already in use.
+        If the watchdog hands the loop to a new server thread while an observer blocks
+        this one, this thread exits as soon as the observer returns and leaves the
+        teardown to its successor.
         """
 
         try:
-            with self._sock as sock:
-                sock.connect((self.address, self.port))
-                # Build message: secret (if required) + arguments, joined by null bytes
-                # Use null byte (\x00) as delimiter to avoid issues with newlines
-                parts = []
-                if self.secret is not None:
-                    parts.append(self.secret)
-                parts.extend(argv[1:])
-                # Empty if no arguments (just a null byte terminator)
-                message = "\x00".join(parts) + "\x00"
-                sock.send(message.encode("utf-8"))
-        except (OSError, ConnectionRefusedError):
-            # Connection failures can occur due to race conditions (especially with
-            # rapid successive launches), port conflicts with other applications,
-            # erroneous manual release() calls, timeouts, etc.
-            #
-            # Some uncommon but possible scenarios:
-            # 1. Host releases port between our bind() attempt and connect() attempt
-            # 2. Host timeout expires between bind() and connect()
-            # 3. Host process crashes/killed before we can connect
-            # 4. Port in use by non-singleton application
-            #
-            # Silently handle these failures - the client will exit/raise exception
-            # as expected regardless. The important singleton enforcement behavior
-            # (preventing multiple instances) is already achieved by the failed bind().
-            if self.verbose:
-                print(
-                    f"Socket_Singleton: Failed to connect to existing instance "
-                    f"on {self.address}:{self.port} (port may have been released)"
-                )
-            pass
+            while self._listening:
+                # Shared-memory lanes are drained on every pass; the timeout is a
+                # safety net for doorbells lost to a race with the producer.
+                timeout = _SHM_POLL_INTERVAL if self._shm_active() else None
+                for key, events in self._selector.select(timeout):
+                    key.data(key.fileobj, events)
+                    if not self._listening:
+                        break
+
+                if self._shm_active() and not self._paused:
+                    self._drain_lanes()
+
+                # Everything read in this pass is queued first, so urgent argument
+                # sets overtake normal ones that arrived alongside them
+                waiters = self._take_waiters()
+                self._dispatch()
+                for waiter in waiters:
+                    waiter.set()
+                if self._thread is not current_thread():
+                    return
+                self._send_acks()
+                if self.queue_limit:
+                    self._limit_queue()
+        finally:
+            if self._thread is current_thread():
+                self._stop_server()
+            else:
+                self._abandoned.discard(current_thread())
 
-    def _append_args(self, args):
+    def _stop_server(self):
         """
-        Append a complete argument set from a client to the queue and notify observers.
+        Server thread teardown: close the client connections and the selector, then
+        (unless handing off) the listening sockets.
         """
 
-        self._arguments.append(args)
-        self._update_observers()
+        try:
+            for connection in list(self._peers):
+                self._close_peer(connection)
+            selector, self._selector = self._selector, None
+            selector.close()
+            # A successor takes over the queue after a handoff
+            if not self._handing_off:
+                self._dispatch()
 
-    def _update_observers(self):
-        """
-        Publish the most recent argument set to all registered observers.
+            # Lanes belong to this server thread's clients; a successor after a
+            # handoff offers its own.
+            if self._shm is not None:
+                self._shm.close()
+                self._shm = None
+        finally:
+            for waiter in self._take_waiters():
+                waiter.set()
+            # A handed-off socket is closed by the control thread once the
+            # successor has acknowledged receipt, never here.
+            if not self._handing_off:
+                # Before the primary endpoint: once it is free, a new host may take over
+                # the Unix socket paths
+                self._close_endpoints()
+                self._sock.close()
+                self._close_wake()
+                # Only once the transport port is closed can a new host bind it
+                if self._lock is not None:
+                    self._lock.release()
 
-        Implements the observer pattern - notifies all registered callbacks with
-        the latest argument set (as a tuple) and their stored args/kwargs.
-        Arguments are consumed (popped) as they're published.
+    def _request_dispatch(self):
+        """
+        Have the server thread dispatch the queued argument sets, and wait until it has.
 
-        Each observer receives a tuple containing all arguments from a single
-        client process, allowing them to be processed in the correct context.
+        Used by trace(), replay() and other threads queueing argument sets, so observers
+        are only ever called by the server thread while it runs. On the server thread
+        itself this is a no-op - its loop dispatches after every pass.
         """
-        if not self._arguments or not self._observers:
+
+        thread = self._thread
+        if thread is current_thread():
+            return
+        if thread is None or not self._listening or not thread.is_alive():
+            # No server thread to do it
+            self._dispatch()
             return
 
-        args = self._arguments.pop()
-        # Copy observers dict to avoid RuntimeError if untrace() is called during iteration.
-        # The list() creates a snapshot of (observer, (args, kwargs)) tuples at this moment.
-        # This is safe because: observer callables are immutable references, args are tuples
-        # (immutable), and kwargs dicts are only read (not modified) during callback execution.
-        for observer, (observer_args, observer_kwargs) in list(self._observers.items()):
-            try:
-                # Pass the complete argument tuple as the first parameter
-                observer(args, *observer_args, **observer_kwargs)
-            except Exception as exc:
-                # Observer exceptions shouldn't crash the server thread
-                if self.verbose:
-                    # fmt: off
-                    observer_name = (
-                        observer.__name__
-                        if hasattr(observer, "__name__")
-                        else observer
-                    )
-                    # fmt: on
-                    print(
-                        f"Socket_Singleton: Observer {observer_name} "
-                        f"raised exception: {type(exc).__name__}: {exc}"
-                    )
-                pass
+        done = Event()
+        self._dispatch_waiters.append(done)
+        self._wake()
+        done.wait(_JOIN_TIMEOUT)
 
-    def trace(self, observer, *args, **kwargs):
-        """
-        Register an observer callback to receive arguments from client processes.
+    def _take_waiters(self):
+        """Pop the threads waiting in _request_dispatch() for the next dispatch."""
 
-        When arguments arrive from client processes, the observer will be called
-        with a tuple containing all arguments from that client as the first parameter,
-        followed by any args/kwargs provided here.
+        waiters = []
+        while self._dispatch_waiters:
+            waiters.append(self._dispatch_waiters.popleft())
+        return waiters
 
-        Args:
-            observer: Callable to invoke when arguments arrive. Receives a tuple
-                of arguments from a single client process as the first parameter.
-            *args: Additional positional arguments to pass to observer
-            **kwargs: Additional keyword arguments to pass to observer
+    def _drain_wake(self, wake, events):
+        """
+        Selector callback: discard wake-up bytes (release, handoff) and send frames
+        (replies, published argument sets) produced on other threads.
+        """
 
-        Example:
-            def my_callback(args_tuple, prefix, suffix="<<<"):
-                # args_tuple is a tuple like ("foo", "bar", "baz")
-                print(f"{prefix}{' '.join(args_tuple)}{suffix}")
-                do_a_thing(args_tuple)
+        wake.recv(1024)
+        while self._outbox:
+            connection, data = self._outbox.popleft()
+            peer = self._peers.get(connection)
+            if peer is not None:
+                self._send(connection, peer, data)
 
-            app.trace(my_callback, ">>> ", suffix=" - Received")
-        """
+    def _accept(self, sock, events):
+        """Selector callback: accept a client connection and start reading from it."""
 
-        self._observers[observer] = (args, kwargs)
+        try:
+            connection, address = sock.accept()
+        except (BlockingIOError, InterruptedError):
+            return
 
-    def untrace(self, observer):
-        """Detach (unsubscribe) a callback. Does nothing if the observer is not registered."""
+        if self.admission_rate and not self._admit(connection, address):
+            # Over the rate limit: reset the connection without reading its payload.
+            # An abortive close also leaves no TIME_WAIT behind on the host.
+            self._stats["rejected"] += 1
+            connection.setsockopt(_socket.SOL_SOCKET, _socket.SO_LINGER, _LINGER_RESET)
+            connection.close()
+            self._warn(
+                "admission_rejected",
+                "Client on port %d exceeded the admission rate, rejecting connection",
+                self.port,
+            )
+            return
 
-        self._observers.pop(observer, None)
+        connection.setblocking(False)
+        self._stats["accepted"] += 1
+        self._active = self._clock()
 
-    def release(self):
+        # Counted as a client once it sends a handshake or arguments (see _count_client)
+        peer = self._peers[connection] = _Peer(None, False)
+        self._update_interest(connection, peer)
+
+    def _update_interest(self, connection, peer):
+        """
+        Register a client connection with the selector for the events it needs: reading
+        (unless paused by queue_limit), and writing while output is pending.
         """
-        Release the port, allowing other instances to bind.
 
-        Stops the server thread, cancels any active timeout timer, clears all
-        registered observers, and releases the socket port. Safe to call multiple
-        times (idempotent).
+        events = 0 if self._paused and peer.verified else selectors.EVENT_READ
+        if peer.writing:
+            events |= selectors.EVENT_WRITE
+        if events == peer.events:
+            return
+        if not peer.events:
+            self._selector.register(connection, events, self._service)
+        elif not events:
+            self._selector.unregister(connection)
+        else:
+            self._selector.modify(connection, events, self._service)
+        peer.events = events
 
-        Note:
-            After release(), this instance can no longer accept client connections.
-            Use the context manager protocol for automatic cleanup.
+    def _limit_queue(self):
         """
-        if not hasattr(self, "_listening") or not self._listening:
-            return
+        Pause reading from pipelined clients while the queue holds queue_limit argument
+        sets, and resume once pull consumers have taken half of them.
 
-        self._listening = False
+        Only verified (handshaken) connections are paused: handshakes and identity
+        probes are still answered, and one-shot clients send a single argument set.
+        """
 
-        if hasattr(self, "_timer"):
-            self._timer.cancel()
+        queued = len(self._arguments)
+        if self._paused:
+            if queued > self.queue_limit // 2:
+                # Connections verified since the pause are paused too
+                for connection, peer in list(self._peers.items()):
+                    self._update_interest(connection, peer)
+                return
+            self._paused = False
+        elif queued >= self.queue_limit:
+            self._paused = True
+            self._stats["queue_paused"] += 1
+        else:
+            return
 
-        # No new arguments will arrive after release
-        self._observers.clear()
+        for connection, peer in list(self._peers.items()):
+            self._update_interest(connection, peer)
 
-        # Unblock accept() in server thread
-        try:
-            dummy_socket = socket()
-            with dummy_socket as dummy:
-                dummy.connect((self.address, self.port))
-                dummy.send("".encode("utf-8"))
-        except (OSError, ConnectionRefusedError):
-            # Socket may already be closed or port released - this is fine
-            # The server thread will exit due to _listening = False above
-            # pass here for idempotency
-            pass
+    def _count_client(self, peer):
+        """
+        Count a connection as a client, on its first handshake (HELLO or shared-memory
+        request) or legacy message.
 
-    @property
-    def arguments(self):
+        Not done on accept: identity probes and subscribers are not clients, and must
+        not count toward max_clients or release_threshold.
         """
-        Read-only snapshot of arguments received from client processes.
 
-        Returns a tuple of tuples, where each inner tuple represents the complete
-        argument set from a single client process. Note that arguments are typically
-        consumed immediately by registered observers, so this will often be empty.
-        Useful for debugging or inspecting pending arguments.
+        self._clients += 1
 
-        Example:
-            If two clients sent ("foo", "bar") and ("baz",), this returns:
-            (("foo", "bar"), ("baz",))
-        """
-        return tuple(self._arguments)
+        # We can stop processing arguments after a certain number of clients have connected.
+        # Singleton will remain locked:
+        peer.process = (not self.max_clients) or (self._clients <= self.max_clients)
 
-    @property
-    def clients(self):
+        # We can release the port after a certain number of clients have connected.
+        # Singleton will be unlocked once this client's message is complete:
+        peer.releases = bool(self.release_threshold) and (self._clients >= self.release_threshold)
+
+    def _admit(self, connection, address):
         """
-        Number of client processes that have connected since this singleton was created.
+        Take an admission token for a new connection.
 
-        Useful for monitoring singleton usage, debugging, or implementing
-        custom logic based on connection count.
+        With admission_per_peer, TCP peers are keyed by address and Unix socket peers
+        by their user id (SO_PEERCRED) - a runaway script gets a new pid per launch.
+
+        Returns:
+            True if the connection is within admission_rate/admission_burst.
         """
-        return self._clients
 
+        key = None
+        if self.admission_per_peer:
+            if isinstance(address, tuple):
+                key = address[0]
+            else:
+                # Without peer credentials, Unix socket peers share one bucket
+                credentials = _peer_credentials(connection)
+                key = ("uid", credentials[1]) if credentials is not None else ""
+        bucket = self._admission.get(key)
+        if bucket is None:
+            if len(self._admission) >= _ADMISSION_PEERS:
+                # Forget peers whose buckets have refilled - they are back at the default
+                now = self._clock()
+                for peer in [peer for peer, b in self._admission.items() if b.full(now)]:
+                    del self._admission[peer]
+            bucket = self._admission[key] = _TokenBucket(
+                self.admission_rate, self.admission_burst, self._clock
+            )
+        return bucket.take()
 
-class MultipleSingletonsError(Exception):
-    """
-    Raised when attempting to create a singleton instance but one already exists.
+    def _service(self, connection, events):
+        """Selector callback: read from (or flush writes to) a client connection."""
+
+        peer = self._peers[connection]
+
+        if events & selectors.EVENT_WRITE:
+            self._flush_peer(connection, peer)
+
+        if not events & selectors.EVENT_READ or connection not in self._peers:
+            return
+
+        # Receive into the server thread's pooled buffer - no per-read allocation
+        try:
+            size = connection.recv_into(self._receive_buffer)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            size = 0
+
+        if not size:
+            # Client closed its end. Legacy clients send one message and close, so the
+            # host only closes after them - a host-side close first would leave the
+            # port in TIME_WAIT and block the next instance from binding after release.
+            if not peer.framed:
+                self._end_message(peer, bytes(peer.buffer or b""))
+            self._close_peer(connection)
+            return
+
+        data = self._receive_view[:size]
+        if peer.buffer is None and not peer.framed:
+            if data[0] == _FRAME_MARKER:
+                peer.framed = True
+            elif peer.process is None:
+                self._count_client(peer)
+
+        if peer.framed and peer.buffer is None:
+            # Common case: whole frames straight from the receive buffer; only a
+            # trailing partial frame is copied out.
+            consumed = self._read_frames(connection, peer, data)
+            if consumed is not None and consumed < size:
+                peer.buffer = self._buffers.acquire()
+                peer.buffer += data[consumed:]
+            return
+
+        if peer.buffer is None:
+            peer.buffer = self._buffers.acquire()
+        peer.buffer += data
+        if len(peer.buffer) > _MAX_MESSAGE_SIZE + _FRAME.size:
+            self._warn(
+                "message_too_large",
+                "Message from client on port %d exceeds %d bytes, dropping connection",
+                self.port,
+                _MAX_MESSAGE_SIZE,
+            )
+            self._close_peer(connection)
+            return
+
+        if peer.framed:
+            consumed = self._read_frames(connection, peer, peer.buffer)
+            if consumed is not None:
+                del peer.buffer[:consumed]
+                if not peer.buffer:
+                    self._buffers.release(peer.buffer)
+                    peer.buffer = None
+
+    def _read_frames(self, connection, peer, buffer):
+        """
+        Handle every complete frame in a buffer from a framed-protocol connection.
+
+        Returns:
+            The number of bytes consumed, or None if the connection was closed.
+        """
+
+        view = memoryview(buffer)
+        try:
+            position = 0
+            while len(view) - position >= _FRAME.size:
+                marker, kind, flags, length = _FRAME.unpack_from(view, position)
+                end = position + _FRAME.size + length
+                if marker != _FRAME_MARKER or length > _MAX_MESSAGE_SIZE:
+                    self._close_peer(connection)
+                    return None
+                if len(view) < end:
+                    break
+                payload = view[position + _FRAME.size : end]
+                position = end
+                self._handle_frame(connection, peer, kind, flags, payload)
+                if connection not in self._peers:
+                    return None
+        finally:
+            # Release the export so a bytearray buffer can be resized afterwards
+            view.release()
+
+        # One cumulative acknowledgement per pass, not per message, once dispatched
+        if peer.acks and peer.received != peer.acknowledged:
+            self._unacked.add(connection)
+
+        return position
+
+    def _handle_frame(self, connection, peer, kind, flags, payload):
+        """Dispatch a single frame from a framed-protocol connection."""
+
+        if self._brokered and connection is self._sock and kind in (_FRAME_MESSAGE, _FRAME_ARGS):
+            # Each argument set the broker routes here is from one client process
+            self._clients += 1
+
+        if kind == _FRAME_MESSAGE and peer.verified:
+            peer.received += 1
+            message = None
+            if peer.process and not peer.releases and self._consuming():
+                message = self._read_message(connection, flags, payload)
+                if connection not in self._peers:
+                    return
+
+            if flags & _FLAG_REPLY:
+                if not message:
+                    self._reply(connection, [])
+                elif not self._reply_from_cache(connection, message):
+                    self._receive(message, reply=connection)
+            elif message:
+                self._receive(message)
+        elif kind == _FRAME_ARGS and peer.verified:
+            peer.received += 1
+            if peer.process and not peer.releases and self._consuming():
+                if flags & _FLAG_COMPRESSED:
+                    payload = self._decompress(connection, flags, payload)
+                    if payload is None:
+                        return
+                args = ArgumentSet(bytes(payload))
+                if args:
+                    self._receive(args)
+        elif kind == _FRAME_HELLO and not peer.verified:
+            if peer.process is None:
+                self._count_client(peer)
+            self._welcome(connection, peer, flags, bytes(payload))
+        elif kind == _FRAME_SUBSCRIBE and not peer.verified:
+            self._subscribe(connection, peer, bytes(payload))
+        elif kind == _FRAME_IDENTIFY and not peer.verified:
+            # Names are not secret: anyone may ask who holds the port
+            identity = {"name": self.name, "pid": os.getpid()}
+            self._post(connection, _frame(_FRAME_IDENTIFY, _pack_value(identity)))
+        elif kind == _FRAME_SHM_REQUEST:
+            if peer.process is None:
+                self._count_client(peer)
+            self._grant_lane(connection, peer, bytes(payload))
+        elif kind == _FRAME_DOORBELL:
+            # Lanes are drained after every selector pass
+            pass
+        else:
+            self._close_peer(connection)
+
+    def _read_message(self, connection, flags, payload):
+        """
+        Decompress (if flagged) and parse a MESSAGE frame's payload.
+
+        Returns:
+            The Message, or None if it could not be decoded (or the connection was
+            closed because of it).
+        """
+
+        if flags & _FLAG_COMPRESSED:
+            payload = self._decompress(connection, flags, payload)
+            if payload is None:
+                return None
+        try:
+            return Message(payload)
+        except ValueError:
+            self._warn(
+                "decode_failed",
+                "Failed to decode message from client on port %d, skipping arguments",
+                self.port,
+            )
+            return None
+
+    def _reply_from_cache(self, connection, message):
+        """
+        Answer a reply-mode request from the result cache, without queueing it.
+
+        Only possible when every observer is cacheable and has a live cached result
+        for these arguments, and no pull consumer is waiting for argument sets.
+        Subscriber processes still receive the argument set.
+
+        Returns:
+            True if the reply was sent.
+        """
+
+        if self._cache is None or not self._observers or self._pulling:
+            return False
+
+        args = tuple(message.args)
+        now = self._clock()
+        results = []
+        for key, (_, _, _, worker, cacheable, weak) in list(self._observers.items()):
+            if not cacheable or worker is not None or (weak and key() is None):
+                return False
+            result = self._cache.get((key, args), now)
+            if result is _ResultCache.MISS:
+                return False
+            results.append(result)
+
+        # Everything _receive() does, short of queueing for the observers
+        self._active = now
+        if self._subscribers:
+            self._publish(message)
+        self._stats["cache_hits"] += len(results)
+        self._reply(connection, results)
+        return True
+
+    def _reply(self, connection, results):
+        """
+        Send the results of a reply-mode request back to its client.
+
+        Safe to call from any thread: replies produced off the server thread are
+        queued and sent by it.
+        """
+
+        self._post(connection, _frame(_FRAME_REPLY, _pack_results(results, self.verbose)))
+
+    def _post(self, connection, data):
+        """Send data to a client connection from any thread (via the server thread)."""
+
+        if current_thread() is self._thread:
+            peer = self._peers.get(connection)
+            if peer is not None:
+                self._send(connection, peer, data)
+        else:
+            self._outbox.append((connection, data))
+            self._wake()
+
+    def _subscribe(self, connection, peer, payload):
+        """
+        Register a subscriber process: verify it, then fan out argument sets to it.
+        """
+
+        try:
+            secret, routes = _unpack_value(payload, 0)[0]
+            if secret is not None and not isinstance(secret, str):
+                raise TypeError("secret must be a string")
+            if routes is not None:
+                routes = frozenset(routes)
+        except (ValueError, TypeError, IndexError, RecursionError, struct.error):
+            # Malformed subscription - never let it reach the server thread's loop
+            self._close_peer(connection)
+            return
+
+        if not self._verify((secret or "").encode("utf-8")):
+            self._send(connection, peer, _frame(_FRAME_REJECT))
+            return
+
+        peer.verified = True
+        self._subscribers[connection] = routes
+        self._send(connection, peer, _frame(_FRAME_WELCOME))
+
+    def _publish(self, args):
+        """
+        Fan an argument set out to subscribers whose routes match its first argument.
+
+        The message is encoded once and shared by every subscriber. A subscriber whose
+        unsent backlog exceeds subscriber_buffer is disconnected as too slow.
+        """
+
+        route = None
+        data = None
+        for connection, routes in list(self._subscribers.items()):
+            if routes is not None:
+                if route is None:
+                    route = _args_of(args)[0]
+                if route not in routes:
+                    continue
+            if data is None:
+                if isinstance(args, Message) and args._payload is not None:
+                    payload = args._payload
+                else:
+                    payload = Message.encode(_args_of(args))
+                data = _frame(_FRAME_PUBLISH, payload)
+
+            peer = self._peers.get(connection)
+            if peer is None:
+                continue
+            self._send(connection, peer, data)
+            if len(peer.outgoing) > self.subscriber_buffer:
+                self._stats["subscribers_dropped"] += 1
+                self._warn(
+                    "subscriber_dropped",
+                    "Subscriber on port %d is too slow, dropping connection",
+                    self.port,
+                )
+                self._close_peer(connection)
+
+    def _decompress(self, connection, flags, payload):
+        """
+        Decompress a frame payload, dropping the connection if it is corrupt or would
+        decompress past _MAX_MESSAGE_SIZE (a decompression bomb).
+
+        Returns:
+            The decompressed payload, or None if the connection was closed.
+        """
+
+        try:
+            return _decompress(flags, payload)
+        except ValueError as err:
+            self._warn(
+                "decompress_failed",
+                "Rejected compressed message from client on port %d (%s), dropping connection",
+                self.port,
+                err,
+            )
+            self._close_peer(connection)
+            return None
+
+    def _verify(self, payload):
+        """
+        Verify the secret sent in a framed-protocol handshake.
+
+        Returns:
+            True if no secret is required or the payload matches it.
+        """
+
+        if self.secret is None or payload.decode("utf-8", errors="replace") == self.secret:
+            return True
+
+        self._warn(
+            "verification_failed",
+            "Client verification failed on port %d, ignoring connection",
+            self.port,
+        )
+        return False
+
+    def _welcome(self, connection, peer, flags, payload):
+        """
+        Persistent-connection handshake: verify the client and accept pipelined frames.
+        """
+
+        if not self._verify(payload):
+            self._send(connection, peer, _frame(_FRAME_REJECT))
+            return
+
+        peer.verified = True
+        peer.acks = bool(flags & _FLAG_ACK)
+        # Advertise the codecs this host can decompress; the client picks one
+        self._send(connection, peer, _frame(_FRAME_WELCOME, flags=_supported_codecs()))
+
+    def _send_acks(self):
+        """Acknowledge what was received in this selector pass, after it was dispatched."""
+
+        while self._unacked:
+            connection = self._unacked.pop()
+            peer = self._peers.get(connection)
+            if peer is not None and peer.received != peer.acknowledged:
+                self._queue_ack(connection, peer)
+
+    def _queue_ack(self, connection, peer):
+        """
+        Acknowledge everything received so far.
+
+        Acknowledgements are cumulative, so while earlier output is still waiting for
+        the socket, only the latest count needs sending - it is deferred to
+        _flush_peer instead of growing the buffer.
+        """
+
+        if peer.outgoing:
+            return
+        peer.acknowledged = peer.received
+        self._send(connection, peer, _frame(_FRAME_ACK, _ACK.pack(peer.received)))
+
+    def _send(self, connection, peer, data):
+        """Queue data for a client connection, writing as much as possible now."""
+
+        peer.outgoing += data
+        self._flush_peer(connection, peer)
+
+    def _flush_peer(self, connection, peer):
+        """Write buffered outgoing data; wait for EVENT_WRITE while the socket is full."""
+
+        try:
+            sent = connection.send(peer.outgoing) if peer.outgoing else 0
+        except (BlockingIOError, InterruptedError):
+            sent = 0
+        except OSError:
+            # The client closed its end (e.g. a one-shot client, right after writing).
+            # Frames it already sent are still read; the connection closes at EOF.
+            sent = len(peer.outgoing)
+
+        del peer.outgoing[:sent]
+        if not peer.outgoing and peer.acks and peer.received != peer.acknowledged:
+            self._unacked.add(connection)
+
+        # Only touch the selector when write interest actually changes
+        writing = bool(peer.outgoing)
+        if writing != peer.writing:
+            peer.writing = writing
+            self._update_interest(connection, peer)
+
+    def _close_peer(self, connection):
+        """Unregister and close a client connection, releasing its shared-memory lane."""
+
+        peer = self._peers.pop(connection, None)
+        if peer is None:
+            return
+        self._subscribers.pop(connection, None)
+        self._unacked.discard(connection)
+
+        if peer.buffer is not None:
+            self._buffers.release(peer.buffer)
+            peer.buffer = None
+
+        if self._selector is not None and peer.events:
+            self._selector.unregister(connection)
+        connection.close()
+
+        if peer.lane is not None and self._shm is not None:
+            self._drain_lane(peer.lane, peer.process)
+            self._shm.free(peer.lane)
+
+        if peer.releases or (self._brokered and connection is self._sock):
+            # Released by threshold, or the broker holding our slot went away
+            self.release()
+
+    def _end_message(self, peer, data):
+        """
+        Publish the argument set from a complete legacy (NUL-delimited) message.
+        """
+
+        if peer.releases:
+            # Released on close - this client's arguments are not processed
+            return
+
+        if not (peer.process and self._consuming()):
+            return
+
+        args = self._decode_message(data)
+        if args:
+            self._receive(args)
+
+    def _decode_message(self, data):
+        """
+        Decode and verify a NUL-delimited message: optional secret, then arguments.
+
+        Returns:
+            The argument tuple, or None if the message fails verification or decoding.
+        """
+
+        # Defensively decode:
+        try:
+            # Receive all arguments from this client as a single package
+            # Use null byte (\x00) as delimiter to avoid issues with newlines
+            start = 0
+
+            # If secret is required, verify it
+            if self.secret is not None:
+                end = data.find(b"\x00")
+                end = len(data) if end < 0 else end
+                if data[:end].decode("utf-8", errors="replace") != self.secret:
+                    # Secret mismatch - ignore this connection
+                    self._warn(
+                        "verification_failed",
+                        "Client verification failed on port %d, ignoring connection",
+                        self.port,
+                    )
+                    return None
+                # Skip the secret, keep only arguments
+                start = end + 1
+
+            # Arguments are split lazily; empty strings are filtered out
+            return ArgumentSet(data, start)
+        except (UnicodeDecodeError, AttributeError):
+            # Invalid data received - skip this client's arguments
+            self._warn(
+                "decode_failed",
+                "Failed to decode data from client on port %d, skipping arguments",
+                self.port,
+            )
+            return None
+
+    def _shm_active(self):
+        """True if any shared-memory lane is currently assigned to a client."""
+
+        return self._shm is not None and self._shm.active
+
+    def _grant_lane(self, connection, peer, payload):
+        """
+        Shared-memory handshake: verify the client and assign it a ring-buffer lane.
+
+        The socket stays open for the lifetime of the lane; closing it frees the lane.
+        """
+
+        verified = self._verify(payload)
+        lane = self._shm.allocate() if (self._shm is not None and verified) else None
+
+        if lane is None:
+            self._send(connection, peer, _frame(_FRAME_REJECT))
+            return
+
+        peer.lane = lane
+        grant = {
+            "name": self._shm.name,
+            "offset": self._shm.offset(lane),
+            "capacity": self._shm.lane_size,
+        }
+        self._send(connection, peer, _frame(_FRAME_SHM_GRANT, json.dumps(grant).encode("utf-8")))
+
+    def _drain_lanes(self):
+        """Drain every assigned shared-memory lane in one batch."""
+
+        for peer in list(self._peers.values()):
+            if peer.lane is not None:
+                self._drain_lane(peer.lane, peer.process)
+
+    def _drain_lane(self, lane, process):
+        """Publish all complete argument frames waiting in a shared-memory lane."""
+
+        consuming = self._consuming()
+        ring = self._shm.lane(lane)
+        resyncs = ring.resyncs
+        for payload in ring.read():
+            if process and consuming:
+                args = ArgumentSet(payload)
+                if args:
+                    self._receive(args)
+
+        if ring.resyncs != resyncs:
+            self._stats["shm_resyncs"] += ring.resyncs - resyncs
+            self._warn(
+                "decode_failed",
+                "Corrupt entry in shared-memory lane %d on port %d, dropped the lane's backlog",
+                lane,
+                self.port,
+            )
+
+    @staticmethod
+    def connect(
+        address="127.0.0.1",
+        port=1337,
+        secret=None,
+        ack=False,
+        timeout=5,
+        env=(),
+        compression_threshold=0,
+        transport=None,
+        endpoints=(),
+    ):
+        """
+        Open a persistent, pipelined connection to a running host.
+
+        Unlike the one-shot client behaviour of the constructor, the returned
+        Connection keeps one socket open and streams any number of argument sets over
+        it, so bulk producers pay for connection setup once.
+
+        Args:
+            address: Host address. Defaults to "127.0.0.1".
+            port: Host port. Defaults to 1337.
+            secret: Secret expected by the host, if any. Defaults to None.
+            ack: If True, the host acknowledges received argument sets and
+                Connection.flush() waits for them. Defaults to False.
+            timeout: Seconds to wait for the connection, the handshake, and (in ack
+                mode) acknowledgements. Defaults to 5.
+            env: Names of environment variables forwarded with every message.
+                Defaults to () (none).
+            compression_threshold: Compress messages of at least this many bytes, with
+                lz4 if both sides have it installed and zlib otherwise. Defaults to 0
+                (no compression).
+            transport: The host's transport, e.g. a LoopbackTransport. Defaults to
+                None (TCP).
+            endpoints: The host's additional endpoints (see the constructor). The
+                cheapest reachable one, or address/port, is used. Defaults to () (none).
+
+        Returns:
+            A Connection. Use it as a context manager or call close().
+
+        Example:
+            with Socket_Singleton.connect(port=50123, ack=True) as connection:
+                connection.send_many(("open", path) for path in paths)
+                connection.flush()  # Wait until the host has received them all
+        """
+
+        return Connection(
+            address, port, secret, ack, timeout, env, compression_threshold, transport, endpoints
+        )
+
+    @staticmethod
+    def subscribe(address="127.0.0.1", port=1337, secret=None, routes=None, timeout=5):
+        """
+        Subscribe another process to the argument sets a running host receives.
+
+        The host fans every argument set out to its subscribers over their persistent
+        connections, in addition to (and before) dispatching it to its own observers,
+        making it a small local pub/sub hub.
+
+        Args:
+            address: Host address. Defaults to "127.0.0.1".
+            port: Host port. Defaults to 1337.
+            secret: Secret expected by the host, if any. Defaults to None.
+            routes: Optional iterable of first arguments (e.g. ("open", "--focus")) to
+                receive; other argument sets are not sent. Defaults to None (all).
+            timeout: Seconds to wait for the connection and handshake. Defaults to 5.
+
+        Returns:
+            A Subscription yielding a Message per argument set.
+
+        Example:
+            with Socket_Singleton.subscribe(port=50123, routes=("open",)) as events:
+                for message in events:
+                    index(message.args[1:], message.cwd)
+        """
+
+        return Subscription(address, port, secret, routes, timeout)
+
+    @staticmethod
+    def discover(name):
+        """
+        Read a named singleton's discovery file, without connecting to anything.
+
+        The host of Socket_Singleton(name=...) writes the file on startup and removes
+        it on release; it lives in a private per-user directory under $XDG_RUNTIME_DIR
+        (or the temp directory). A host that crashed leaves a stale file behind - the
+        port is verified on use.
+
+        Returns:
+            Dict with "name", "pid", "address", "port", "transport", "endpoints"
+            (additional endpoints, see the `endpoints` parameter) and "started" (Unix
+            time), or None if no host has recorded itself.
+        """
+
+        try:
+            with open(_discovery_path(name), encoding="utf-8") as discovery:
+                record = json.load(discovery)
+        except (OSError, ValueError):
+            return None
+        return record if isinstance(record, dict) else None
+
+    def _create_client(self):
+        """
+        Client behavior when port is already bound.
+
+        Connects to the existing host server and sends this process's command-line
+        arguments. Called automatically when binding fails due to port already in use.
+        """
+
+        try:
+            if self.endpoints:
+                self._sock.close()
+                primary = (self.address, self.port)
+                self._sock = _connect_cheapest((primary, *self.endpoints), _CONNECT_TIMEOUT)
+            else:
+                self._sock.connect((self.address, self.port))
+            with self._sock as sock:
+                if self.legacy_client:
+                    # Understood by hosts of every version
+                    sock.sendall(_legacy_message(self.secret, argv[1:]))
+                else:
+                    # Handshake (secret) and structured message in one write - the host
+                    # ignores the message if verification fails, so no round trip is needed.
+                    hello = (self.secret or "").encode("utf-8")
+                    message, flags = self._client_message()
+                    sock.sendall(
+                        _frame(_FRAME_HELLO, hello) + _frame(_FRAME_MESSAGE, message, flags)
+                    )
+        except (OSError, ConnectionRefusedError):
+            # Connection failures can occur due to race conditions (especially with
+            # rapid successive launches), port conflicts with other applications,
+            # erroneous manual release() calls, timeouts, etc.
+            #
+            # Some uncommon but possible scenarios:
+            # 1. Host releases port between our bind() attempt and connect() attempt
+            # 2. Host timeout expires between bind() and connect()
+            # 3. Host process crashes/killed before we can connect
+            # 4. Port in use by non-singleton application
+            #
+            # Silently handle these failures - the client will exit/raise exception
+            # as expected regardless. The important singleton enforcement behavior
+            # (preventing multiple instances) is already achieved by the failed bind().
+            self._warn(
+                "connect_failed",
+                "Failed to connect to existing instance on %s:%d (port may have been released)",
+                self.address,
+                self.port,
+            )
+
+            # Turn a lost launch into a delayed one - the next host drains the spool
+            if self.spool is not None and argv[1:]:
+                try:
+                    _Spool(self.spool, self.port).append(tuple(argv[1:]))
+                except OSError as err:
+                    self._warn("spool_failed", "Failed to spool arguments: %s", err)
+
+    def _client_message(self):
+        """
+        Encode this process's arguments and context as a MESSAGE frame payload.
+
+        Returns:
+            (payload, frame flags)
+        """
+
+        message = Message.encode(
+            argv[1:],
+            cwd=os.getcwd(),
+            pid=os.getpid(),
+            env={name: os.environ[name] for name in self.env if name in os.environ},
+            metadata=self.metadata,
+        )
+        # Every host that speaks the framed protocol accepts zlib, so a one-shot
+        # client can compress without negotiating first
+        return _compress(message, self.compression_threshold)
+
+    def _drain_spool(self):
+        """
+        Queue argument sets spooled by clients while no host was reachable.
+
+        Spooled entries are delivered in order once observers are registered. They
+        stay in the spool until they are journaled (if configured) or dispatched, so a
+        host that dies first leaves them to its successor.
+        """
+
+        spool = _Spool(self.spool, self.port)
+        try:
+            spooled, size = spool.drain()
+        except OSError as err:
+            self._warn("spool_failed", "Failed to drain spool %s: %s", self.spool, err)
+            return
+        if not size:
+            return
+
+        sequences = {self._append_args(args) for args in spooled}
+        self._spooled = (spool, size, sequences)
+        if self._journal is not None:
+            self._journal.sync()
+            self._consume_spool()
+        elif not sequences:
+            # Only a torn tail - nothing to deliver
+            self._consume_spool()
+
+    def _consume_spool(self):
+        """Remove the drained records from the spool. Idempotent."""
+
+        with self._ready:
+            spooled, self._spooled = self._spooled, None
+        if spooled is None:
+            return
+        try:
+            spooled[0].consume(spooled[1])
+        except OSError as err:
+            self._warn("spool_failed", "Failed to drain spool %s: %s", self.spool, err)
+
+    def _open_control(self):
+        """
+        Listen on the handoff control socket and start the control thread.
+
+        A socket already at the path is stale: we hold the port, so no other host can
+        be serving on it. The socket is made accessible to the owner only, and requests
+        from other users are refused (see _serve_control).
+
+        Raises:
+            FileExistsError: If something other than a socket is at the path.
+        """
+
+        _unlink_socket(self.handoff)
+
+        control = socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+        try:
+            control.bind(self.handoff)
+            os.chmod(self.handoff, 0o600)
+            control.listen()
+        except OSError:
+            control.close()
+            raise
+        self._control = control
+        self._control_thread = Thread(target=self._serve_control, args=(control,), daemon=True)
+        self._control_thread.start()
+
+    def _close_control(self):
+        """Stop listening on the handoff control socket and remove its path. Idempotent."""
+
+        control, self._control = self._control, None
+        if control is None:
+            return
+
+        try:
+            # Unblock accept() in the control thread
+            control.shutdown(_socket.SHUT_RDWR)
+        except OSError:
+            pass
+        control.close()
+
+        try:
+            _unlink_socket(self.handoff)
+        except FileExistsError:
+            # Replaced since we bound it - not ours to remove
+            pass
+
+    def _serve_control(self, control):
+        """
+        Control thread that waits for a successor process to request a handoff.
+
+        Runs until the handoff succeeds or the control socket is closed by release().
+        Only processes of the same user (SO_PEERCRED, where available) that present the
+        secret are handed the socket.
+        """
+
+        while self._listening and self._control is control:
+            try:
+                connection, _ = control.accept()
+            except OSError:
+                return
+
+            with connection:
+                credentials = _peer_credentials(connection)
+                if credentials is not None and credentials[1] != os.getuid():
+                    self._warn(
+                        "verification_failed",
+                        "Handoff request on %s from another user (uid %d), ignoring it",
+                        self.handoff,
+                        credentials[1],
+                    )
+                    continue
+
+                try:
+                    request = _recv_exactly(connection, len(_HANDOFF_REQUEST) + _LENGTH.size)
+                    if not request.startswith(_HANDOFF_REQUEST):
+                        continue
+                    (length,) = _LENGTH.unpack(request[len(_HANDOFF_REQUEST) :])
+                    secret = _recv_exactly(connection, min(length, 4096))
+                except (OSError, ConnectionError):
+                    continue
+
+                if self.secret is not None and not hmac.compare_digest(
+                    secret, self.secret.encode("utf-8")
+                ):
+                    self._warn(
+                        "verification_failed",
+                        "Handoff verification failed on %s, ignoring request",
+                        self.handoff,
+                    )
+                    continue
+
+                if self._hand_off(connection):
+                    return
+
+    def _hand_off(self, connection):
+        """
+        Transfer the listening socket and undelivered arguments to a successor.
+
+        Stops the server thread without closing the listening socket, then sends its
+        descriptor via SCM_RIGHTS along with the pending argument queue: each set's
+        encoded Message, so its priority and client context travel with it. The
+        kernel keeps the port bound throughout; if the server thread doesn't stop in
+        time (an observer is blocking it) or the successor never acknowledges, this
+        host resumes serving.
+
+        Returns:
+            True if the successor acknowledged the handoff.
+        """
+
+        self._handing_off = True
+        self._listening = False
+        self._wake()
+        self._thread.join(_JOIN_TIMEOUT)
+        if self._thread.is_alive():
+            # Still in an observer call - it carries on serving once that returns
+            self._listening = True
+            self._handing_off = False
+            self._warn(
+                "handoff_failed",
+                "Server thread did not stop for the handoff on %s, resuming on port %d",
+                self.handoff,
+                self.port,
+            )
+            return False
+
+        # The successor binds its own control socket at the same path
+        self._close_control()
+
+        if self._journal is not None:
+            # The successor may reopen the same journal - make it complete on disk
+            self._journal.close()
+            self._journal = None
+
+        # The successor drains the spool on startup - spooled sets travel in the queue
+        self._consume_spool()
+
+        # Sets the watchdog took over part-way are still undelivered here
+        pending = [(self._priority_of(item), (seq, item)) for seq, item, _, _ in self._handover]
+        pending.extend(self._arguments.items())
+        payload = b"".join(_handoff_entry(seq, item, priority) for priority, (seq, item) in pending)
+        fds = array("i", [self._sock.fileno()])
+        try:
+            connection.sendmsg(
+                [_LENGTH.pack(len(payload))],
+                [(_socket.SOL_SOCKET, _socket.SCM_RIGHTS, fds)],
+            )
+            connection.sendall(payload)
+            acknowledged = _recv_exactly(connection, len(_HANDOFF_ACK)) == _HANDOFF_ACK
+        except (OSError, ConnectionError):
+            acknowledged = False
+
+        self._handing_off = False
+
+        if not acknowledged:
+            self._warn(
+                "handoff_failed",
+                "Handoff on %s was not acknowledged, resuming on port %d",
+                self.handoff,
+                self.port,
+            )
+            self._sock.setblocking(True)
+            self._listening = True
+            if self.journal is not None:
+                self._open_journal()
+            if self.shm_lanes:
+                self._shm = _ShmRing(self.shm_lanes, self.shm_lane_size)
+            self._thread = Thread(target=self._create_server, daemon=True)
+            self._thread.start()
+            self._open_control()
+            return False
+
+        self._sock.close()
+        self._close_wake()
+        self._cancel_timers()
+        self._arguments.clear()
+        self._handover.clear()
+        self._replies.clear()
+        self._clear_observers()
+        self._closed = True
+        self._notify_consumers()
+
+        if self.on_handoff is not None:
+            self.on_handoff(self)
+
+        return True
+
+    def _take_over(self):
+        """
+        Request the running host's listening socket over the handoff control socket.
+
+        Called when binding fails and takeover=True. On success this instance becomes
+        the host, serving the same (never unbound) port and the predecessor's pending
+        arguments.
+
+        Returns:
+            True if this instance is now the host, False if the handoff failed.
+        """
+
+        control = socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+        try:
+            with control:
+                control.connect(self.handoff)
+                secret = (self.secret or "").encode("utf-8")
+                control.sendall(_HANDOFF_REQUEST + _LENGTH.pack(len(secret)) + secret)
+
+                fds = array("i")
+                header, ancdata, _, _ = control.recvmsg(
+                    _LENGTH.size, _socket.CMSG_LEN(fds.itemsize)
+                )
+                for level, kind, data in ancdata:
+                    if level == _socket.SOL_SOCKET and kind == _socket.SCM_RIGHTS:
+                        fds.frombytes(data[: len(data) - (len(data) % fds.itemsize)])
+
+                if not fds:
+                    raise ConnectionError("no socket received")
+
+                sock = socket(fileno=fds[0])
+                try:
+                    if len(header) < _LENGTH.size:
+                        header += _recv_exactly(control, _LENGTH.size - len(header))
+                    (length,) = _LENGTH.unpack(header)
+                    pending = _handoff_entries(_recv_exactly(control, length))
+                    control.sendall(_HANDOFF_ACK)
+                except BaseException:
+                    sock.close()
+                    raise
+
+        except (OSError, ConnectionError, ValueError):
+            self._warn(
+                "handoff_failed", "Handoff from %s failed for port %d", self.handoff, self.port
+            )
+            return False
+
+        self._sock.close()
+        self._sock = sock
+        self._sock.setblocking(True)
+        for seq, item, priority in pending:
+            self._arguments.append((seq, item), priority)
+        if pending:
+            self._sequence = count(max(seq for seq, _, _ in pending) + 1)
+        self._start_host()
+        return True
+
+    def _append_args(self, args, reply=None):
+        """
+        Append a complete argument set from a client to the queue and notify pull consumers.
+
+        `args` is a tuple of strings or a Message. Records receipt in the journal
+        (if configured) before queueing, in the lane for its priority. `reply` is the
+        connection of a reply-mode client waiting for the observers' results. Observers
+        are called by _dispatch(), once the server thread's selector pass is done; from
+        another thread, this waits for that dispatch.
+
+        Returns:
+            The argument set's sequence number.
+        """
+
+        seq = next(self._sequence)
+        if reply is not None:
+            self._replies[seq] = reply
+        if self._journal is not None:
+            self._journal.received(seq, _args_of(args))
+
+        self._arguments.append((seq, args), self._priority_of(args))
+        if self._pulling and self._arguments:
+            self._notify_consumers()
+        if self._observers and self._thread is not current_thread():
+            self._request_dispatch()
+        return seq
+
+    def _priority_of(self, args):
+        """Queue priority of an argument set: the higher of the client's and the callable's."""
+
+        requested = args.priority if isinstance(args, Message) else 0
+        if self.priority is None:
+            return requested
+
+        try:
+            return max(requested, int(self.priority(_args_of(args))))
+        except Exception as exc:
+            # A faulty priority function shouldn't crash the server thread
+            self._warn(
+                "callback_error",
+                "Priority function raised exception: %s: %s",
+                type(exc).__name__,
+                exc,
+            )
+            return requested
+
+    def _receive(self, args, reply=None):
+        """
+        Hand an argument set received from a client to subscriber processes, then to
+        observers and pull consumers.
+        """
+
+        self._active = self._clock()
+        if self._subscribers:
+            self._publish(args)
+        if self._pulling or self._observers:
+            self._append_args(args, reply)
+        elif reply is not None:
+            self._reply(reply, [])
+
+    def _consuming(self):
+        """
+        Whether received argument sets are wanted (observers, pull consumers or
+        subscriber processes).
+        """
+
+        return self._pulling or bool(self._observers) or bool(self._subscribers)
+
+    def _notify_consumers(self):
+        """Wake pull consumers blocked in get() or iterating messages_async()."""
+
+        with self._ready:
+            self._ready.notify_all()
+        for loop, ready in list(self._async_waiters):
+            try:
+                loop.call_soon_threadsafe(ready.set)
+            except RuntimeError:
+                # Event loop already closed
+                self._async_waiters.discard((loop, ready))
+
+    def _complete(self, seq):
+        """Record a dispatched argument set as completed in the journal (if configured)."""
+
+        journal = self._journal
+        if journal is not None:
+            journal.completed(seq)
+            # Bulk writes: hand buffered records to the OS once the burst is drained
+            if not self._arguments:
+                journal.flush()
+
+        spooled = self._spooled
+        if spooled is not None and seq in spooled[2]:
+            spooled[2].discard(seq)
+            if not spooled[2]:
+                self._consume_spool()
+
+    def _dispatch(self):
+        """Publish queued argument sets to the observers, most urgent lane first."""
+
+        if not (self._handover or (self._arguments and self._observers)):
+            return
+
+        thread = current_thread()
+        watched = (
+            self.observer_budget
+            and self.quarantine is not None
+            and self._listening
+            and thread is self._thread
+        )
+        if watched:
+            self._watch(thread)
+        try:
+            # Argument sets the watchdog took over part-way come first (see _watchdog_check)
+            while self._handover:
+                seq, item, entries, results = self._handover.popleft()
+                entries = [(key, entry) for key, entry in entries if key in self._observers]
+                self._deliver(seq, item, entries, results)
+                if thread in self._abandoned:
+                    return
+            while self._arguments and self._observers:
+                self._update_observers()
+                if thread in self._abandoned:
+                    # The watchdog replaced this thread - its successor dispatches the rest
+                    return
+        finally:
+            if watched and thread is self._thread:
+                self._calling = None
+
+    def _watch(self, thread):
+        """Arm the observer watchdog, unless already armed, for a dispatch on thread."""
+
+        with self._watchdog_lock:
+            self._calling = (thread, None, None, self._clock(), None)
+            if self._watchdog is None:
+                self._watchdog = self._scheduler.call_later(
+                    self.observer_budget * _WATCHDOG_FACTOR, self._watchdog_check
+                )
+
+    def _watchdog_check(self):
+        """
+        Scheduler callback: while the server thread dispatches, check that no observer
+        call has run for _WATCHDOG_FACTOR times observer_budget.
+
+        Python cannot interrupt a call, so a blocked one is left behind: its observer is
+        quarantined, and a new server thread takes over the selector loop, starting with
+        the observers the blocked call was holding up. The old thread stops as soon as
+        the call returns. The timer is re-armed lazily by the next dispatch once the
+        server thread is idle.
+        """
+
+        with self._watchdog_lock:
+            calling = self._calling
+            if calling is None or not self._listening:
+                self._watchdog = None
+                return
+            thread, key, observer, started, delivery = calling
+            remaining = started + self.observer_budget * _WATCHDOG_FACTOR - self._clock()
+            if remaining > 0 or key is None or thread is not self._thread:
+                self._watchdog = self._scheduler.call_later(
+                    max(remaining, self.observer_budget), self._watchdog_check
+                )
+                return
+
+            self._watchdog = None
+            self._calling = None
+            self._abandoned.add(thread)
+            # The rest of the argument set, for the observers after the blocked one
+            seq, item, entries, index, results = delivery
+            results = results + [None] if entries[index][1][4] else list(results)
+            self._handover.append((seq, item, entries[index + 1 :], results))
+
+            self._warn(
+                "observer_blocked",
+                "Observer %s blocked the server thread for %.1f ms, moving on without it",
+                getattr(observer, "__name__", observer),
+                (self._clock() - started) * 1000,
+            )
+            self._overruns.pop(key, None)
+            # Before the new thread dispatches anything, so it never calls the observer
+            self._quarantine(key, observer)
+
+            self._thread = Thread(target=self._serve, daemon=True)
+            self._thread.start()
+        # Dispatch what queued up behind the blocked call
+        self._wake()
+
+    def _update_observers(self):
+        """
+        Publish the most recent argument set to all registered observers.
+
+        Implements the observer pattern - notifies all registered callbacks with
+        the latest argument set (an ArgumentSet, or a Message) and their stored
+        args/kwargs. Arguments are consumed (popped) as they're published.
+
+        Each observer receives all arguments from a single client process, allowing
+        them to be processed in the correct context.
+        """
+        if not self._arguments or not self._observers:
+            return
+
+        try:
+            seq, item = self._arguments.popleft()
+        except IndexError:
+            # Consumed concurrently by a pull consumer (get_nowait)
+            return
+
+        self._deliver(seq, item, list(self._observers.items()), [])
+
+    def _deliver(self, seq, item, entries, results):
+        """
+        Call observers with one argument set, then answer a reply-mode client and record
+        the set as completed.
+
+        entries is a snapshot of self._observers items; results holds the results of
+        the cacheable observers called so far - both for a delivery the watchdog took
+        over part-way (see _watchdog_check).
+        """
+
+        args = _args_of(item)
+        message = None
+        budget = self.observer_budget
+        # Server thread calls are watched for blocking observers (see _watchdog_check)
+        thread = current_thread() if budget and self.quarantine is not None else None
+        cache = self._cache
+
+        # The snapshot of the observers dict avoids RuntimeError if untrace() is called
+        # during iteration. This is safe because: observer callables are immutable
+        # references, args are tuples (immutable), and kwargs dicts are only read (not
+        # modified) during callback execution. Weak observers are keyed by their weak
+        # reference.
+        for index, (key, entry) in enumerate(entries):
+            observer_args, observer_kwargs, wants_message, worker, cacheable, weak = entry
+            observer = key() if weak else key
+            if observer is None:
+                # Garbage-collected before its weakref callback ran
+                self._prune_observer(key)
+                continue
+
+            if wants_message and message is None:
+                message = item if isinstance(item, Message) else Message.from_args(item)
+
+            if worker is not None:
+                # Quarantined observer - runs on its own thread
+                worker.put(message if wants_message else args)
+                if cacheable:
+                    results.append(None)
+                continue
+
+            if cacheable and cache is not None:
+                cache_key = (key, tuple(args))
+                result = cache.get(cache_key, self._clock())
+                if result is not _ResultCache.MISS:
+                    self._stats["cache_hits"] += 1
+                    results.append(result)
+                    continue
+                self._stats["cache_misses"] += 1
+
+            result = None
+            started = self._clock() if budget else 0
+            if thread is not None and thread is self._thread:
+                self._calling = (
+                    thread,
+                    key,
+                    observer,
+                    started,
+                    (seq, item, entries, index, results),
+                )
+            try:
+                if wants_message:
+                    result = observer(message, *observer_args, **observer_kwargs)
+                else:
+                    # Pass the complete argument tuple as the first parameter
+                    result = observer(args, *observer_args, **observer_kwargs)
+                if cacheable and cache is not None:
+                    cache.put(cache_key, result, self._clock())
+            except Exception as exc:
+                # Observer exceptions shouldn't crash the server thread
+                self._warn(
+                    "observer_error",
+                    "Observer %s raised exception: %s: %s",
+                    getattr(observer, "__name__", observer),
+                    type(exc).__name__,
+                    exc,
+                )
+
+            if thread is not None and thread in self._abandoned:
+                # The watchdog handed the rest of this argument set to the new server thread
+                return
+            if cacheable:
+                results.append(result)
+            if budget:
+                elapsed = self._clock() - started
+                if elapsed > budget:
+                    self._over_budget(key, observer, elapsed)
+
+        connection = self._replies.pop(seq, None)
+        if connection is not None:
+            self._reply(connection, results)
+        self._complete(seq)
+
+    def _over_budget(self, key, observer, elapsed):
+        """
+        Record an observer call over observer_budget, quarantining repeat offenders.
+
+        key is the observer's key in self._observers - its weak reference if traced with
+        weak=True, otherwise the observer itself.
+        """
+
+        self._stats["slow_calls"] += 1
+        self._overruns[key] += 1
+        self._warn(
+            "slow_call",
+            "Observer %s took %.1f ms (budget %.1f ms)",
+            getattr(observer, "__name__", observer),
+            elapsed * 1000,
+            self.observer_budget * 1000,
+        )
+
+        entry = self._observers.get(key)
+        if self.quarantine is None or entry is None or entry[3] is not None:
+            # Not quarantined, or already (by the watchdog, during this call)
+            return
+        if self._overruns[key] < self.quarantine_after:
+            return
+
+        del self._overruns[key]
+        self._quarantine(key, observer)
+
+    def _quarantine(self, key, observer):
+        """Isolate or detach an observer (see the quarantine parameter)."""
+
+        entry = self._observers.get(key)
+        if entry is None or entry[3] is not None:
+            return
+        if self.quarantine == "detach":
+            del self._observers[key]
+        else:
+            observer_args, observer_kwargs, wants_message, _, cacheable, weak = entry
+            worker = _IsolatedObserver(key, observer_args, observer_kwargs, self.verbose, weak)
+            self._observers[key] = (
+                observer_args,
+                observer_kwargs,
+                wants_message,
+                worker,
+                cacheable,
+                weak,
+            )
+        self._stats["quarantined"] += 1
+
+        self._warn(
+            "quarantined",
+            "Observer %s exceeded its budget, quarantined (%s)",
+            getattr(observer, "__name__", observer),
+            self.quarantine,
+        )
+        if self.on_quarantine is not None:
+            try:
+                self.on_quarantine(observer, self.quarantine)
+            except Exception as exc:
+                self._warn(
+                    "callback_error",
+                    "on_quarantine raised exception: %s: %s",
+                    type(exc).__name__,
+                    exc,
+                )
+
+    def _clear_observers(self):
+        """Remove every observer, stopping the workers of quarantined ones."""
+
+        for _, _, _, worker, _, _ in list(self._observers.values()):
+            if worker is not None:
+                worker.stop()
+        self._observers.clear()
+        self._overruns.clear()
+
+    def _prune_observer(self, key):
+        """Unregister a weak observer whose referent has been garbage-collected."""
+
+        entry = self._observers.pop(key, None)
+        if entry is not None and entry[3] is not None:
+            entry[3].stop()
+        self._overruns.pop(key, None)
+
+    def trace(self, observer, *args, message=False, cacheable=False, weak=False, **kwargs):
+        """
+        Register an observer callback to receive arguments from client processes.
+
+        When arguments arrive from client processes, the observer will be called
+        with all arguments from that client as the first parameter, followed by any
+        args/kwargs provided here.
+
+        The arguments are an ArgumentSet: a read-only sequence that compares equal
+        to (and hashes like) the tuple of its arguments, but is not a tuple - use
+        tuple(args) where a real tuple is needed (isinstance checks, JSON).
+
+        Args:
+            observer: Callable to invoke when arguments arrive. Receives the
+                ArgumentSet of a single client process as the first parameter.
+            *args: Additional positional arguments to pass to observer
+            message: If True, the observer receives a Message (arguments plus the
+                client's cwd, pid, forwarded env and metadata) instead of the
+                ArgumentSet.
+                Defaults to False.
+            cacheable: If True, the observer is idempotent: with cache_size set, its
+                return value is cached per argument tuple and it is not re-run for
+                repeated arguments. Its results are also what reply-mode clients
+                (Connection.request) receive. Defaults to False.
+            weak: If True, only a weak reference to the observer is kept (a WeakMethod
+                for bound methods), so tracing doesn't keep its object alive. Once the
+                object is garbage-collected the observer is unregistered. Defaults to False.
+            **kwargs: Additional keyword arguments to pass to observer
+
+        Example:
+            def my_callback(args_tuple, prefix, suffix="<<<"):
+                # args_tuple is an ArgumentSet equal to ("foo", "bar", "baz")
+                print(f"{prefix}{' '.join(args_tuple)}{suffix}")
+                do_a_thing(args_tuple)
+
+            app.trace(my_callback, ">>> ", suffix=" - Received")
+
+        Argument sets queued before any observer was registered (e.g. drained from
+        the spool or received in a handoff) are delivered, in order, on registration -
+        by the server thread, before this returns.
+
+        Raises:
+            TypeError: If weak=True and no usable weak reference to the observer can be
+                kept (e.g. a builtin function, or a builtin's bound method such as
+                list.append).
+        """
+
+        key = _weak_ref(observer, self._prune_observer) if weak else observer
+        self._observers[key] = (args, kwargs, bool(message), None, bool(cacheable), bool(weak))
+
+        self._request_dispatch()
+
+    def replay(self):
+        """
+        Re-dispatch argument sets received but not completed before a crash.
+
+        Uses the journal (see the `journal` parameter) found when this instance became
+        the host. Entries are re-dispatched in the order they were received, keeping
+        their original sequence numbers, so a completed replay is recorded against
+        the original receipt. Register observers before calling.
+
+        Returns:
+            The number of argument sets re-dispatched (0 without a journal).
+        """
+
+        replayable, self._replayable = self._replayable, {}
+        for seq in sorted(replayable):
+            self._arguments.append((seq, replayable[seq]))
+
+        self._request_dispatch()
+
+        return len(replayable)
+
+    def get(self, timeout=None, message=False):
+        """
+        Take the next argument set from the queue, waiting for one if necessary.
+
+        Pull-based alternative to trace(): the first call makes this instance a pull
+        consumer, so argument sets received from then on are queued until taken
+        (while observers are registered, they receive argument sets first).
+
+        Args:
+            timeout: Seconds to wait. Defaults to None (wait indefinitely).
+            message: If True, return a Message instead of the arguments.
+
+        Returns:
+            The argument set (an ArgumentSet for framed clients - see trace()), or a
+            Message.
+
+        Raises:
+            queue.Empty: If nothing arrives within `timeout`, or the host is released
+                (or hands off) with the queue empty.
+        """
+
+        self._pulling = True
+        deadline = None if timeout is None else monotonic() + timeout
+        with self._ready:
+            while True:
+                try:
+                    return self.get_nowait(message)
+                except Empty:
+                    remaining = None if deadline is None else deadline - monotonic()
+                    if self._closed or (remaining is not None and remaining <= 0):
+                        raise
+                self._ready.wait(remaining)
+
+    def get_nowait(self, message=False):
+        """
+        Take the next queued argument set without waiting.
+
+        Raises:
+            queue.Empty: If no argument set is queued.
+        """
+
+        self._pulling = True
+        try:
+            seq, item = self._arguments.popleft()
+        except IndexError:
+            raise Empty from None
+        if self._paused and len(self._arguments) <= self.queue_limit // 2:
+            # Let the server thread resume reading (see _limit_queue)
+            self._wake()
+
+        connection = self._replies.pop(seq, None)
+        if connection is not None:
+            # Taken by a pull consumer - no observer results to send
+            self._reply(connection, [])
+        self._complete(seq)
+        if message:
+            return item if isinstance(item, Message) else Message.from_args(item)
+        return _args_of(item)
+
+    def messages(self, timeout=None, message=False):
+        """
+        Iterate over argument sets as they arrive, blocking between them.
+
+        Iteration ends once the host is released (after the queue is drained), or
+        when no argument set arrives within `timeout` seconds.
+
+        Example:
+            for args in app.messages():
+                handle(args)  # Runs on this thread, not the server thread
+        """
+
+        while True:
+            try:
+                yield self.get(timeout, message)
+            except Empty:
+                return
+
+    async def messages_async(self, timeout=None, message=False):
+        """
+        Asynchronous variant of messages(), for `async for` in an asyncio event loop.
+
+        Waiting does not block the event loop or occupy an executor thread - the server
+        thread wakes the loop when argument sets arrive.
+        """
+
+        import asyncio
+
+        ready = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), ready)
+        self._pulling = True
+        self._async_waiters.add(waiter)
+        try:
+            while True:
+                try:
+                    yield self.get_nowait(message)
+                    continue
+                except Empty:
+                    if self._closed:
+                        return
+
+                ready.clear()
+                # Re-check: an argument set may have arrived before clear()
+                if self._arguments or self._closed:
+                    continue
+                try:
+                    await asyncio.wait_for(ready.wait(), timeout)
+                except asyncio.TimeoutError:
+                    return
+        finally:
+            self._async_waiters.discard(waiter)
+
+    def untrace(self, observer):
+        """Detach (unsubscribe) a callback. Does nothing if the observer is not registered."""
+
+        entry = self._observers.pop(observer, None)
+        if entry is None:
+            try:
+                # Traced with weak=True - equal weak references hash like their referent
+                entry = self._observers.pop(_weak_ref(observer), None)
+            except TypeError:
+                pass
+        if entry is not None and entry[3] is not None:
+            entry[3].stop()
+
+    def release(self):
+        """
+        Release the port, allowing other instances to bind.
+
+        Stops the server thread, cancels any active timeout timer, clears all
+        registered observers, and releases the socket port. Safe to call multiple
+        times (idempotent).
+
+        Note:
+            After release(), this instance can no longer accept client connections.
+            Use the context manager protocol for automatic cleanup.
+        """
+        if hasattr(self, "_standby_stop"):
+            # Stop following - a released follower never takes over. Once a promotion
+            # is under way, this waits for it, then releases the new host.
+            with self._standby_lock:
+                self._standby_stop.set()
+
+        if hasattr(self, "_ready") and not self._closed:
+            # End get() waits and messages() iterations once the queue is drained
+            self._closed = True
+            self._notify_consumers()
+
+        if not hasattr(self, "_listening") or not self._listening:
+            return
+
+        self._listening = False
+
+        self._cancel_timers()
+
+        # No new arguments will arrive after release
+        self._clear_observers()
+
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+        self._close_control()
+
+        if self.name is not None and not self._brokered:
+            self._remove_discovery()
+
+        # Wake the server thread's selector; it closes the listening socket on exit
+        self._wake()
+        if self._thread is not None and self._thread is not current_thread():
+            self._thread.join(_JOIN_TIMEOUT)
+
+    @property
+    def arguments(self):
+        """
+        Read-only snapshot of arguments received from client processes.
+
+        Returns a tuple of argument sets (each equal to the tuple of a single client
+        process's arguments - see trace()). Note that arguments are typically
+        consumed immediately by registered observers, so this will often be empty.
+        Useful for debugging or inspecting pending arguments.
+
+        Example:
+            If two clients sent ("foo", "bar") and ("baz",), this returns:
+            (("foo", "bar"), ("baz",))
+        """
+        return tuple(_args_of(args) for _, args in self._arguments)
+
+    @property
+    def clients(self):
+        """
+        Number of client processes that have connected since this singleton was created.
+
+        Identity probes and subscribers are not counted.
+
+        Useful for monitoring singleton usage, debugging, or implementing
+        custom logic based on connection count.
+        """
+        return self._clients
+
+    @property
+    def stats(self):
+        """
+        Snapshot of host connection counters.
+
+        Returns a dict with "accepted" (connections admitted), "rejected"
+        (connections refused by admission control), "slow_calls" (observer calls over
+        observer_budget), "quarantined" (observers isolated or detached), and
+        "cache_hits"/"cache_misses" (lookups of cacheable observers' results),
+        "subscribers_dropped" (subscriber processes disconnected as too slow),
+        "queue_paused" (times reading paused at queue_limit) and "shm_resyncs"
+        (shared-memory lanes whose backlog was dropped because of a corrupt entry).
+        """
+        stats = {
+            "accepted": 0,
+            "rejected": 0,
+            "slow_calls": 0,
+            "quarantined": 0,
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "subscribers_dropped": 0,
+            "queue_paused": 0,
+            "shm_resyncs": 0,
+        }
+        stats.update(self._stats)
+        return stats
+
+    @property
+    def listening(self):
+        """
+        True while this instance is the host and accepting client connections.
+
+        False for clients, standby followers that have not been promoted, and hosts
+        that have been released or have handed off their socket.
+        """
+        return self._listening
+
+
+class _Spool:
+    """
+    Append-only, memory-mapped log of argument sets for a host that is unreachable.
+
+    One file per port inside the spool directory. Each record is a header
+    (payload length, CRC32) followed by the NUL-joined UTF-8 argument set - the same
+    encoding used on the wire. Appends write through a memory map and are made
+    durable with one fsync per batch; a torn or corrupt tail (crash mid-append) is
+    ignored when draining. Appends and drains are serialized with flock where
+    available.
+    """
+
+    def __init__(self, directory, port):
+        self.directory = directory
+        self.path = os.path.join(directory, f"{port}.spool")
+
+    def append(self, *argument_sets):
+        """Append a batch of argument sets and fsync once."""
+
+        records = []
+        for args in argument_sets:
+            payload = _encode_args(args)
+            records.append(_SPOOL_RECORD.pack(len(payload), zlib.crc32(payload)))
+            records.append(payload)
+        data = b"".join(records)
+        if not data:
+            return
+
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        with open(self.path, "a+b") as spool:
+            _lock_file(spool)
+            try:
+                start = spool.seek(0, os.SEEK_END)
+                end = start + len(data)
+                spool.truncate(end)
+                # mmap offsets must be a multiple of the allocation granularity
+                offset = start - (start % mmap.ALLOCATIONGRANULARITY)
+                with mmap.mmap(spool.fileno(), end - offset, offset=offset) as view:
+                    view[start - offset :] = data
+                os.fsync(spool.fileno())
+            finally:
+                _unlock_file(spool)
+
+    def drain(self):
+        """
+        Read all intact records, leaving them in the spool until consume() is called.
+
+        Returns:
+            A list of argument tuples, oldest first, and the number of bytes read.
+        """
+
+        try:
+            spool = open(self.path, "rb")
+        except FileNotFoundError:
+            return [], 0
+
+        with spool:
+            _lock_file(spool)
+            try:
+                data = spool.read()
+            finally:
+                _unlock_file(spool)
+
+        argument_sets = []
+        position = 0
+        while position + _SPOOL_RECORD.size <= len(data):
+            length, checksum = _SPOOL_RECORD.unpack_from(data, position)
+            start = position + _SPOOL_RECORD.size
+            payload = data[start : start + length]
+            # Zero-filled or partially written tail from a crash mid-append
+            if not length or len(payload) < length or zlib.crc32(payload) != checksum:
+                break
+            parts = payload.decode("utf-8", errors="replace").split("\x00")
+            args = tuple(arg for arg in parts if arg)
+            if args:
+                argument_sets.append(args)
+            position = start + length
+
+        return argument_sets, len(data)
+
+    def consume(self, size):
+        """
+        Remove the first `size` bytes (what drain() read), keeping records appended
+        since. Until then, a crash leaves the drained records to be drained again.
+        """
+
+        try:
+            spool = open(self.path, "r+b")
+        except FileNotFoundError:
+            return
+
+        with spool:
+            _lock_file(spool)
+            try:
+                spool.seek(size)
+                rest = spool.read()
+                spool.seek(0)
+                spool.write(rest)
+                spool.truncate(len(rest))
+                os.fsync(spool.fileno())
+            finally:
+                _unlock_file(spool)
+
+
+class _Journal:
+    """
+    Append-only journal of argument sets received and completed by the host.
+
+    Records are length-prefixed (payload length, kind, sequence number) and written
+    through a buffered writer, so the hot path costs a memory copy rather than a
+    syscall; the owner flushes at the end of each burst. Files are fsynced only on
+    rotation and close. The journal is split into numbered segments that rotate at
+    _JOURNAL_SEGMENT_SIZE; a segment is deleted once every entry received in it has
+    completed. A torn record at the end of a segment (crash mid-write) is ignored.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.last_sequence = -1
+        self._lock = Lock()
+        self._file = None
+        self._segment = 0
+        # Sequence number -> segment holding its receipt, for entries not yet completed
+        self._pending = {}
+        self._segment_pending = Counter()
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    def _path(self, segment):
+        """Path of a numbered segment file."""
+
+        return os.path.join(self.directory, f"journal-{segment:08d}.log")
+
+    def _segments(self):
+        """Numbers of the existing segment files, oldest first."""
+
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith("journal-") and name.endswith(".log"):
+                try:
+                    segments.append(int(name[8:-4]))
+                except ValueError:
+                    continue
+        return sorted(segments)
+
+    def recover(self):
+        """
+        Read existing segments and start a fresh one.
+
+        Returns:
+            A dict of sequence number -> argument tuple for entries received but not
+            completed.
+        """
+
+        received = {}
+        segments = self._segments()
+        for segment in segments:
+            with open(self._path(segment), "rb") as file:
+                data = file.read()
+
+            position = 0
+            while position + _JOURNAL_RECORD.size <= len(data):
+                length, kind, seq = _JOURNAL_RECORD.unpack_from(data, position)
+                start = position + _JOURNAL_RECORD.size
+                if start + length > len(data):
+                    break
+                if kind == _JOURNAL_RECEIVED:
+                    payload = data[start : start + length].decode("utf-8", errors="replace")
+                    received[seq] = (segment, tuple(payload.split("\x00")))
+                elif kind == _JOURNAL_COMPLETED:
+                    received.pop(seq, None)
+                self.last_sequence = max(self.last_sequence, seq)
+                position = start + length
+
+        for seq, (segment, _) in received.items():
+            self._pending[seq] = segment
+            self._segment_pending[segment] += 1
+
+        # Segments with nothing outstanding are no longer needed
+        for segment in segments:
+            if not self._segment_pending[segment]:
+                os.remove(self._path(segment))
+
+        self._segment = (segments[-1] + 1) if segments else 0
+        self._file = open(self._path(self._segment), "ab", buffering=_JOURNAL_BUFFER_SIZE)
+
+        return {seq: args for seq, (_, args) in received.items()}
+
+    def _write(self, kind, seq, payload=b""):
+        """Buffer one record, rotating to a new segment when the current one is full."""
+
+        self._file.write(_JOURNAL_RECORD.pack(len(payload), kind, seq))
+        self._file.write(payload)
+
+        if self._file.tell() >= _JOURNAL_SEGMENT_SIZE:
+            self._rotate()
+
+    def _rotate(self):
+        """Seal the current segment and start the next; drop the old one if finished."""
+
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+        previous = self._segment
+        self._segment += 1
+        self._file = open(self._path(self._segment), "ab", buffering=_JOURNAL_BUFFER_SIZE)
+        if not self._segment_pending[previous]:
+            os.remove(self._path(previous))
+
+    def received(self, seq, args):
+        """Record receipt of an argument set."""
+
+        with self._lock:
+            if self._file is None:
+                return
+            self._pending[seq] = self._segment
+            self._segment_pending[self._segment] += 1
+            self._write(_JOURNAL_RECEIVED, seq, _encode_args(args))
+
+    def completed(self, seq):
+        """Record that observers finished with an argument set."""
+
+        with self._lock:
+            if self._file is None:
+                return
+            self._write(_JOURNAL_COMPLETED, seq)
+
+            segment = self._pending.pop(seq, None)
+            if segment is None:
+                return
+            self._segment_pending[segment] -= 1
+            if not self._segment_pending[segment] and segment != self._segment:
+                del self._segment_pending[segment]
+                os.remove(self._path(segment))
+
+    def flush(self):
+        """Hand buffered records to the OS (no fsync)."""
+
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def sync(self):
+        """Flush and fsync the current segment."""
+
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+
+    def close(self):
+        """Flush, fsync and close the current segment. Idempotent."""
+
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+
+class _ResultCache:
+    """
+    LRU cache of cacheable observers' results, with an optional time-to-live.
+
+    Keys are (observer, argument tuple). Lookups and insertions are O(1).
+    """
+
+    MISS = object()
+
+    def __init__(self, size, ttl):
+        self._size = size
+        self._ttl = ttl
+        self._entries = OrderedDict()
+
+    def get(self, key, now):
+        """The cached result for key, or MISS if absent or expired."""
+
+        entry = self._entries.get(key)
+        if entry is None:
+            return self.MISS
+        expires, result = entry
+        if expires and now >= expires:
+            del self._entries[key]
+            return self.MISS
+        self._entries.move_to_end(key)
+        return result
+
+    def put(self, key, result, now):
+        """Cache a result, evicting the least recently used entry when full."""
+
+        self._entries[key] = (now + self._ttl if self._ttl else 0, result)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self._size:
+            self._entries.popitem(last=False)
+
+
+class _IsolatedObserver:
+    """
+    A quarantined observer, called on its own daemon thread instead of the server thread.
+
+    Argument sets are handed over through an unbounded queue, so a slow observer only
+    delays itself.
+    """
+
+    _STOP = object()
+
+    def __init__(self, observer, args, kwargs, verbose, weak=False):
+        self._observer = observer
+        self._weak = weak
+        self._args = args
+        self._kwargs = kwargs
+        self._verbose = verbose
+        self._queue = SimpleQueue()
+        Thread(target=self._run, daemon=True).start()
+
+    def put(self, value):
+        """Queue an argument tuple (or Message) for the observer."""
+
+        self._queue.put(value)
+
+    def stop(self):
+        """Stop the worker once it has delivered everything queued so far."""
+
+        self._queue.put(self._STOP)
+
+    def _run(self):
+        while True:
+            value = self._queue.get()
+            if value is self._STOP:
+                return
+            observer = self._observer() if self._weak else self._observer
+            if observer is None:
+                # Weak observer garbage-collected - the host prunes its entry
+                return
+            try:
+                observer(value, *self._args, **self._kwargs)
+            except Exception as exc:
+                _log_event(
+                    "observer_error",
+                    self._verbose,
+                    "Observer %s raised exception: %s: %s",
+                    getattr(observer, "__name__", observer),
+                    type(exc).__name__,
+                    exc,
+                )
+
+
+class _ArgumentQueue:
+    """
+    The host's queue of (sequence number, arguments) entries, in fixed priority lanes.
+
+    One deque per priority level: append and popleft are O(1), and popleft takes the
+    oldest entry of the most urgent non-empty lane. Iteration follows dispatch order.
+    """
+
+    __slots__ = ("_lanes",)
+
+    def __init__(self):
+        self._lanes = tuple(deque() for _ in range(_PRIORITY_LEVELS))
+
+    def append(self, entry, priority=0):
+        """Queue an entry; priority is clamped to 0.._PRIORITY_LEVELS - 1."""
+
+        self._lanes[min(max(priority, 0), _PRIORITY_LEVELS - 1)].append(entry)
+
+    def items(self):
+        """(priority, entry) pairs in dispatch order."""
+
+        for priority in reversed(range(_PRIORITY_LEVELS)):
+            for entry in list(self._lanes[priority]):
+                yield priority, entry
+
+    def popleft(self):
+        """
+        Take the next entry in dispatch order.
+
+        Raises:
+            IndexError: If the queue is empty.
+        """
+
+        for lane in reversed(self._lanes):
+            if lane:
+                try:
+                    return lane.popleft()
+                except IndexError:
+                    # Consumed concurrently - try the next lane
+                    continue
+        raise IndexError("pop from an empty queue")
+
+    def clear(self):
+        for lane in self._lanes:
+            lane.clear()
+
+    def __len__(self):
+        return sum(len(lane) for lane in self._lanes)
+
+    def __bool__(self):
+        return any(self._lanes)
+
+    def __iter__(self):
+        for lane in reversed(self._lanes):
+            yield from list(lane)
+
+
+class _Scheduler:
+    """
+    Heap-ordered timers for every Socket_Singleton in the process, on one thread.
+
+    The thread is started by the first call_later() and exits once no timers are
+    pending, so a process without timers has no timer thread at all. Like the
+    threading.Timer it replaces, it is not a daemon: a pending timeout keeps the
+    process alive. Callbacks run on the scheduler thread and must not block for long.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._order = count()
+        self._condition = Condition()
+        self._thread = None
+        self._cancelled = 0
+
+    def call_later(self, delay, callback):
+        """
+        Run callback() after `delay` seconds.
+
+        Returns:
+            A _ScheduledCall whose cancel() stops it from running.
+        """
+
+        call = _ScheduledCall(self, callback)
+        with self._condition:
+            heappush(self._heap, (monotonic() + delay, next(self._order), call))
+            if self._thread is None:
+                self._thread = Thread(target=self._run)
+                self._thread.start()
+            else:
+                self._condition.notify()
+        return call
+
+    def _cancel(self, call):
+        """Mark a call cancelled; the thread prunes and exits if nothing else is pending."""
+
+        with self._condition:
+            if not call.cancelled:
+                call.cancelled = True
+                self._cancelled += 1
+                self._condition.notify()
+
+    def _run(self):
+        """Scheduler thread: sleep until the earliest deadline, then run its callback."""
+
+        while True:
+            with self._condition:
+                while True:
+                    # Cancelled calls are dropped in bulk once they are half the heap
+                    if self._cancelled * 2 >= len(self._heap):
+                        self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+                        heapify(self._heap)
+                        self._cancelled = 0
+                    if not self._heap:
+                        self._thread = None
+                        return
+                    wait = self._heap[0][0] - monotonic()
+                    if wait <= 0:
+                        call = heappop(self._heap)[2]
+                        if call.cancelled:
+                            self._cancelled -= 1
+                            continue
+                        break
+                    self._condition.wait(wait)
+
+            try:
+                call.callback()
+            except Exception:
+                # Callbacks report their own errors; the scheduler must survive
+                pass
+
+
+class _ScheduledCall:
+    """A pending _Scheduler callback."""
+
+    __slots__ = ("_scheduler", "callback", "cancelled")
+
+    def __init__(self, scheduler, callback):
+        self._scheduler = scheduler
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        """Stop the callback from running, if it has not started yet."""
+
+        self._scheduler._cancel(self)
+
+
+_SCHEDULER = _Scheduler()
+
+
+class ManualClock:
+    """
+    Deterministic clock for tests: time only moves when advance() is called.
+
+    Pass it as Socket_Singleton(clock=...) - timeouts, idle timeouts, admission,
+    cache TTLs and observer budgets all read it, and timers are scheduled on it and
+    run synchronously by advance().
+
+    Args:
+        start: Initial time in seconds. Defaults to 0.
+    """
+
+    def __init__(self, start=0.0):
+        self.now = float(start)
+        self._heap = []
+        self._order = count()
+        self._lock = Lock()
+
+    def __call__(self):
+        return self.now
+
+    def __repr__(self):
+        return f"ManualClock(now={self.now})"
+
+    def call_later(self, delay, callback):
+        """Run callback() once the clock has advanced by `delay` seconds."""
+
+        call = _ScheduledCall(self, callback)
+        with self._lock:
+            heappush(self._heap, (self.now + delay, next(self._order), call))
+        return call
+
+    def _cancel(self, call):
+        call.cancelled = True
+
+    def advance(self, seconds):
+        """Move time forward, running every timer that falls due, in deadline order."""
+
+        target = self.now + seconds
+        while True:
+            with self._lock:
+                if not self._heap or self._heap[0][0] > target:
+                    break
+                deadline, _, call = heappop(self._heap)
+            self.now = max(self.now, deadline)
+            if not call.cancelled:
+                call.callback()
+        self.now = target
+
+
+class _TokenBucket:
+    """Token-bucket rate limiter: `rate` tokens per second, holding at most `burst`."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated", "clock")
+
+    def __init__(self, rate, burst, clock=monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self):
+        """Take one token if available."""
+
+        self._refill(self.clock())
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def full(self, now):
+        """Whether the bucket has refilled to its burst size."""
+
+        self._refill(now)
+        return self.tokens >= self.burst
+
+
+class _Peer:
+    """Per-connection state for the host's selector loop."""
+
+    __slots__ = (
+        "process",
+        "releases",
+        "framed",
+        "buffer",
+        "outgoing",
+        "writing",
+        "events",
+        "lane",
+        "verified",
+        "acks",
+        "received",
+        "acknowledged",
+    )
+
+    def __init__(self, process, releases):
+        # Whether this client's arguments are processed (max_clients), or None until
+        # the connection is counted as a client
+        self.process = process
+        # Whether the host releases once this client's message is complete
+        self.releases = releases
+        self.framed = False
+        # Partial frame (or legacy message) carried between reads, from the buffer pool
+        self.buffer = None
+        self.outgoing = bytearray()
+        # Whether EVENT_WRITE is wanted, and the events the selector is watching for
+        self.writing = False
+        self.events = 0
+        self.lane = None
+        # Persistent (pipelined) connections: handshake state and acknowledgements
+        self.verified = False
+        self.acks = False
+        self.received = 0
+        self.acknowledged = 0
+
+
+class _Lane:
+    """
+    Single-producer, single-consumer byte ring inside a shared-memory block.
+
+    The producer only writes the head counter and the consumer only writes the tail
+    counter; both count bytes ever written/consumed and never wrap, so no lock or
+    futex is needed. Each entry carries its length and a CRC32: if the consumer sees
+    a head that is ahead of the payload bytes (weakly ordered memory), the checksum
+    fails and the entry is simply re-read on the next pass. An entry that still fails
+    after _SHM_STALL_PASSES passes is corrupt; its length can't be trusted to find the
+    next one, so the consumer drops everything published and resumes at the head.
+    """
+
+    def __init__(self, buffer, offset, capacity):
+        self._buffer = buffer
+        self._offset = offset
+        self._data = offset + _SHM_LANE_HEADER_SIZE
+        self.capacity = capacity
+        # Consumer: passes the entry at the tail has failed its checks; resyncs so far
+        self._stalls = 0
+        self.resyncs = 0
+
+    def _counter(self, field):
+        """Read a sequence counter from the lane header."""
+
+        return _SHM_COUNTER.unpack_from(self._buffer, self._offset + field)[0]
+
+    def _set_counter(self, field, value):
+        """Write a sequence counter to the lane header."""
+
+        _SHM_COUNTER.pack_into(self._buffer, self._offset + field, value)
+
+    @property
+    def waiting(self):
+        """True if the consumer has gone idle and needs a doorbell."""
+
+        return bool(_SHM_FLAG.unpack_from(self._buffer, self._offset + _SHM_WAITING)[0])
+
+    @waiting.setter
+    def waiting(self, value):
+        _SHM_FLAG.pack_into(self._buffer, self._offset + _SHM_WAITING, int(value))
+
+    def reset(self):
+        """Zero the header for a new producer (consumer side, lane unassigned)."""
+
+        self._buffer[self._offset : self._data] = bytes(_SHM_LANE_HEADER_SIZE)
+
+    def _copy_in(self, position, data):
+        """Copy data into the ring at an absolute byte position, wrapping as needed."""
+
+        start = position % self.capacity
+        first = min(len(data), self.capacity - start)
+        self._buffer[self._data + start : self._data + start + first] = data[:first]
+        if first < len(data):
+            self._buffer[self._data : self._data + len(data) - first] = data[first:]
+
+    def _copy_out(self, position, size):
+        """Copy size bytes out of the ring from an absolute byte position."""
+
+        start = position % self.capacity
+        first = min(size, self.capacity - start)
+        data = bytes(self._buffer[self._data + start : self._data + start + first])
+        if first < size:
+            data += bytes(self._buffer[self._data : self._data + size - first])
+        return data
+
+    def write(self, payload):
+        """
+        Producer: append one entry.
+
+        Returns:
+            False if the ring does not currently have room for the entry.
+        """
+
+        size = _SHM_ENTRY.size + len(payload)
+        if size > self.capacity:
+            raise ValueError(f"message of {len(payload)} bytes exceeds the lane capacity")
+
+        head = self._counter(_SHM_HEAD)
+        if head + size - self._counter(_SHM_TAIL) > self.capacity:
+            return False
+
+        self._copy_in(head, _SHM_ENTRY.pack(len(payload), zlib.crc32(payload)) + payload)
+        # Publish only after the entry is in place
+        self._set_counter(_SHM_HEAD, head + size)
+        return True
+
+    def read(self):
+        """
+        Consumer: yield complete entries until the ring is empty.
+
+        Sets the waiting flag, then re-checks, before returning - a producer that
+        publishes after the final check sees the flag and rings the doorbell.
+        """
+
+        tail = self._counter(_SHM_TAIL)
+        self.waiting = False
+        while True:
+            head = self._counter(_SHM_HEAD)
+            if tail == head:
+                self.waiting = True
+                if self._counter(_SHM_HEAD) == head:
+                    return
+                self.waiting = False
+                continue
+
+            available = head - tail
+            payload = None
+            if _SHM_ENTRY.size <= available <= self.capacity:
+                length, checksum = _SHM_ENTRY.unpack(self._copy_out(tail, _SHM_ENTRY.size))
+                if _SHM_ENTRY.size + length <= available:
+                    payload = self._copy_out(tail + _SHM_ENTRY.size, length)
+                    if zlib.crc32(payload) != checksum:
+                        payload = None
+
+            if payload is None:
+                self._stalls += 1
+                if self._stalls < _SHM_STALL_PASSES:
+                    # Published before its bytes became visible - retry on the next pass
+                    return
+                self._stalls = 0
+                self.resyncs += 1
+                tail = head
+                self._set_counter(_SHM_TAIL, tail)
+                continue
+
+            self._stalls = 0
+            tail += _SHM_ENTRY.size + length
+            self._set_counter(_SHM_TAIL, tail)
+            yield payload
+
+
+class _ShmRing:
+    """
+    Host side of the shared-memory transport: one block split into per-client lanes.
+
+    A lane is assigned to a client for as long as its handshake socket stays open, so
+    every lane has exactly one producer (the client) and one consumer (the host).
+    """
+
+    def __init__(self, lanes, lane_size):
+        shared_memory = _import_shared_memory()
+        self.lane_size = lane_size
+        self._stride = _SHM_LANE_HEADER_SIZE + lane_size
+        self._memory = shared_memory.SharedMemory(create=True, size=lanes * self._stride)
+        self.name = self._memory.name
+        self._lanes = [
+            _Lane(self._memory.buf, self.offset(lane), lane_size) for lane in range(lanes)
+        ]
+        self._free = list(range(lanes - 1, -1, -1))
+
+    @property
+    def active(self):
+        """True if any lane is assigned."""
+
+        return len(self._free) < len(self._lanes)
+
+    def offset(self, lane):
+        """Byte offset of a lane within the block."""
+
+        return lane * self._stride
+
+    def lane(self, lane):
+        """The _Lane for a lane number."""
+
+        return self._lanes[lane]
+
+    def allocate(self):
+        """Assign a free lane, or return None if all lanes are in use."""
+
+        if not self._free:
+            return None
+        lane = self._free.pop()
+        self._lanes[lane].reset()
+        return lane
+
+    def free(self, lane):
+        """Return a lane to the free list."""
+
+        self._free.append(lane)
+
+    def close(self):
+        """Detach and destroy the shared-memory block."""
+
+        self._lanes = []
+        self._memory.close()
+        self._memory.unlink()
+
+
+class ArgumentSet(Sequence):
+    """
+    One client's arguments: a read-only, tuple-like view over the raw payload.
+
+    Holds the NUL-delimited UTF-8 bytes exactly as received and decodes each
+    argument on first access, caching it. Argument boundaries are found with a
+    C-level scan on first use; nothing is decoded until an argument is read, so an
+    observer that only routes on args[0] never pays to decode the rest. Compares
+    equal to (and hashes like) the tuple of its arguments; empty arguments are
+    omitted, as they always have been.
+    """
+
+    __slots__ = ("_data", "_start", "_end", "_bounds", "_cache")
+
+    def __init__(self, data, start=0, end=None):
+        self._data = data
+        self._start = start
+        self._end = len(data) if end is None else end
+        self._bounds = None
+        self._cache = None
+
+    def _index(self):
+        """Find (and cache) the start/end offsets of every non-empty argument."""
+
+        if self._bounds is None:
+            data, position, end = self._data, self._start, self._end
+            bounds = array("I")
+            while position < end:
+                stop = data.find(b"\x00", position, end)
+                if stop < 0:
+                    stop = end
+                if stop > position:
+                    bounds.append(position)
+                    bounds.append(stop)
+                position = stop + 1
+            self._bounds = bounds
+            self._cache = [None] * (len(bounds) // 2)
+        return self._bounds
+
+    def __len__(self):
+        return len(self._index()) // 2
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self[i] for i in range(*index.indices(len(self))))
+
+        bounds = self._index()
+        count = len(bounds) // 2
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError("argument index out of range")
+
+        arg = self._cache[index]
+        if arg is None:
+            start, stop = bounds[2 * index], bounds[2 * index + 1]
+            arg = self._data[start:stop].decode("utf-8", errors="replace")
+            self._cache[index] = arg
+        return arg
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __eq__(self, other):
+        if isinstance(other, (ArgumentSet, tuple)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __add__(self, other):
+        return tuple(self) + tuple(other)
+
+    def __radd__(self, other):
+        return tuple(other) + tuple(self)
+
+    def __repr__(self):
+        return repr(tuple(self))
+
+
+class _BufferPool:
+    """
+    Reusable bytearrays for the server thread's per-connection partial frames.
+
+    Buffers are cleared on release and kept (up to _POOLED_BUFFERS) for the next
+    connection, so launch storms do not allocate a fresh buffer per client.
+    """
+
+    def __init__(self):
+        self._free = []
+
+    def acquire(self):
+        """Take an empty buffer from the pool (or a new one)."""
+
+        return self._free.pop() if self._free else bytearray()
+
+    def release(self, buffer):
+        """Clear a buffer and return it to the pool."""
+
+        if len(self._free) < _POOLED_BUFFERS:
+            del buffer[:]
+            self._free.append(buffer)
+
+
+class Message:
+    """
+    A client's argument set plus the context it was launched in.
+
+    Observers registered with trace(observer, message=True) receive Messages instead
+    of plain tuples. The wire format is a struct-packed header (version, client pid,
+    and the offset/length of each field) followed by the fields themselves; fields
+    are decoded lazily on first access and cached, so an observer that only looks at
+    `args` never pays to decode the environment or metadata.
+
+    Attributes:
+        args: The argument strings, as an ArgumentSet (empty strings removed).
+        cwd: The client's working directory, or None if unknown.
+        pid: The client's process id, or None if unknown.
+        env: Dict of the environment variables the client chose to forward.
+        metadata: Dict of typed key/value metadata sent by the client.
+        priority: Queue priority requested by the client (0-3, higher is more urgent).
+    """
+
+    __slots__ = (
+        "_payload",
+        "_fields",
+        "_args",
+        "_cwd",
+        "_pid",
+        "_env",
+        "_metadata",
+        "_priority",
+    )
+
+    _UNDECODED = object()
+
+    def __init__(self, payload):
+        self._payload = bytes(payload)
+        if len(self._payload) < _MESSAGE_HEADER.size:
+            raise ValueError("message shorter than its header")
+
+        version, flags, _, pid, *fields = _MESSAGE_HEADER.unpack_from(self._payload)
+        if version != _MESSAGE_VERSION:
+            raise ValueError(f"unsupported message version {version}")
+        self._fields = tuple(zip(fields[::2], fields[1::2]))
+        for offset, length in self._fields:
+            if offset + length > len(self._payload):
+                raise ValueError("message field exceeds payload")
+
+        self._pid = pid or None
+        self._priority = flags & _MESSAGE_PRIORITY
+        self._args = self._cwd = self._env = self._metadata = self._UNDECODED
+
+    @classmethod
+    def from_args(cls, args, cwd=None, pid=None, env=None, metadata=None, priority=0):
+        """Build a Message from already-decoded values (e.g. a legacy tuple)."""
+
+        message = cls.__new__(cls)
+        message._payload = None
+        message._fields = None
+        message._args = tuple(args)
+        message._cwd = cwd
+        message._pid = pid
+        message._env = dict(env or {})
+        message._metadata = dict(metadata or {})
+        message._priority = priority
+        return message
+
+    @staticmethod
+    def encode(args, cwd=None, pid=None, env=None, metadata=None, priority=0):
+        """
+        Encode a message payload.
+
+        Raises:
+            TypeError: If metadata or env contain values the codec cannot represent.
+            ValueError: If priority is not between 0 and 3.
+        """
+
+        if not 0 <= priority < _PRIORITY_LEVELS:
+            raise ValueError(f"priority must be between 0 and {_PRIORITY_LEVELS - 1}")
+
+        fields = [
+            _encode_args(args),
+            _encode_text(cwd or ""),
+            _pack_value(dict(env)) if env else b"",
+            _pack_value(dict(metadata)) if metadata else b"",
+        ]
+
+        offsets = []
+        position = _MESSAGE_HEADER.size
+        for field in fields:
+            offsets.extend((position, len(field)))
+            position += len(field)
+
+        header = _MESSAGE_HEADER.pack(_MESSAGE_VERSION, priority, 0, pid or 0, *offsets)
+        return header + b"".join(fields)
+
+    def _field(self, index):
+        """Raw bytes of a field."""
+
+        offset, length = self._fields[index]
+        return self._payload[offset : offset + length]
+
+    def __bool__(self):
+        """False if the message carries no arguments (checked without decoding them)."""
+
+        return bool(self.args)
+
+    @property
+    def args(self):
+        """The argument strings as an ArgumentSet, decoded lazily per argument."""
+        if self._args is self._UNDECODED:
+            offset, length = self._fields[0]
+            self._args = ArgumentSet(self._payload, offset, offset + length)
+        return self._args
+
+    @property
+    def cwd(self):
+        """The client's working directory (None if unknown), decoded on first access."""
+        if self._cwd is self._UNDECODED:
+            cwd = self._field(1).decode("utf-8", errors="surrogateescape")
+            self._cwd = cwd or None
+        return self._cwd
+
+    @property
+    def pid(self):
+        """The client's process id, or None if unknown."""
+        return self._pid
+
+    @property
+    def priority(self):
+        """Queue priority requested by the client (0-3, higher is more urgent)."""
+        return self._priority
+
+    @property
+    def env(self):
+        """Dict of environment variables forwarded by the client, decoded on first access."""
+        if self._env is self._UNDECODED:
+            data = self._field(2)
+            self._env = _unpack_value(data, 0)[0] if data else {}
+        return self._env
+
+    @property
+    def metadata(self):
+        """Dict of typed metadata sent by the client, decoded on first access."""
+        if self._metadata is self._UNDECODED:
+            data = self._field(3)
+            self._metadata = _unpack_value(data, 0)[0] if data else {}
+        return self._metadata
+
+    def __repr__(self):
+        """Unambiguous string representation for developers."""
+
+        return f"Message(args={self.args!r}, cwd={self.cwd!r}, pid={self.pid!r})"
+
+
+class Connection:
+    """
+    Persistent, pipelined client connection to a host. See Socket_Singleton.connect().
+
+    Argument sets are framed and buffered locally, then written in bulk, so thousands
+    of sends cost a handful of syscalls. In ack mode the host replies with cumulative
+    acknowledgements (one per batch it reads), which flush() waits for.
+
+    Raises:
+        ConnectionError: If the host rejects the handshake (wrong secret).
+    """
+
+    # Locally buffered bytes before send() writes to the socket
+    _BUFFER_SIZE = 64 * 1024
+
+    __slots__ = (
+        "address",
+        "port",
+        "ack",
+        "timeout",
+        "compression_threshold",
+        "sent",
+        "acknowledged",
+        "_codec",
+        "_pid",
+        "_env",
+        "_buffer",
+        "_sock",
+    )
+
+    def __init__(
+        self,
+        address="127.0.0.1",
+        port=1337,
+        secret=None,
+        ack=False,
+        timeout=5,
+        env=(),
+        compression_threshold=0,
+        transport=None,
+        endpoints=(),
+    ):
+        self.address = str(address)
+        self.port = int(port)
+        self.ack = bool(ack)
+        self.timeout = float(timeout)
+        self.compression_threshold = int(compression_threshold)
+        self._codec = 0
+        self._pid = os.getpid()
+        self._env = {name: os.environ[name] for name in env if name in os.environ}
+        self.sent = 0
+        self.acknowledged = 0
+        self._buffer = bytearray()
+        if endpoints:
+            primary = (self.address, self.port)
+            endpoints = (primary, *(_endpoint(endpoint) for endpoint in endpoints))
+            self._sock = _connect_cheapest(endpoints, self.timeout)
+        else:
+            transport = transport if transport is not None else _TCP
+            self._sock = transport.create_connection((self.address, self.port), self.timeout)
+
+        try:
+            hello = (str(secret) if secret is not None else "").encode("utf-8")
+            flags = _FLAG_ACK if self.ack else 0
+            self._sock.sendall(_frame(_FRAME_HELLO, hello, flags))
+            marker, kind, codecs, length = _FRAME.unpack(_recv_exactly(self._sock, _FRAME.size))
+            _recv_exactly(self._sock, length)
+            if marker != _FRAME_MARKER or kind != _FRAME_WELCOME:
+                raise ConnectionError(
+                    f"host @ {self.address} on port {self.port} rejected the connection"
+                )
+            # Prefer lz4 when both sides have it; no codec bits means no compression
+            codecs &= _supported_codecs()
+            self._codec = _FLAG_LZ4 if codecs & _FLAG_LZ4 else codecs & _FLAG_ZLIB
+        except BaseException:
+            self._sock.close()
+            self._sock = None
+            raise
+
+    def __enter__(self):
+        """Context manager protocol - returns self for use in 'with' statements."""
+
+        return self
+
+    def __exit__(self, ex_type, ex_value, ex_traceback):
+        """Context manager cleanup - flushes and closes the connection."""
+
+        self.close()
+        return False
+
+    def send(self, args, metadata=None, priority=0):
+        """
+        Queue one argument set (an iterable of strings) for the host.
+
+        Sent as a Message carrying this process's cwd and pid, the environment
+        variables named in `env` (captured at connect time) and optional `metadata`.
+        Argument sets with a higher `priority` (0-3) jump ahead of lower-priority ones
+        still queued on the host.
+
+        Returns:
+            The number of argument sets sent on this connection so far.
+        """
+
+        self._queue(args, metadata, priority, 0)
+        if len(self._buffer) >= self._BUFFER_SIZE:
+            self._write()
+        return self.sent
+
+    def request(self, args, metadata=None, priority=0):
+        """
+        Send one argument set and wait for the host's reply.
+
+        The host answers with the return values of its cacheable observers (see
+        Socket_Singleton.trace), straight from its result cache when possible.
+
+        Returns:
+            A list with one result per cacheable observer, in registration order
+            (empty if the host has none, or the arguments were not dispatched to
+            observers).
+
+        Raises:
+            TimeoutError: If the reply does not arrive within `timeout` seconds.
+        """
+
+        self._queue(args, metadata, priority, _FLAG_REPLY)
+        self._write()
+        while True:
+            kind, payload = self._read_frame()
+            if kind == _FRAME_REPLY:
+                return _unpack_value(payload, 0)[0]
+
+    def _queue(self, args, metadata, priority, flags):
+        """Encode, compress and buffer one MESSAGE frame."""
+
+        payload = Message.encode(
+            args,
+            cwd=os.getcwd(),
+            pid=self._pid,
+            env=self._env,
+            metadata=metadata,
+            priority=priority,
+        )
+        if len(payload) > _MAX_MESSAGE_SIZE:
+            raise ValueError(f"message of {len(payload)} bytes exceeds {_MAX_MESSAGE_SIZE}")
+
+        if self._codec:
+            payload, codec = _compress(payload, self.compression_threshold, self._codec)
+            flags |= codec
+        self._buffer += _frame(_FRAME_MESSAGE, payload, flags)
+        self.sent += 1
+
+    def _read_frame(self):
+        """Read one frame from the host, tracking acknowledgements."""
+
+        marker, kind, _, length = _FRAME.unpack(_recv_exactly(self._sock, _FRAME.size))
+        payload = _recv_exactly(self._sock, length)
+        if marker != _FRAME_MARKER:
+            raise ConnectionError(f"unexpected data from host @ {self.address}")
+        if kind == _FRAME_ACK:
+            (self.acknowledged,) = _ACK.unpack(payload)
+        return kind, payload
+
+    def send_many(self, argument_sets):
+        """
+        Queue many argument sets.
+
+        Returns:
+            The number of argument sets sent on this connection so far.
+        """
+
+        for args in argument_sets:
+            self.send(args)
+        return self.sent
+
+    def _write(self):
+        """Write locally buffered frames to the socket."""
+
+        if self._buffer:
+            self._sock.sendall(self._buffer)
+            self._buffer.clear()
+
+    def flush(self):
+        """
+        Write buffered argument sets; in ack mode, wait until the host has them all.
+
+        Raises:
+            TimeoutError: If acknowledgements do not arrive within `timeout` seconds.
+        """
+
+        self._write()
+        while self.ack and self.acknowledged < self.sent:
+            self._read_frame()
+
+    def close(self):
+        """Flush and close the connection. Idempotent."""
+
+        if self._sock is None:
+            return
+        try:
+            self._write()
+        finally:
+            self._sock.close()
+            self._sock = None
+
+
+class _TcpTransport:
+    """The default transport: TCP sockets, where the bound port is also the lock."""
+
+    def socket(self):
+        return socket()
+
+    def create_connection(self, address, timeout=None):
+        return _socket.create_connection(address, timeout)
+
+
+_TCP = _TcpTransport()
+
+
+class LoopbackTransport:
+    """
+    In-memory transport: "ports" live in a per-instance table, and connections are
+    socket pairs, so hosts and clients sharing one LoopbackTransport run in a single
+    process without ports or a network. Meant for fast, deterministic tests.
+
+    Example:
+        transport = LoopbackTransport()
+        app = Socket_Singleton(transport=transport, strict=False)
+        Socket_Singleton(transport=transport, strict=False)  # MultipleSingletonsError
+    """
+
+    def __init__(self):
+        # (address, port) -> listening _LoopbackSocket
+        self._listeners = {}
+        self._lock = Lock()
+        self._ephemeral = count(_NAMED_PORTS[0])
+
+    def __repr__(self):
+        return f"LoopbackTransport(listeners={len(self._listeners)})"
+
+    def socket(self):
+        """A new unbound socket (host side, or a client via connect())."""
+
+        return _LoopbackSocket(self)
+
+    def create_connection(self, address, timeout=None):
+        """Connect to a listening socket. Returns the client end of a socket pair."""
+
+        with self._lock:
+            listener = self._listeners.get(tuple(address))
+            if listener is None or listener._bell is None:
+                raise ConnectionRefusedError(
+                    errno.ECONNREFUSED, f"Nothing is listening on loopback {address}"
+                )
+            client, server = _socket.socketpair()
+            listener._pending.append(server)
+            listener._bell[1].send(b"\x00")
+        client.settimeout(timeout)
+        return client
+
+    def _bind(self, sock, address):
+        host, port = address
+        with self._lock:
+            if not port:
+                port = next(p for p in self._ephemeral if (host, p) not in self._listeners)
+            if (host, port) in self._listeners:
+                raise OSError(errno.EADDRINUSE, f"Loopback {host}:{port} is already bound")
+            self._listeners[(host, port)] = sock
+        return (host, port)
+
+    def _unbind(self, sock):
+        with self._lock:
+            if self._listeners.get(sock._address) is sock:
+                del self._listeners[sock._address]
+
+
+class _LoopbackSocket:
+    """
+    The subset of the socket API Socket_Singleton uses, over a LoopbackTransport.
+
+    A listening socket's readiness (for selectors) is a socket pair "bell" rung once
+    per pending connection; a connected socket delegates to its real socket pair end.
+    """
+
+    __slots__ = ("_transport", "_address", "_pending", "_bell", "_connection")
+
+    def __init__(self, transport):
+        self._transport = transport
+        self._address = None
+        self._pending = deque()
+        self._bell = None
+        self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, ex_type, ex_value, ex_traceback):
+        self.close()
+        return False
+
+    def __getattr__(self, name):
+        # sendall(), recv(), settimeout() ... of a connected socket
+        if self._connection is None:
+            raise OSError(errno.ENOTCONN, f"Loopback socket is not connected ({name})")
+        return getattr(self._connection, name)
+
+    def bind(self, address):
+        self._address = self._transport._bind(self, address)
+
+    def listen(self, backlog=None):
+        self._bell = _socket.socketpair()
+        self._bell[0].setblocking(False)
+
+    def connect(self, address):
+        self._connection = self._transport.create_connection(address)
+
+    def getsockname(self):
+        return self._address
+
+    def fileno(self):
+        if self._connection is not None:
+            return self._connection.fileno()
+        return self._bell[0].fileno() if self._bell is not None else -1
+
+    def setblocking(self, flag):
+        if self._connection is not None:
+            self._connection.setblocking(flag)
+
+    def accept(self):
+        self._bell[0].recv(1)  # BlockingIOError when nothing is pending
+        return self._pending.popleft(), ("loopback", 0)
+
+    def close(self):
+        if self._address is not None:
+            self._transport._unbind(self)
+        if self._bell is not None:
+            for end in self._bell:
+                end.close()
+        while self._pending:
+            self._pending.popleft().close()
+        if self._connection is not None:
+            self._connection.close()
+
+
+class LockBackend(abc.ABC):
+    """
+    Interface for the lock deciding which Socket_Singleton instance is the host.
+
+    Subclasses implement a non-blocking acquire() and an idempotent release(); the
+    lock must be freed by the OS if the holding process dies.
+    """
+
+    @abc.abstractmethod
+    def acquire(self):
+        """Try to take the lock without blocking. Returns True if it is now held."""
+
+    @abc.abstractmethod
+    def release(self):
+        """Free the lock, if held."""
+
+
+class FileLock(LockBackend):
+    """
+    fcntl.flock() on a lock file. Needs no network at all; Unix only.
+
+    The file is never deleted - unlinking a lock file races with processes that have
+    it open.
+
+    Args:
+        path: Path of the lock file (created if missing).
+    """
+
+    def __init__(self, path):
+        if fcntl is None:
+            raise ValueError("FileLock requires fcntl (Unix)")
+        self.path = str(path)
+        self._fd = None
+
+    def __repr__(self):
+        return f"FileLock({self.path!r})"
+
+    def acquire(self):
+        if self._fd is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path) or ".", mode=0o700, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            # Closing the descriptor drops the flock
+            os.close(self._fd)
+            self._fd = None
+
+
+class AbstractSocketLock(LockBackend):
+    """
+    A bound Linux abstract-namespace Unix socket. No file, no port; Linux only.
+
+    Args:
+        name: Name in the abstract namespace (without the leading NUL).
+    """
+
+    def __init__(self, name):
+        if not platform.startswith("linux"):
+            raise ValueError("AbstractSocketLock requires Linux")
+        self.name = str(name)
+        self._sock = None
+
+    def __repr__(self):
+        return f"AbstractSocketLock({self.name!r})"
+
+    def acquire(self):
+        if self._sock is not None:
+            return True
+        sock = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+        try:
+            sock.bind("\0" + self.name)
+        except OSError:
+            sock.close()
+            return False
+        self._sock = sock
+        return True
+
+    def release(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+class SingletonBroker:
+    """
+    One process hosting many named singletons ("slots") on a single port.
+
+    Socket_Singleton(name=..., broker=port) claims the named slot instead of binding a
+    port of its own; the slot is held for as long as the owner's connection to the
+    broker stays open. Later instances with the same name find the slot taken and
+    their arguments are routed, by name, to the owning process. The broker itself is a
+    singleton on its port.
+
+    Args:
+        address: IP address to bind to. Defaults to "127.0.0.1".
+        port: Port number for the broker. Defaults to 1336.
+        verbose: If True, also echo this instance's log records (see the
+            "Socket_Singleton" logger) to stdout. Defaults to False.
+
+    Raises:
+        MultipleSingletonsError: If the port is already bound (e.g. by another broker).
+
+    Example:
+        broker = SingletonBroker(port=50100)  # e.g. in a session-startup script
+        app = Socket_Singleton(name="editor", broker=50100)
+    """
+
+    def __init__(self, address="127.0.0.1", port=1336, verbose=False):
+        self.address = str(address)
+        self.port = int(port)
+        self.verbose = bool(verbose)
+        # name -> (owner connection, secret, owner pid)
+        self._slots = {}
+        # connection -> _BrokerPeer
+        self._peers = {}
+        self._listening = False
+        self._sock = socket()
+        try:
+            self._sock.bind((self.address, self.port))
+        except OSError as err:
+            self._sock.close()
+            if err.errno not in (errno.EADDRINUSE, _WSAEADDRINUSE):
+                raise
+            raise MultipleSingletonsError(
+                f"\nA broker is already bound & listening @ {self.address} on port {self.port}."
+            ) from None
+
+        self._sock.listen()
+        self._sock.setblocking(False)
+        self._wake_r, self._wake_w = _socket.socketpair()
+        self._selector = selectors.DefaultSelector()
+        self._listening = True
+        self._thread = Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        """Context manager protocol - returns self for use in 'with' statements."""
+
+        return self
+
+    def __exit__(self, ex_type, ex_value, ex_traceback):
+        """Context manager cleanup - releases the broker and every slot."""
+
+        self.release()
+        return False
+
+    def __repr__(self):
+        return (
+            f"SingletonBroker(address={self.address!r}, port={self.port}, "
+            f"slots={len(self._slots)}, listening={self._listening})"
+        )
+
+    @property
+    def slots(self):
+        """Snapshot of the claimed slots: {name: owner pid}."""
+
+        return {name: pid for name, (_, _, pid) in list(self._slots.items())}
+
+    @staticmethod
+    def list(address="127.0.0.1", port=1336, timeout=5):
+        """
+        Ask a running broker for its claimed slots.
+
+        Returns:
+            Dict of {name: owner pid}.
+        """
+
+        with _socket.create_connection((address, port), timeout) as sock:
+            sock.sendall(_frame(_FRAME_LIST))
+            marker, kind, _, length = _FRAME.unpack(_recv_exactly(sock, _FRAME.size))
+            payload = _recv_exactly(sock, length)
+        if marker != _FRAME_MARKER or kind != _FRAME_REPLY:
+            raise ConnectionError(f"unexpected reply from broker @ {address} on port {port}")
+        return _unpack_value(payload, 0)[0]
+
+    def release(self):
+        """Stop the broker, freeing every slot (their owners stop listening). Idempotent."""
+
+        if not self._listening:
+            return
+        self._listening = False
+        try:
+            self._wake_w.send(b"\x00")
+        except OSError:
+            pass
+        if self._thread is not current_thread():
+            self._thread.join(_JOIN_TIMEOUT)
+
+    def _serve(self):
+        """Broker thread: selector loop over the listener and every connection."""
+
+        selector = self._selector
+        selector.register(self._sock, selectors.EVENT_READ, self._accept)
+        selector.register(self._wake_r, selectors.EVENT_READ, None)
+        try:
+            while self._listening:
+                for key, events in selector.select():
+                    if key.data is None:
+                        key.fileobj.recv(1024)
+                    else:
+                        key.data(key.fileobj, events)
+        finally:
+            for connection in list(self._peers):
+                self._close(connection)
+            selector.close()
+            self._sock.close()
+            self._wake_r.close()
+            self._wake_w.close()
+
+    def _accept(self, sock, events):
+        try:
+            connection, _ = sock.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        connection.setblocking(False)
+        self._peers[connection] = _BrokerPeer()
+        self._selector.register(connection, selectors.EVENT_READ, self._service)
+
+    def _service(self, connection, events):
+        peer = self._peers[connection]
+        if events & selectors.EVENT_WRITE:
+            self._flush(connection, peer)
+        if not events & selectors.EVENT_READ or connection not in self._peers:
+            return
+
+        try:
+            data = connection.recv(_RECEIVE_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._close(connection)
+            return
+
+        buffer = peer.buffer
+        buffer += data
+        position = 0
+        while len(buffer) - position >= _FRAME.size:
+            marker, kind, flags, length = _FRAME.unpack_from(buffer, position)
+            end = position + _FRAME.size + length
+            if marker != _FRAME_MARKER or length > _MAX_MESSAGE_SIZE:
+                self._close(connection)
+                return
+            if len(buffer) < end:
+                break
+            payload = bytes(buffer[position + _FRAME.size : end])
+            position = end
+            self._handle(connection, peer, kind, flags, payload)
+            if connection not in self._peers:
+                return
+        del buffer[:position]
+
+    def _handle(self, connection, peer, kind, flags, payload):
+        """Dispatch one frame: claim, route, list, or a message for a slot owner."""
+
+        if kind in (_FRAME_MESSAGE, _FRAME_ARGS):
+            if peer.route is not None:
+                slot = self._slots.get(peer.route)
+                if slot is not None:
+                    # No acknowledgements or replies through the broker
+                    self._send(slot[0], _frame(kind, payload, flags & ~_FLAG_REPLY))
+            return
+
+        if kind == _FRAME_LIST:
+            self._send(connection, _frame(_FRAME_REPLY, _pack_value(self.slots)))
+            return
+
+        try:
+            name, secret, *pid = _unpack_value(payload, 0)[0]
+            if not isinstance(name, str) or not isinstance(secret, (str, type(None))):
+                raise TypeError("slot name and secret must be strings")
+            if pid and (not isinstance(pid[0], int) or isinstance(pid[0], bool)):
+                raise TypeError("pid must be an integer")
+        except (ValueError, TypeError, RecursionError):
+            # Malformed claim or route - drop the connection, never the broker
+            self._close(connection)
+            return
+
+        if kind == _FRAME_CLAIM and peer.owns is None and pid:
+            if name in self._slots:
+                self._send(connection, _frame(_FRAME_REJECT))
+                return
+            self._slots[name] = (connection, secret, pid[0])
+            peer.owns = name
+            self._send(connection, _frame(_FRAME_WELCOME))
+        elif kind == _FRAME_ROUTE and peer.route is None:
+            slot = self._slots.get(name)
+            if slot is None or (slot[1] is not None and secret != slot[1]):
+                _log_event(
+                    "route_failed",
+                    self.verbose,
+                    "Broker cannot route to slot %r, dropping client",
+                    name,
+                    port=self.port,
+                )
+                self._close(connection)
+                return
+            peer.route = name
+        else:
+            self._close(connection)
+
+    def _send(self, connection, data):
+        peer = self._peers.get(connection)
+        if peer is not None:
+            peer.outgoing += data
+            self._flush(connection, peer)
+
+    def _flush(self, connection, peer):
+        try:
+            sent = connection.send(peer.outgoing) if peer.outgoing else 0
+        except (BlockingIOError, InterruptedError):
+            sent = 0
+        except OSError:
+            self._close(connection)
+            return
+        del peer.outgoing[:sent]
+
+        writing = bool(peer.outgoing)
+        if writing != peer.writing:
+            peer.writing = writing
+            events = selectors.EVENT_READ | (selectors.EVENT_WRITE if writing else 0)
+            self._selector.modify(connection, events, self._service)
+
+    def _close(self, connection):
+        """Close a connection; an owner's slot becomes free for the next claim."""
+
+        peer = self._peers.pop(connection, None)
+        if peer is None:
+            return
+        if peer.owns is not None:
+            self._slots.pop(peer.owns, None)
+        self._selector.unregister(connection)
+        connection.close()
+
+
+class _BrokerPeer:
+    """Per-connection state for the broker's selector loop."""
+
+    __slots__ = ("buffer", "outgoing", "writing", "owns", "route")
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.outgoing = bytearray()
+        self.writing = False
+        # Name of the slot this connection owns, or of the slot its messages go to
+        self.owns = None
+        self.route = None
+
+
+class Subscription:
+    """
+    A subscriber process's connection to a host. See Socket_Singleton.subscribe().
+
+    Iterating yields a Message for each argument set the host receives (filtered by
+    route), until the host goes away or close() is called. The host disconnects
+    subscribers that fall more than its subscriber_buffer behind.
+
+    Raises:
+        ConnectionError: If the host rejects the subscription (wrong secret).
+    """
+
+    def __init__(self, address="127.0.0.1", port=1337, secret=None, routes=None, timeout=5):
+        self.address = str(address)
+        self.port = int(port)
+        self.routes = tuple(str(route) for route in routes) if routes is not None else None
+        self._sock = _socket.create_connection((self.address, self.port), timeout)
+
+        try:
+            request = _pack_value([secret, list(self.routes) if routes is not None else None])
+            self._sock.sendall(_frame(_FRAME_SUBSCRIBE, request))
+            marker, kind, _, length = _FRAME.unpack(_recv_exactly(self._sock, _FRAME.size))
+            _recv_exactly(self._sock, length)
+            if marker != _FRAME_MARKER or kind != _FRAME_WELCOME:
+                raise ConnectionError(
+                    f"host @ {self.address} on port {self.port} rejected the subscription"
+                )
+            # Events arrive whenever clients launch - wait indefinitely by default
+            self._sock.settimeout(None)
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self):
+        """Context manager protocol - returns self for use in 'with' statements."""
+
+        return self
+
+    def __exit__(self, ex_type, ex_value, ex_traceback):
+        """Context manager cleanup - closes the subscription."""
+
+        self.close()
+        return False
+
+    def __iter__(self):
+        while True:
+            message = self.receive()
+            if message is None:
+                return
+            yield message
+
+    def receive(self, timeout=None):
+        """
+        Wait for the next argument set.
+
+        Returns:
+            A Message, or None once the host has gone away (or the subscription is
+            closed).
+
+        Raises:
+            TimeoutError: If nothing arrives within `timeout` seconds.
+        """
+
+        if self._sock is None:
+            return None
+
+        self._sock.settimeout(timeout)
+        try:
+            while True:
+                marker, kind, _, length = _FRAME.unpack(_recv_exactly(self._sock, _FRAME.size))
+                payload = _recv_exactly(self._sock, length)
+                if marker == _FRAME_MARKER and kind == _FRAME_PUBLISH:
+                    return Message(payload)
+        except _socket.timeout:
+            raise TimeoutError("no argument set received within timeout") from None
+        except (ConnectionError, OSError):
+            self.close()
+            return None
+
+    def close(self):
+        """Close the subscription. Idempotent."""
+
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+class SharedMemoryChannel:
+    """
+    Client for a host's shared-memory transport, for high-rate producers.
+
+    Performs one socket handshake with the host (which must have been created with
+    shm_lanes > 0), then writes argument sets directly into a shared-memory ring that
+    the host drains in batches. The socket bind remains the singleton lock; only the
+    data path moves to shared memory. The lane is held until close().
+
+    Args:
+        address: Host address. Defaults to "127.0.0.1".
+        port: Host port. Defaults to 1337.
+        secret: Secret expected by the host, if any. Defaults to None.
+        timeout: Seconds to wait for the connection and the handshake, and for room
+            in a full lane in send(), before raising TimeoutError. Defaults to 5.
+
+    Raises:
+        ConnectionError: If the host rejects the handshake (wrong secret, shared memory
+            disabled, or no free lanes).
+
+    Example:
+        with SharedMemoryChannel(port=50123) as channel:
+            for path in paths:
+                channel.send(("open", path))
+    """
+
+    def __init__(self, address="127.0.0.1", port=1337, secret=None, timeout=5):
+        self.address = str(address)
+        self.port = int(port)
+        self.timeout = float(timeout)
+        self._memory = None
+        self._lane = None
+        self._sock = _socket.create_connection((self.address, self.port), self.timeout)
+
+        try:
+            request = (str(secret) if secret is not None else "").encode("utf-8")
+            self._sock.sendall(_frame(_FRAME_SHM_REQUEST, request))
+            marker, kind, _, length = _FRAME.unpack(_recv_exactly(self._sock, _FRAME.size))
+            payload = _recv_exactly(self._sock, length)
+            if marker != _FRAME_MARKER or kind != _FRAME_SHM_GRANT:
+                raise ConnectionError(
+                    f"host @ {self.address} on port {self.port} rejected the "
+                    f"shared-memory channel"
+                )
+
+            grant = json.loads(payload.decode("utf-8"))
+            self._memory = _attach_shared_memory(grant["name"])
+            self._lane = _Lane(self._memory.buf, grant["offset"], grant["capacity"])
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self):
+        """Context manager protocol - returns self for use in 'with' statements."""
+
+        return self
+
+    def __exit__(self, ex_type, ex_value, ex_traceback):
+        """Context manager cleanup - closes the channel and releases the lane."""
+
+        self.close()
+        return False
+
+    def send(self, args):
+        """
+        Write one argument set (an iterable of strings) into the lane.
+
+        Blocks while the lane is full, up to `timeout` seconds.
+        """
+
+        payload = _encode_args(args)
+        deadline = None
+        while not self._lane.write(payload):
+            now = monotonic()
+            if deadline is None:
+                deadline = now + self.timeout
+            elif now >= deadline:
+                raise TimeoutError("shared-memory lane is full")
+            self._ring()
+            sleep(0.0005)
+
+        if self._lane.waiting:
+            self._ring()
+
+    def send_many(self, argument_sets):
+        """Write many argument sets into the lane."""
+
+        for args in argument_sets:
+            self.send(args)
+
+    def _ring(self):
+        """Wake the host's selector (doorbell)."""
+
+        self._lane.waiting = False
+        self._sock.sendall(_frame(_FRAME_DOORBELL))
+
+    def close(self):
+        """Release the lane and detach from shared memory. Idempotent."""
+
+        self._lane = None
+        if self._memory is not None:
+            self._memory.close()
+            self._memory = None
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+def _args_of(item):
+    """The argument tuple of a queued item (a tuple or a Message)."""
+
+    return item.args if isinstance(item, Message) else item
+
+
+def _pid_alive(pid):
+    """True if a process with this pid exists. Always False on Windows, where os.kill
+    cannot probe a process without terminating it."""
+
+    if platform == "win32" or not isinstance(pid, int) or pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except PermissionError:
+        # Exists, owned by another user
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def _handoff_entry(seq, item, priority):
+    """Encode a pending argument set (a tuple or a Message) for a handoff."""
+
+    if isinstance(item, Message):
+        if item._payload is not None:
+            payload = item._payload
+        else:
+            payload = Message.encode(
+                item.args, item.cwd, item.pid, item.env, item.metadata, item.priority
+            )
+    else:
+        payload = Message.encode(item)
+    return _HANDOFF_ENTRY.pack(seq, priority, isinstance(item, Message), len(payload)) + payload
+
+
+def _handoff_entries(data):
+    """
+    Decode the pending argument sets of a handoff into (seq, item, priority) entries.
+
+    Raises:
+        ValueError: If the data is truncated or an entry is not a valid Message.
+    """
+
+    entries = []
+    view = memoryview(data)
+    position = 0
+    while position < len(view):
+        if position + _HANDOFF_ENTRY.size > len(view):
+            raise ValueError("truncated handoff entry")
+        seq, priority, is_message, length = _HANDOFF_ENTRY.unpack_from(view, position)
+        position += _HANDOFF_ENTRY.size
+        if position + length > len(view):
+            raise ValueError("truncated handoff entry")
+        message = Message(view[position : position + length])
+        position += length
+        entries.append((seq, message if is_message else tuple(message.args), priority))
+    return entries
+
+
+def _encode_text(text):
+    """
+    Encode a client-side string as UTF-8. Undecodable bytes that Python smuggled into argv,
+    paths or the environment as lone surrogates are restored rather than raising.
+    """
+
+    return text.encode("utf-8", errors="surrogateescape")
+
+
+def _encode_args(args):
+    """Encode an argument set as NUL-delimited UTF-8, with the same error policy as _encode_text."""
+
+    return _encode_text("\x00".join(args))
+
+
+def _legacy_message(secret, args):
+    """
+    Encode a Socket_Singleton 2.x client message: the secret (if any) and the arguments,
+    NUL-delimited and NUL-terminated.
+
+    A payload whose first byte is _FRAME_MARKER would be read as a framed message, so one
+    that would start with it (an argument beginning with an undecodable 0xFF byte) is
+    prefixed with an empty argument, which hosts drop. A secret is valid UTF-8 (checked by
+    Socket_Singleton), which never contains 0xFF.
+    """
+
+    parts = [secret] if secret is not None else []
+    parts.extend(args)
+    # A lone NUL when there is nothing to send, as 2.x clients did
+    data = _encode_args(parts) + b"\x00"
+    if data[0] == _FRAME_MARKER:
+        data = b"\x00" + data
+    return data
+
+
+def _endpoint(endpoint):
+    """
+    Validate a listening endpoint: a Unix socket path (str or path-like), or an
+    ("address", port) tuple.
+    """
+
+    if isinstance(endpoint, (str, os.PathLike)):
+        if not hasattr(_socket, "AF_UNIX"):
+            raise NotImplementedError("Unix socket endpoints require AF_UNIX support")
+        return os.fspath(endpoint)
+    try:
+        address, port = endpoint
+    except (TypeError, ValueError):
+        raise ValueError(
+            f"endpoint must be a path or an (address, port) tuple: {endpoint!r}"
+        ) from None
+    port = int(port)
+    if not (0 < port <= 65535):
+        raise ValueError("endpoint port must be between 1 and 65535 (inclusive)")
+    return (str(address), port)
+
+
+def _peer_credentials(connection):
+    """
+    The (pid, uid, gid) of a Unix socket peer, or None where SO_PEERCRED is unavailable.
+    """
+
+    if not hasattr(_socket, "SO_PEERCRED"):
+        return None
+    try:
+        data = connection.getsockopt(_socket.SOL_SOCKET, _socket.SO_PEERCRED, _PEERCRED.size)
+    except OSError:
+        return None
+    return _PEERCRED.unpack(data)
+
+
+def _unlink_socket(path):
+    """
+    Remove a (stale) Unix socket file, if there is one at path.
+
+    Raises:
+        FileExistsError: If path exists but is not a socket - a mistyped path must
+            not delete the user's files.
+    """
+
+    try:
+        if not stat.S_ISSOCK(os.lstat(path).st_mode):
+            raise FileExistsError(errno.EEXIST, "Not a Unix socket, refusing to replace it", path)
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _endpoint_socket(endpoint):
+    """An unconnected stream socket of the endpoint's family."""
+
+    if isinstance(endpoint, str):
+        return socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+    family = _socket.AF_INET6 if ":" in endpoint[0] else _socket.AF_INET
+    return socket(family, _socket.SOCK_STREAM)
+
+
+def _endpoint_cost(endpoint):
+    """Relative cost of reaching an endpoint: Unix socket, loopback TCP, other TCP."""
+
+    if isinstance(endpoint, str):
+        return 0
+    address = endpoint[0]
+    return 1 if address == "localhost" or address == "::1" or address.startswith("127.") else 2
+
+
+def _connect_cheapest(endpoints, timeout):
+    """
+    Connect to the cheapest reachable endpoint, trying equally cheap ones in order.
+
+    Returns:
+        A connected socket, with `timeout` set.
+
+    Raises:
+        OSError: The last endpoint's error, if none is reachable.
+    """
+
+    error = None
+    for endpoint in sorted(endpoints, key=_endpoint_cost):
+        sock = _endpoint_socket(endpoint)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(endpoint)
+        except OSError as err:
+            sock.close()
+            error = err
+            continue
+        return sock
+    raise error
+
+
+def _weak_ref(observer, callback=None):
+    """
+    A weak reference to observer: a WeakMethod for bound methods (which are created
+    afresh on each attribute access), a plain weakref.ref for anything else.
+
+    Raises:
+        TypeError: If observer cannot be weakly referenced, or only through a temporary
+            object - e.g. a builtin's bound method like list.append, which would be
+            collected, and the observer unregistered, straight away.
+    """
+
+    if isinstance(observer, MethodType):
+        ref = weakref.WeakMethod(observer, callback)
+    elif getattr(observer, "__self__", None) is None or isinstance(observer.__self__, ModuleType):
+        ref = weakref.ref(observer, callback)
+    else:
+        # Bound to an instance, but not a WeakMethod candidate (list.append, a method
+        # wrapper): a new object on every attribute access, referenced by nobody else
+        ref = None
+    if ref is None or ref() is None:
+        raise TypeError(f"cannot keep a usable weak reference to {observer!r}")
+    return ref
+
+
+def _pack_value(value, out=None):
+    """
+    Encode a typed value with the library's compact, msgpack-like codec.
+
+    Each value is a one-byte tag followed by its body: N (None), T/F (bool),
+    i (int64), d (float64), s (UTF-8 str), b (bytes) - both length-prefixed -
+    l (list: count, items) and m (dict: count, key/value pairs).
+    """
+
+    if out is None:
+        out = bytearray()
+        _pack_value(value, out)
+        return bytes(out)
+
+    if value is None:
+        out += b"N"
+    elif value is True:
+        out += b"T"
+    elif value is False:
+        out += b"F"
+    elif isinstance(value, int):
+        if not -(1 << 63) <= value < (1 << 63):
+            raise TypeError("metadata integers must fit in 64 bits")
+        out += b"i" + _INT64.pack(value)
+    elif isinstance(value, float):
+        out += b"d" + _FLOAT64.pack(value)
+    elif isinstance(value, str):
+        data = _encode_text(value)
+        out += b"s" + _SIZE.pack(len(data)) + data
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        out += b"b" + _SIZE.pack(len(value)) + bytes(value)
+    elif isinstance(value, (list, tuple)):
+        out += b"l" + _SIZE.pack(len(value))
+        for item in value:
+            _pack_value(item, out)
+    elif isinstance(value, dict):
+        out += b"m" + _SIZE.pack(len(value))
+        for key, item in value.items():
+            _pack_value(key, out)
+            _pack_value(item, out)
+    else:
+        raise TypeError(f"cannot encode value of type {type(value).__name__}")
+
+    return out
+
+
+def _unpack_value(data, position, depth=0):
+    """
+    Decode one value encoded by _pack_value.
+
+    Returns:
+        (value, position just past the value)
+
+    Raises:
+        ValueError: If the data is truncated, malformed or nested deeper than
+            _MAX_VALUE_DEPTH.
+    """
+
+    try:
+        tag = data[position : position + 1]
+        position += 1
+        if tag == b"N":
+            return None, position
+        if tag == b"T":
+            return True, position
+        if tag == b"F":
+            return False, position
+        if tag == b"i":
+            return _INT64.unpack_from(data, position)[0], position + _INT64.size
+        if tag == b"d":
+            return _FLOAT64.unpack_from(data, position)[0], position + _FLOAT64.size
+
+        (size,) = _SIZE.unpack_from(data, position)
+        position += _SIZE.size
+        if tag in (b"s", b"b"):
+            body = bytes(data[position : position + size])
+            if len(body) != size:
+                raise ValueError("truncated value")
+            if tag == b"s":
+                body = body.decode("utf-8", errors="surrogateescape")
+            return body, position + size
+        if tag in (b"l", b"m") and depth >= _MAX_VALUE_DEPTH:
+            raise ValueError("value nested too deeply")
+        if tag == b"l":
+            items = []
+            for _ in range(size):
+                item, position = _unpack_value(data, position, depth + 1)
+                items.append(item)
+            return items, position
+        if tag == b"m":
+            mapping = {}
+            for _ in range(size):
+                key, position = _unpack_value(data, position, depth + 1)
+                mapping[key], position = _unpack_value(data, position, depth + 1)
+            return mapping, position
+    except struct.error:
+        raise ValueError("truncated value") from None
+    except TypeError:
+        # A list or map as a map key
+        raise ValueError("unhashable map key") from None
+
+    raise ValueError(f"unknown value tag {tag!r}")
+
+
+def _pack_results(results, verbose=False):
+    """Encode a reply's observer results; values the codec cannot represent become None."""
+
+    try:
+        return _pack_value(list(results))
+    except TypeError:
+        packed = []
+        for result in results:
+            try:
+                _pack_value(result)
+            except TypeError as err:
+                _log_event("reply_failed", verbose, "Cannot send observer result in reply: %s", err)
+                result = None
+            packed.append(result)
+        return _pack_value(packed)
+
+
+def _frame(kind, payload=b"", flags=0):
+    """Build one framed-protocol frame."""
+
+    return _FRAME.pack(_FRAME_MARKER, kind, flags, len(payload)) + payload
+
+
+def _supported_codecs():
+    """Frame flags for the compression codecs available in this process."""
+
+    return _FLAG_ZLIB | (_FLAG_LZ4 if lz4_frame is not None else 0)
+
+
+def _compress(payload, threshold, codec=_FLAG_ZLIB):
+    """
+    Compress a payload of at least `threshold` bytes (0 disables compression).
+
+    Returns:
+        (payload, frame flags). The payload is sent as-is if compressing does not
+        make it smaller.
+    """
+
+    if not threshold or len(payload) < threshold:
+        return payload, 0
+
+    if codec == _FLAG_LZ4:
+        compressed = lz4_frame.compress(payload)
+    else:
+        compressed = zlib.compress(payload, _ZLIB_LEVEL)
+
+    if len(compressed) >= len(payload):
+        return payload, 0
+    return compressed, codec
+
+
+def _decompress(flags, payload, limit=_MAX_MESSAGE_SIZE):
+    """
+    Decompress a frame payload, producing at most `limit` bytes.
+
+    Raises:
+        ValueError: If the codec is unavailable, the payload is corrupt or truncated,
+            or it decompresses to more than `limit` bytes.
+    """
+
+    try:
+        if flags & _FLAG_LZ4:
+            if lz4_frame is None:
+                raise ValueError("lz4 is not installed")
+            decompressor = lz4_frame.LZ4FrameDecompressor()
+            data = decompressor.decompress(payload, max_length=limit + 1)
+            complete = decompressor.eof
+        else:
+            decompressor = zlib.decompressobj()
+            data = decompressor.decompress(payload, limit + 1)
+            complete = decompressor.eof and not decompressor.unconsumed_tail
+    except (zlib.error, RuntimeError) as err:
+        raise ValueError(f"corrupt compressed payload: {err}") from None
+
+    if len(data) > limit:
+        raise ValueError(f"payload decompresses to more than {limit} bytes")
+    if not complete:
+        raise ValueError("truncated compressed payload")
+    return data
+
+
+def _import_shared_memory():
+    """Import multiprocessing.shared_memory (Python 3.8+) on first use."""
+
+    try:
+        from multiprocessing import shared_memory
+    except ImportError:
+        raise NotImplementedError("the shared-memory transport requires Python 3.8+") from None
+    return shared_memory
+
+
+def _attach_shared_memory(name):
+    """
+    Attach to an existing shared-memory block without taking ownership of it.
+
+    Before Python 3.13, attaching registers the block with this process's resource
+    tracker, which would unlink the host's block when this process exits.
+    """
+
+    shared_memory = _import_shared_memory()
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        memory = shared_memory.SharedMemory(name=name)
+        if os.name == "posix":
+            from multiprocessing import resource_tracker
+
+            resource_tracker.unregister(memory._name, "shared_memory")
+        return memory
+
+
+def _lock_file(file):
+    """Take an exclusive advisory lock on an open file, where supported."""
+
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+
+
+def _unlock_file(file):
+    """Release a lock taken by _lock_file."""
+
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+def _supports_handoff():
+    """True if this platform can pass sockets between processes (AF_UNIX + SCM_RIGHTS)."""
+
+    return (
+        hasattr(_socket, "AF_UNIX")
+        and hasattr(_socket, "SCM_RIGHTS")
+        and hasattr(socket, "sendmsg")
+    )
+
+
+def _lock_backend(lock, key):
+    """Resolve Socket_Singleton's `lock` argument to a LockBackend (or None)."""
+
+    if lock is None or isinstance(lock, LockBackend):
+        return lock
+    name = f"socket_singleton-{_user_id()}-{quote(key, safe='')}"
+    if lock == "file":
+        return FileLock(os.path.join(_runtime_directory(), f"{name}.lock"))
+    if lock == "abstract":
+        return AbstractSocketLock(name)
+    raise ValueError('lock must be None, "file", "abstract" or a LockBackend')
+
+
+def _user_id():
+    """Stable per-user identifier, so different users' singletons do not collide."""
+
+    if hasattr(os, "getuid"):
+        return str(os.getuid())
+    return os.environ.get("USERNAME", "")
+
+
+def _derive_port(name):
+    """Deterministic port for a named singleton, from a stable hash of name and user."""
+
+    low, high = _NAMED_PORTS
+    digest = zlib.crc32(f"{name}\x00{_user_id()}".encode("utf-8"))
+    return low + digest % (high - low - _PORT_PROBES + 1)
+
+
+def _runtime_directory():
+    """
+    This user's private directory for lock and discovery files, created on first use:
+    socket_singleton-<user id> in $XDG_RUNTIME_DIR (or the temp directory, shared by
+    every user - hence the user id).
+
+    Raises:
+        PermissionError: If the directory exists but is not a directory owned by, and
+            only writable by, the current user.
+    """
+
+    base = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    directory = os.path.join(base, f"socket_singleton-{quote(_user_id(), safe='')}")
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if hasattr(os, "getuid"):
+        status = os.lstat(directory)
+        if (
+            not stat.S_ISDIR(status.st_mode)
+            or status.st_uid != os.getuid()
+            or status.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+        ):
+            raise PermissionError(
+                errno.EACCES, f"{directory} is not a private directory of the current user"
+            )
+    return directory
+
+
+def _discovery_path(name):
+    """
+    Path of a named singleton's discovery file.
+
+    Raises:
+        PermissionError: See _runtime_directory().
+    """
+
+    return os.path.join(_runtime_directory(), f"{quote(name, safe='')}.json")
+
+
+def _identify(address, port, timeout, transport=None):
+    """
+    Ask whoever holds a port to identify itself (identity handshake).
+
+    A host that has bound its port but not yet started listening refuses the
+    connection, so refusals are retried until the timeout.
+
+    Returns:
+        The Socket_Singleton host's identity dict ("name", "pid"), or None if the
+        port's owner is not a Socket_Singleton (or did not answer in time).
+    """
+
+    deadline = monotonic() + timeout
+    while True:
+        try:
+            with (transport or _TCP).create_connection((address, port), timeout) as sock:
+                sock.sendall(_frame(_FRAME_IDENTIFY))
+                marker, kind, _, length = _FRAME.unpack(_recv_exactly(sock, _FRAME.size))
+                if marker != _FRAME_MARKER or kind != _FRAME_IDENTIFY:
+                    return None
+                identity = _unpack_value(_recv_exactly(sock, length), 0)[0]
+                return identity if isinstance(identity, dict) else None
+        except ConnectionRefusedError:
+            if monotonic() >= deadline:
+                return None
+            sleep(0.01)
+        except (OSError, ValueError, struct.error):
+            return None
+
+
+def _recv_exactly(sock, size):
+    """Receive exactly `size` bytes from a blocking socket."""
+
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise ConnectionError("connection closed before all data was received")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+class _LogRateLimit:
+    """
+    Per-event log rate limit: at most `burst` records of each event type per `window`
+    seconds. Suppressed records are counted and reported with the next admitted one.
+    """
+
+    def __init__(self, burst, window):
+        self.burst = burst
+        self.window = window
+        # event -> [window start, records admitted, records suppressed]
+        self._events = {}
+        self._lock = Lock()
+
+    def admit(self, event):
+        """
+        Returns:
+            The number of records suppressed since the last admitted one, or None if
+            this record is suppressed too.
+        """
+
+        now = monotonic()
+        with self._lock:
+            state = self._events.get(event)
+            if state is None or now - state[0] >= self.window:
+                self._events[event] = [now, 1, 0]
+                return state[2] if state is not None else 0
+            if state[1] < self.burst:
+                state[1] += 1
+                return 0
+            state[2] += 1
+            return None
+
+
+class _LogEcho(logging.Handler):
+    """Runs on the echo thread: writes records of verbose instances to stdout."""
+
+    def __init__(self):
+        super().__init__()
+        self.setFormatter(logging.Formatter("%(name)s: %(message)s"))
+
+    def emit(self, record):
+        try:
+            sys.stdout.write(self.format(record) + "\n")
+            sys.stdout.flush()
+        except (OSError, ValueError):
+            pass
+
+
+class _LogEchoQueue(QueueHandler):
+    """Hands verbose echoes to the echo thread (started on first use) without blocking."""
+
+    _listener = None
+    _lock = Lock()
+
+    def enqueue(self, record):
+        if _LogEchoQueue._listener is None:
+            with _LogEchoQueue._lock:
+                if _LogEchoQueue._listener is None:
+                    listener = QueueListener(self.queue, _LogEcho())
+                    listener.start()
+                    # Deliver whatever is still queued at interpreter exit
+                    atexit.register(listener.stop)
+                    _LogEchoQueue._listener = listener
+        super().enqueue(record)
+
+
+def _log_event(event, verbose, message, *args, level=logging.WARNING, **fields):
+    """
+    Log a library event through the "Socket_Singleton" logger.
+
+    Records carry structured fields (`event`, `verbose`, plus e.g. `port`) and a
+    `suppressed` count, and are rate limited per event type. They propagate to the
+    application's handlers like any library's records; verbose instances also echo
+    them to stdout from the echo thread, so a stdout pipe nobody reads never blocks
+    the server thread.
+    """
+
+    enabled = _logger.isEnabledFor(level)
+    # Verbose echoes bypass the logger's level, but not logging.disable()
+    echo = verbose and _logger.manager.disable < level
+    if not (enabled or echo):
+        # Nobody would see it - skip the record entirely
+        return
+    suppressed = _LOG_RATE_LIMIT.admit(event)
+    if suppressed is None:
+        return
+    if suppressed:
+        message += " (%d similar messages suppressed)"
+        args += (suppressed,)
+    fields.update(event=event, verbose=verbose, suppressed=suppressed)
+    record = _logger.makeRecord(_logger.name, level, __file__, 0, message, args, None, extra=fields)
+    if echo:
+        # QueueHandler.prepare() formats a copy, leaving the record to the handlers below
+        _LOG_ECHO.handle(record)
+    if enabled:
+        _logger.handle(record)
+
+
+_LOG_RATE_LIMIT = _LogRateLimit(_LOG_BURST, _LOG_WINDOW)
+_LOG_ECHO = _LogEchoQueue(SimpleQueue())
+_logger = logging.getLogger("Socket_Singleton")
+# The usual library setup: records propagate to the application's handlers, and
+# Python's last-resort stderr handler stays out of it when there are none
+_logger.addHandler(logging.NullHandler())
+
+
+class MultipleSingletonsError(Exception):
+    """
+    Raised when attempting to create a singleton instance but one already exists.
 
     This exception is only raised when strict=False. When strict=True (default),
     SystemExit is raised instead.
     """
+
+
+if __name__ == "__main__":
+    # python -m Socket_Singleton send ...: the same command line as the minimal client,
+    # which starts faster when invoked directly (python -m Socket_Singleton_client)
+    from Socket_Singleton_client import main
+
+    sys.exit(main())
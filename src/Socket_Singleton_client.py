@@ -0,0 +1,92 @@
+"""
+Minimal client for a running Socket_Singleton host.
+
+A launcher that only ever forwards its arguments does not need the full library -
+its whole job is to connect, send and exit. This module imports nothing beyond
+`socket` (sys is built into the interpreter), so it starts in a fraction of the
+time.
+
+Usage:
+    python -m Socket_Singleton_client send [--address A] [--port N] [--secret S] -- args...
+
+Exits with status 0 if the arguments were sent, or 1 if no host was reachable.
+"""
+
+import socket
+import sys
+
+# Mirrors Socket_Singleton's framed protocol: marker, kind, flags (2 bytes) and payload
+# length (4 bytes), all big-endian - built with int.to_bytes to avoid importing struct.
+_FRAME_MARKER = 0xFF
+_FRAME_HELLO = 5
+_FRAME_ARGS = 7
+
+_USAGE = (
+    "usage: python -m Socket_Singleton_client send [--address A] [--port N] [--secret S] -- args..."
+)
+
+
+def _frame(kind, payload):
+    return bytes((_FRAME_MARKER, kind, 0, 0)) + len(payload).to_bytes(4, "big") + payload
+
+
+def send(args, address="127.0.0.1", port=1337, secret=None, timeout=5):
+    """
+    Send one argument set to the host listening @ address on port.
+
+    The host receives the arguments like any client's, without the cwd, pid and
+    environment a full Socket_Singleton client attaches.
+
+    Args:
+        args: Iterable of strings.
+        address: Host address. Defaults to "127.0.0.1".
+        port: Host port. Defaults to 1337.
+        secret: The host's secret, if it has one. Defaults to None.
+        timeout: Seconds to wait for the connection. Defaults to 5.
+
+    Returns:
+        True if the arguments were sent, False if no host was reachable.
+    """
+
+    hello = (secret or "").encode("utf-8")
+    # surrogateescape, as Socket_Singleton encodes arguments: undecodable argv bytes round-trip
+    payload = "\x00".join(args).encode("utf-8", errors="surrogateescape")
+    try:
+        with socket.create_connection((address, port), timeout) as sock:
+            # Handshake and arguments in one write - no round trip
+            sock.sendall(_frame(_FRAME_HELLO, hello) + _frame(_FRAME_ARGS, payload))
+    except OSError:
+        return False
+    return True
+
+
+def main(argv=None):
+    """Command-line entry point. Returns the process exit status."""
+
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] != "send":
+        print(_USAGE, file=sys.stderr)
+        return 2
+
+    options = {"--address": "127.0.0.1", "--port": "1337", "--secret": None}
+    position = 1
+    while position < len(argv) and argv[position] != "--":
+        option = argv[position]
+        if option not in options or position + 1 >= len(argv):
+            print(_USAGE, file=sys.stderr)
+            return 2
+        options[option] = argv[position + 1]
+        position += 2
+
+    try:
+        port = int(options["--port"])
+    except ValueError:
+        print(_USAGE, file=sys.stderr)
+        return 2
+
+    sent = send(argv[position + 1 :], options["--address"], port, options["--secret"])
+    return 0 if sent else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,14 +7,88 @@ Tests are organized into separate classes by concern:
 - ArgumentPassing: Tests for argument passing between processes
 - Timeouts: Tests for timeout and release functionality
 - Thresholds: Tests for max_clients and release_threshold
+- Handoff: Tests for passing the listening socket to a successor process
+- Standby: Tests for followers taking over when the host goes away
+- Spool: Tests for spooling arguments while no host is reachable
+- Journal: Tests for journaling and replaying argument sets
+- SharedMemory: Tests for the shared-memory ring buffer transport
+- Connection: Tests for persistent, pipelined client connections
+- Message: Tests for structured messages (cwd, pid, env, metadata)
+- ArgumentSet: Tests for lazily decoded argument views and the pooled receive path
+- Compression: Tests for compressed payloads and the decompression limit
+- Admission: Tests for token-bucket admission control
+- Pull: Tests for pull-based consumption (get, messages, messages_async)
+- Priority: Tests for priority lanes in the host queue
+- Watchdog: Tests for observer time budgets and quarantine
+- Cache: Tests for the result cache and reply-mode requests
+- Subscribe: Tests for fanning argument sets out to subscriber processes
+- Broker: Tests for named singletons sharing one broker port
+- Named: Tests for derived ports, discovery files and the identity handshake
+- LockBackends: Tests for the file-lock and abstract-socket lock backends
+- MinimalClient: Tests for the import-light client entry point and lazy timer
+- IdleTimeout: Tests for the idle timeout and the shared timer scheduler
+- Loopback: In-process tests over the loopback transport and a manual clock
+- Logging: Tests for the library logger, rate limiting and propagation to application handlers
+- WeakObservers: Tests for weakly referenced observers and their pruning
+- Soak: Long-run memory tests of a host driven through many client connections
+- Endpoints: Tests for hosts listening on several TCP and Unix socket endpoints
 """
 
+import asyncio
+import gc
+import json
+import logging
+import os
+import random
 import socket
+import stat
+import sys
+import tempfile
+import tracemalloc
 import unittest
+import weakref
+import zlib
+from logging.handlers import QueueHandler, QueueListener
+from queue import Empty, SimpleQueue
 from subprocess import PIPE, STDOUT, Popen, run
-from time import sleep
-
-from src.Socket_Singleton import MultipleSingletonsError, Socket_Singleton
+from threading import Event, Thread, Timer
+from threading import enumerate as threads
+from time import monotonic, sleep
+from unittest import mock
+
+from src import Socket_Singleton_client
+from src.Socket_Singleton import (
+    _FLAG_ZLIB,
+    _FRAME_ARGS,
+    _FRAME_CLAIM,
+    _FRAME_HELLO,
+    _FRAME_MESSAGE,
+    _FRAME_SUBSCRIBE,
+    _SHM_ENTRY,
+    _SHM_HEAD,
+    AbstractSocketLock,
+    ArgumentSet,
+    FileLock,
+    LockBackend,
+    LoopbackTransport,
+    ManualClock,
+    Message,
+    MultipleSingletonsError,
+    SharedMemoryChannel,
+    SingletonBroker,
+    Socket_Singleton,
+    _compress,
+    _derive_port,
+    _discovery_path,
+    _frame,
+    _identify,
+    _legacy_message,
+    _LogRateLimit,
+    _pack_value,
+    _runtime_directory,
+    _Scheduler,
+    _Spool,
+)
 
 
 def get_free_port():
@@ -47,6 +121,14 @@ def run_test_app(command, wait=True, capture_output=False):
             return Popen(cmd, shell=True, stdout=None, stderr=None)
 
 
+def wait_for(predicate, timeout=2.0):
+    """Poll until predicate() is true or the timeout expires. Returns the last result."""
+    deadline = monotonic() + timeout
+    while not predicate() and monotonic() < deadline:
+        sleep(0.01)
+    return predicate()
+
+
 class TestInProcess(unittest.TestCase):
     """Tests that can run in-process without separate processes."""
 
@@ -288,6 +370,12 @@ class TestValidation(unittest.TestCase):
             Socket_Singleton(port=-1)
         self.assertIn("port must be between 0 and 65535", str(context.exception))
 
+    def test_invalid_secret_encoding(self):
+        """Test that a secret that is not valid UTF-8 text raises ValueError."""
+        with self.assertRaises(ValueError) as context:
+            Socket_Singleton(secret="\udcff")
+        self.assertIn("secret must be valid UTF-8 text", str(context.exception))
+
     def test_invalid_port_too_high(self):
         """Test that port > 65535 raises ValueError."""
         with self.assertRaises(ValueError) as context:
@@ -314,6 +402,12 @@ class TestValidation(unittest.TestCase):
             Socket_Singleton(port=get_free_port(), max_clients=-1)
         self.assertIn("max_clients must be greater than or equal to 0", str(context.exception))
 
+    def test_invalid_queue_limit(self):
+        """Test that queue_limit < 0 raises ValueError."""
+        with self.assertRaises(ValueError) as context:
+            Socket_Singleton(port=get_free_port(), queue_limit=-1)
+        self.assertIn("queue_limit must be greater than or equal to 0", str(context.exception))
+
 
 class TestSingletonEnforcement(unittest.TestCase):
     """Tests for singleton enforcement requiring separate processes."""
@@ -836,5 +930,2049 @@ class TestConcurrency(unittest.TestCase):
             self.assertTrue(found, f"Missing arguments from rapid{i}")
 
 
+@unittest.skipUnless(
+    hasattr(socket, "AF_UNIX") and hasattr(socket, "SCM_RIGHTS"), "requires SCM_RIGHTS"
+)
+class TestHandoff(unittest.TestCase):
+    """Tests for handing the listening socket to a successor without unbinding."""
+
+    def setUp(self):
+        """Set up a host with a handoff control socket."""
+        self.port = get_free_port()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "handoff.sock")
+        self.handed_off = []
+        self.app = Socket_Singleton(
+            port=self.port, handoff=self.path, on_handoff=self.handed_off.append
+        )
+
+    def tearDown(self):
+        """Clean up after each test."""
+        self.app.release()
+        self.tmp.cleanup()
+        sleep(0.2)
+
+    def test_takeover_transfers_socket_and_queue(self):
+        """Test that a successor serves the same port with the predecessor's pending args."""
+        # No observers on the old host - arguments stay queued
+        self.app._append_args(("pending",))
+        self.assertEqual(self.app.arguments, (("pending",),))
+
+        successor = Socket_Singleton(port=self.port, handoff=self.path, takeover=True)
+        try:
+            self.assertEqual(self.handed_off, [self.app])
+            self.assertFalse(self.app._listening)
+            self.assertTrue(successor._listening)
+            self.assertEqual(successor.arguments, (("pending",),))
+
+            received_args = []
+            successor.trace(received_args.append)
+            run_test_app(f"default {self.port} foo bar")
+            self.assertEqual(received_args[-1], ("foo", "bar"))
+
+            # The port was never released - a normal launch is still a client
+            result = run_test_app(f"default {self.port}")
+            self.assertNotIn("Singleton locked", result.stdout)
+        finally:
+            successor.release()
+
+    def test_takeover_keeps_priority_and_context(self):
+        """Test that pending Messages reach the successor with their lane and context."""
+        self.app._append_args(("normal",))
+        self.app._append_args(Message.from_args(("urgent",), cwd="/srv", priority=3))
+        self.app._append_args(Message(Message.encode(("env",), env={"LANG": "C"})))
+
+        successor = Socket_Singleton(port=self.port, handoff=self.path, takeover=True)
+        try:
+            received = []
+            successor.trace(received.append, message=True)
+            self.assertEqual(
+                [tuple(m.args) for m in received], [("urgent",), ("normal",), ("env",)]
+            )
+            self.assertEqual(received[0].cwd, "/srv")
+            self.assertEqual(received[0].priority, 3)
+            self.assertEqual(received[2].env, {"LANG": "C"})
+        finally:
+            successor.release()
+
+    def test_control_socket_is_private(self):
+        """Test that only the owner can connect to the handoff control socket."""
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+
+    def test_blocked_server_thread_aborts_handoff(self):
+        """Test that the host keeps serving when its server thread doesn't stop in time."""
+        unblock = Event()
+        self.app.trace(lambda args: unblock.wait(10))
+        with Socket_Singleton.connect(port=self.port) as connection:
+            connection.send(("block",))
+
+        with mock.patch("src.Socket_Singleton._JOIN_TIMEOUT", 0.2):
+            with self.assertRaises(MultipleSingletonsError):
+                Socket_Singleton(port=self.port, handoff=self.path, takeover=True, strict=False)
+        self.assertEqual(self.handed_off, [])
+
+        unblock.set()
+        received = []
+        self.app.trace(received.append)
+        with Socket_Singleton.connect(port=self.port, ack=True) as connection:
+            connection.send(("after",))
+            connection.flush()
+        self.assertIn(("after",), received)
+
+    def test_takeover_requires_matching_secret(self):
+        """Test that a successor with the wrong secret cannot take over."""
+        self.app.release()
+        self.app = Socket_Singleton(port=self.port, handoff=self.path, secret="s3cret")
+
+        with self.assertRaises(MultipleSingletonsError):
+            Socket_Singleton(
+                port=self.port, handoff=self.path, takeover=True, strict=False, secret="nope"
+            )
+
+        self.assertTrue(self.app._listening)
+
+    def test_handoff_path_must_be_a_socket(self):
+        """Test that a host refuses to replace a regular file at the handoff path."""
+        self.app.release()
+        path = os.path.join(self.tmp.name, "notes.txt")
+        with open(path, "w") as notes:
+            notes.write("keep me")
+
+        with self.assertRaises(FileExistsError):
+            Socket_Singleton(port=self.port, handoff=path)
+        with open(path) as notes:
+            self.assertEqual(notes.read(), "keep me")
+        # The failed host released its port
+        self.app = Socket_Singleton(port=self.port, handoff=self.path)
+        self.assertTrue(self.app._listening)
+
+    def test_takeover_requires_handoff_path(self):
+        """Test that takeover without a handoff path raises ValueError."""
+        with self.assertRaises(ValueError):
+            Socket_Singleton(port=self.port, takeover=True)
+
+
+class TestStandby(unittest.TestCase):
+    """Tests for standby followers taking over when the host goes away."""
+
+    def setUp(self):
+        """Set up a host and a list of followers to clean up."""
+        self.port = get_free_port()
+        self.app = Socket_Singleton(port=self.port)
+        self.followers = []
+
+    def tearDown(self):
+        """Clean up after each test."""
+        self.app.release()
+        for follower in self.followers:
+            follower.release()
+        sleep(0.2)
+
+    def follow(self, on_promoted=None):
+        """Create a standby follower of self.app."""
+        follower = Socket_Singleton(
+            port=self.port,
+            client=False,
+            standby=True,
+            on_promoted=on_promoted,
+            failover_interval=0.05,
+        )
+        self.followers.append(follower)
+        return follower
+
+    def test_follower_promoted_after_host_release(self):
+        """Test that a follower becomes the host within the failover interval."""
+        promoted = Event()
+        follower = self.follow(on_promoted=lambda app: promoted.set())
+        self.assertFalse(follower.listening)
+
+        self.app.release()
+        self.assertTrue(promoted.wait(2))
+        self.assertTrue(follower.listening)
+
+        received_args = []
+        follower.trace(received_args.append)
+        run_test_app(f"default {self.port} foo")
+        self.assertEqual(received_args, [("foo",)])
+
+    def test_single_follower_promoted(self):
+        """Test that exactly one of several followers takes over."""
+        promoted = []
+        followers = [self.follow(on_promoted=promoted.append) for _ in range(3)]
+
+        self.app.release()
+        sleep(0.5)
+
+        self.assertEqual(len(promoted), 1)
+        self.assertEqual(sum(f._listening for f in followers), 1)
+
+    def test_released_follower_never_promoted(self):
+        """Test that release() stops a follower from taking over."""
+        promoted = Event()
+        follower = self.follow(on_promoted=lambda app: promoted.set())
+        follower.release()
+
+        self.app.release()
+        self.assertFalse(promoted.wait(0.3))
+
+    def test_release_during_promotion(self):
+        """Test that a release() racing with a promotion leaves the port released."""
+        promoting = Event()
+        start_host = Socket_Singleton._start_host
+
+        def slow_start_host(app):
+            promoting.set()
+            sleep(0.2)  # release() arrives while the follower is becoming the host
+            start_host(app)
+
+        follower = self.follow()
+        with mock.patch.object(Socket_Singleton, "_start_host", slow_start_host):
+            self.app.release()
+            self.assertTrue(promoting.wait(2))
+            follower.release()
+
+        self.assertFalse(follower.listening)
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", self.port))
+
+    def test_invalid_failover_interval(self):
+        """Test that failover_interval <= 0 raises ValueError."""
+        with self.assertRaises(ValueError):
+            Socket_Singleton(port=self.port, standby=True, failover_interval=0)
+
+
+class TestSpool(unittest.TestCase):
+    """Tests for spooling arguments to disk while no host is reachable."""
+
+    def setUp(self):
+        """Occupy the port with a socket that is bound but not listening."""
+        self.port = get_free_port()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.spool = os.path.join(self.tmp.name, "spool")
+        self.blocker = socket.socket()
+        self.blocker.bind(("127.0.0.1", self.port))
+        self.argv = sys.argv[:]
+
+    def tearDown(self):
+        """Clean up after each test."""
+        sys.argv[:] = self.argv
+        self.blocker.close()
+        self.tmp.cleanup()
+
+    def launch(self, *args):
+        """Launch a client in-process with the given arguments (connection is refused)."""
+        # Socket_Singleton reads the same list object as sys.argv - modify in place
+        sys.argv[1:] = args
+        with self.assertRaises(MultipleSingletonsError):
+            Socket_Singleton(port=self.port, strict=False, spool=self.spool)
+
+    def test_unreachable_host_spools_and_next_host_drains(self):
+        """Test that launches while no host is reachable are delivered by the next host."""
+        self.launch("foo", "bar")
+        self.launch("baz")
+
+        self.blocker.close()
+        host = Socket_Singleton(port=self.port, spool=self.spool)
+        try:
+            received_args = []
+            host.trace(received_args.append)
+            self.assertEqual(received_args, [("foo", "bar"), ("baz",)])
+        finally:
+            host.release()
+
+        # Dispatched entries are removed from the spool
+        self.assertEqual(_Spool(self.spool, self.port).drain(), ([], 0))
+
+    def test_undelivered_entries_stay_spooled(self):
+        """Test that a host that never dispatched its spooled entries leaves them spooled."""
+        self.launch("foo")
+        self.blocker.close()
+
+        # No observers - drained into the queue, but never dispatched
+        Socket_Singleton(port=self.port, spool=self.spool).release()
+        sleep(0.2)
+        self.assertEqual(_Spool(self.spool, self.port).drain()[0], [("foo",)])
+
+        # A journaled host removes them once they are on disk in its journal
+        journal = os.path.join(self.tmp.name, "journal")
+        Socket_Singleton(port=self.port, spool=self.spool, journal=journal).release()
+        self.assertEqual(_Spool(self.spool, self.port).drain(), ([], 0))
+
+    def test_torn_tail_is_ignored(self):
+        """Test that a partially written record (crash mid-append) is dropped."""
+        self.launch("intact")
+        with open(os.path.join(self.spool, f"{self.port}.spool"), "ab") as spool:
+            spool.write(b"\x00\x00\x00\x10\x12")
+
+        self.assertEqual(_Spool(self.spool, self.port).drain()[0], [("intact",)])
+
+
+class TestJournal(unittest.TestCase):
+    """Tests for the host journal and replay of undelivered argument sets."""
+
+    def setUp(self):
+        """Use a unique port and journal directory for each test."""
+        self.port = get_free_port()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.journal = self.tmp.name
+
+    def tearDown(self):
+        """Clean up after each test."""
+        self.tmp.cleanup()
+
+    def test_replay_redispatches_uncompleted(self):
+        """Test that entries received but never dispatched are replayed by the next host."""
+        # No observers - received, journaled, but never completed
+        with Socket_Singleton(port=self.port, journal=self.journal) as app:
+            app._append_args(("foo", "bar"))
+            app._append_args(("baz",))
+
+        received_args = []
+        with Socket_Singleton(port=self.port, journal=self.journal) as app:
+            app.trace(received_args.append)
+            self.assertEqual(app.replay(), 2)
+            self.assertEqual(app.replay(), 0)
+        self.assertEqual(received_args, [("foo", "bar"), ("baz",)])
+
+        # Replayed entries were completed - nothing left for the next host
+        with Socket_Singleton(port=self.port, journal=self.journal) as app:
+            app.trace(received_args.append)
+            self.assertEqual(app.replay(), 0)
+
+    def test_completed_segments_are_removed(self):
+        """Test that rotated segments are deleted once all their entries complete."""
+        with mock.patch("src.Socket_Singleton._JOURNAL_SEGMENT_SIZE", 256):
+            with Socket_Singleton(port=self.port, journal=self.journal) as app:
+                app.trace(lambda args: None)
+                for i in range(100):
+                    app._append_args((f"arg{i}",))
+
+                self.assertLessEqual(len(os.listdir(self.journal)), 2)
+
+
+class TestSharedMemory(unittest.TestCase):
+    """Tests for the shared-memory ring buffer transport."""
+
+    def setUp(self):
+        """Set up a host offering two small lanes."""
+        self.port = get_free_port()
+        self.app = Socket_Singleton(port=self.port, shm_lanes=2, shm_lane_size=4096)
+        self.received_args = []
+        self.app.trace(self.received_args.append)
+
+    def tearDown(self):
+        """Clean up after each test."""
+        self.app.release()
+
+    def test_many_messages_in_order(self):
+        """Test that a burst larger than the lane is delivered completely and in order."""
+        with SharedMemoryChannel(port=self.port) as channel:
+            for i in range(2000):
+                channel.send(("open", f"file{i}"))
+
+            self.assertTrue(wait_for(lambda: len(self.received_args) == 2000))
+
+        self.assertEqual(self.received_args[0], ("open", "file0"))
+        self.assertEqual(self.received_args[-1], ("open", "file1999"))
+        # The handshake counts as one client connection
+        self.assertEqual(self.app.clients, 1)
+
+    def test_lanes_are_reused(self):
+        """Test that closing a channel frees its lane for the next client."""
+        for i in range(3):
+            with SharedMemoryChannel(port=self.port) as channel:
+                with SharedMemoryChannel(port=self.port) as other:
+                    channel.send((f"a{i}",))
+                    other.send((f"b{i}",))
+                    with self.assertRaises(ConnectionError):
+                        SharedMemoryChannel(port=self.port)
+            self.assertTrue(wait_for(lambda: len(self.received_args) == 2 * (i + 1)))
+
+    def test_corrupt_entries_resync_the_lane(self):
+        """Test that a bad CRC or an out-of-bounds length doesn't stall the lane."""
+        with SharedMemoryChannel(port=self.port) as channel:
+            lane = channel._lane
+            bad_entries = [(3, 0), (10**9, zlib.crc32(b"bad"))]  # Bad CRC, bad length
+            for resyncs, (length, checksum) in enumerate(bad_entries, 1):
+                head = lane._counter(_SHM_HEAD)
+                lane._copy_in(head, _SHM_ENTRY.pack(length, checksum) + b"bad")
+                lane._set_counter(_SHM_HEAD, head + _SHM_ENTRY.size + 3)
+                channel._ring()
+                self.assertTrue(wait_for(lambda: self.app.stats["shm_resyncs"] == resyncs))
+
+            # The lane carries on past both resyncs
+            channel.send(("last",))
+            self.assertTrue(wait_for(lambda: self.received_args == [("last",)]))
+
+    def test_secret_required(self):
+        """Test that the handshake verifies the host's secret."""
+        self.app.release()
+        self.app = Socket_Singleton(port=self.port, shm_lanes=1, secret="s3cret")
+        self.app.trace(self.received_args.append)
+
+        with self.assertRaises(ConnectionError):
+            SharedMemoryChannel(port=self.port, secret="wrong")
+
+        with SharedMemoryChannel(port=self.port, secret="s3cret") as channel:
+            channel.send(("foo",))
+        self.assertTrue(wait_for(lambda: self.received_args == [("foo",)]))
+
+
+class TestConnection(unittest.TestCase):
+    """Tests for persistent, pipelined client connections."""
+
+    def setUp(self):
+        """Set up a host with an observer."""
+        self.port = get_free_port()
+        self.app = Socket_Singleton(port=self.port, secret="s3cret")
+        self.received_args = []
+        self.app.trace(self.received_args.append)
+
+    def tearDown(self):
+        """Clean up after each test."""
+        self.app.release()
+
+    def test_pipelined_sends_are_acknowledged(self):
+        """Test that flush() in ack mode returns once the host has every argument set."""
+        with Socket_Singleton.connect(port=self.port, secret="s3cret", ack=True) as connection:
+            connection.send(("first",))
+            sent = connection.send_many((f"arg{i}", "x" * 100) for i in range(5000))
+            connection.flush()
+            self.assertEqual(connection.acknowledged, sent)
+
+        self.assertEqual(len(self.received_args), 5001)
+        self.assertEqual(self.received_args[0], ("first",))
+        self.assertEqual(self.received_args[-1], ("arg4999", "x" * 100))
+        # One connection for all of them
+        self.assertEqual(self.app.clients, 1)
+
+    def test_close_delivers_buffered_sends(self):
+        """Test that closing a connection without ack mode still delivers everything."""
+        connection = Socket_Singleton.connect(port=self.port, secret="s3cret")
+        connection.send_many([("foo",), ("bar", "baz")])
+        connection.close()
+
+        self.assertTrue(wait_for(lambda: len(self.received_args) == 2))
+        self.assertEqual(self.received_args, [("foo",), ("bar", "baz")])
+
+    def test_wrong_secret_rejected(self):
+        """Test that the handshake verifies the host's secret."""
+        with self.assertRaises(ConnectionError):
+            Socket_Singleton.connect(port=self.port, secret="wrong")
+
+
+class TestMessage(unittest.TestCase):
+    """Tests for structured messages carrying cwd, pid, env and typed metadata."""
+
+    def setUp(self):
+        """Set up a host with both a message observer and a plain observer."""
+        self.port = get_free_port()
+        self.app = Socket_Singleton(port=self.port)
+        self.messages = []
+        self.received_args = []
+        self.app.trace(self.messages.append, message=True)
+        self.app.trace(self.received_args.append)
+
+    def tearDown(self):
+        """Clean up after each test."""
+        self.app.release()
+        sleep(0.2)
+
+    def test_client_process_context(self):
+        """Test that a one-shot client sends its cwd and pid along with its arguments."""
+        run_test_app(f"default {self.port} foo bar")
+
+        self.assertEqual(len(self.messages), 1)
+        message = self.messages[0]
+        self.assertEqual(message.args, ("foo", "bar"))
+        self.assertEqual(message.cwd, os.getcwd())
+        self.assertIsNotNone(message.pid)
+        self.assertNotEqual(message.pid, os.getpid())
+        # Plain observers keep receiving tuples
+        self.assertEqual(self.received_args, [("foo", "bar")])
+
+    def test_legacy_client_payload(self):
+        """Test that legacy_client sends the 2.x NUL-delimited payload, which hosts accept."""
+        argv = sys.argv[:]
+        sys.argv[1:] = ["open", "file.txt"]
+        try:
+            # A 2.x host reads the raw payload until the client closes
+            with socket.socket() as old_host:
+                old_host.bind(("127.0.0.1", 0))
+                old_host.listen()
+                with self.assertRaises(MultipleSingletonsError):
+                    Socket_Singleton(
+                        port=old_host.getsockname()[1],
+                        secret="s3cret",
+                        legacy_client=True,
+                        strict=False,
+                    )
+                connection, _ = old_host.accept()
+                with connection:
+                    payload = b"".join(iter(lambda: connection.recv(1024), b""))
+            self.assertEqual(payload, b"s3cret\x00open\x00file.txt\x00")
+
+            # Current hosts still accept it
+            with self.assertRaises(SystemExit):
+                Socket_Singleton(port=self.port, legacy_client=True)
+        finally:
+            sys.argv[:] = argv
+        self.assertTrue(wait_for(lambda: self.received_args))
+        self.assertEqual(self.received_args, [("open", "file.txt")])
+        self.assertIsNone(self.messages[0].pid)
+
+    def test_undecodable_arguments(self):
+        """Test that undecodable argv bytes are encoded, and never mistaken for a framed message."""
+        # A leading 0xFF is escaped with an empty argument, which hosts drop
+        self.assertEqual(_legacy_message(None, ["\udcffx"]), b"\x00\xffx\x00")
+        self.assertEqual(Message(Message.encode(("\udcff",))).args, ("\ufffd",))
+
+        argv = sys.argv[:]
+        sys.argv[1:] = ["\udcffopen"]
+        try:
+            with self.assertRaises(SystemExit):
+                Socket_Singleton(port=self.port, legacy_client=True)
+        finally:
+            sys.argv[:] = argv
+        self.assertTrue(wait_for(lambda: self.received_args))
+        self.assertEqual(self.received_args, [("\ufffdopen",)])
+
+    def test_env_and_typed_metadata(self):
+        """Test forwarding selected environment variables and typed metadata."""
+        metadata = {"n": -(2**40), "f": 1.5, "ok": True, "none": None, "raw": b"\x00\xff"}
+        metadata["nested"] = {"list": [1, "two", [3.0]]}
+
+        with mock.patch.dict(os.environ, {"SS_TEST_FORWARD": "yes", "SS_TEST_OTHER": "no"}):
+            connection = Socket_Singleton.connect(
+                port=self.port, ack=True, env=("SS_TEST_FORWARD",)
+            )
+        with connection:
+            connection.send(("open", "file.txt"), metadata=metadata)
+            connection.flush()
+
+        message = self.messages[0]
+        self.assertEqual(message.args, ("open", "file.txt"))
+        self.assertEqual(message.env, {"SS_TEST_FORWARD": "yes"})
+        self.assertEqual(message.metadata, metadata)
+        self.assertEqual(message.pid, os.getpid())
+
+    def test_lazy_decoding(self):
+        """Test that fields are only decoded when accessed."""
+        message = Message(Message.encode(("a", "", "b"), cwd="/tmp", pid=42, metadata={"k": 1}))
+        self.assertTrue(message)
+        self.assertIs(message._metadata, Message._UNDECODED)
+        self.assertEqual(message.args, ("a", "b"))
+        self.assertIs(message._metadata, Message._UNDECODED)
+        self.assertEqual(message.metadata, {"k": 1})
+        self.assertFalse(Message(Message.encode(())))
+
+        with self.assertRaises(ValueError):
+            Message(b"\x01\x00")
+        with self.assertRaises(TypeError):
+            Message.encode(("a",), metadata={"bad": object()})
+
+
+class TestArgumentSet(unittest.TestCase):
+    """Tests for lazily decoded argument views over received payloads."""
+
+    def test_lazy_view(self):
+        """Test that arguments decode on access and behave like a tuple."""
+        args = ArgumentSet(b"secret\x00open\x00\x00caf\xc3\xa9\x00", start=7)
+        self.assertIsNone(args._bounds)
+        self.assertEqual(args[0], "open")
+        self.assertEqual(args._cache, ["open", None])
+        self.assertEqual(args, ("open", "café"))
+        self.assertEqual(hash(args), hash(("open", "café")))
+        self.assertEqual(args[-1], "café")
+        self.assertEqual(args[:1], ("open",))
+        self.assertEqual(("x",) + args, ("x", "open", "café"))
+        self.assertIn("café", args)
+        self.assertFalse(ArgumentSet(b"\x00\x00"))
+        with self.assertRaises(IndexError):
+            args[2]
+
+    def test_frames_split_across_reads(self):
+        """Test that pipelined frames spanning receive buffers arrive intact."""
+        port = get_free_port()
+        app = Socket_Singleton(port=port)
+        received = []
+        app.trace(received.append)
+        try:
+            expected = [(str(i), "x" * (1 + i * 37 % 5000)) for i in range(300)]
+            with Socket_Singleton.connect(port=port, ack=True) as connection:
+                for args in expected:
+                    connection.send(args)
+                connection.flush()
+
+            self.assertEqual(received, expected)
+            self.assertTrue(all(isinstance(args, ArgumentSet) for args in received))
+        finally:
+            app.release()
+
+
+class TestCompression(unittest.TestCase):
+    """Tests for compressed message payloads."""
+
+    def setUp(self):
+        """Set up a host collecting arguments."""
+        self.port = get_free_port()
+        self.app = Socket_Singleton(port=self.port)
+        self.received_args = []
+        self.app.trace(self.received_args.append)
+        self.argv = sys.argv[:]
+
+    def tearDown(self):
+        """Clean up after each test."""
+        sys.argv[:] = self.argv
+        self.app.release()
+        sleep(0.2)
+
+    def test_one_shot_client_compresses(self):
+        """Test that a client above the threshold sends compressed arguments."""
+        paths = tuple(f"/home/user/projects/example/src/module_{i}.py" for i in range(200))
+        sys.argv[1:] = paths
+        with mock.patch("src.Socket_Singleton._compress", wraps=_compress) as compress:
+            with self.assertRaises(MultipleSingletonsError):
+                Socket_Singleton(port=self.port, strict=False, compression_threshold=1024)
+
+        self.assertTrue(wait_for(lambda: self.received_args))
+        self.assertEqual(self.received_args, [paths])
+        payload, flags = _compress(*compress.call_args.args)
+        self.assertEqual(flags, _FLAG_ZLIB)
+        self.assertLess(len(payload), len("".join(paths)) // 4)
+
+    def test_connection_compresses_above_threshold(self):
+        """Test that a connection compresses large messages and leaves small ones alone."""
+        large = ("open",) + tuple("x" * 100 for _ in range(500))
+        with Socket_Singleton.connect(port=self.port, ack=True, compression_threshold=512) as c:
+            self.assertTrue(c._codec)
+            c.send(("small",))
+            c.send(large)
+            c.flush()
+
+        self.assertEqual(self.received_args, [("small",), large])
+
+    def test_decompression_bomb_is_dropped(self):
+        """Test that a payload decompressing past the size limit closes the connection."""
+        bomb = zlib.compress(b"\x00" * (4 * 1024 * 1024), 9)
+        with socket.create_connection(("127.0.0.1", self.port), timeout=2) as sock:
+            sock.sendall(_frame(_FRAME_HELLO) + _frame(_FRAME_MESSAGE, bomb, _FLAG_ZLIB))
+            self.assertEqual(sock.recv(1024)[:2], b"\xff\x06")  # WELCOME only
+            self.assertEqual(sock.recv(1024), b"")
+
+        self.assertEqual(self.received_args, [])
+        self.assertTrue(self.app.listening)
+
+
+class TestAdmission(unittest.TestCase):
+    """Tests for rate-based admission control at accept time."""
+
+    def setUp(self):
+        """Set up a host admitting one connection per second with a burst of two."""
+        self.port = get_free_port()
+        self.app = Socket_Singleton(port=self.port, admission_rate=1, admission_burst=2)
+        self.received_args = []
+        self.app.trace(self.received_args.append)
+
+    def tearDown(self):
+        """Clean up after each test."""
+        self.app.release()
+        sleep(0.2)
+
+    def send(self, *args):
+        """Send one legacy message from a raw client socket."""
+        with socket.create_connection(("127.0.0.1", self.port)) as sock:
+            try:
+                sock.sendall("\x00".join(args).encode("utf-8"))
+                sock.shutdown(socket.SHUT_WR)
+                sock.recv(1)
+            except ConnectionResetError:
+                pass  # Rejected by admission control
+
+    def test_over_limit_connections_are_rejected(self):
+        """Test that a burst beyond the bucket is rejected and the bucket refills."""
+        for i in range(5):
+            self.send(str(i))
+
+        self.assertTrue(wait_for(lambda: len(self.received_args) == 2))
+        stats = self.app.stats
+        self.assertEqual((stats["accepted"], stats["rejected"]), (2, 3))
+        self.assertEqual(self.received_args, [("0",), ("1",)])
+        self.assertEqual(self.app.clients, 2)
+
+        # No permanent lockout - tokens refill at admission_rate
+        sleep(1.1)
+        self.send("later")
+        self.assertTrue(wait_for(lambda: ("later",) in self.received_args))
+
+    @unittest.skipUnless(hasattr(socket, "SO_PEERCRED"), "requires SO_PEERCRED")
+    def test_unix_peers_are_keyed_by_user(self):
+        """Test that per-peer admission gives Unix socket peers a bucket per user id."""
+        app = Socket_Singleton(port=get_free_port(), admission_rate=1, admission_per_peer=True)
+        try:
+            first, second = socket.socketpair()
+            with first, second:
+                self.assertTrue(app._admit(first, ""))
+                self.assertFalse(app._admit(first, ""))
+            self.assertEqual(list(app._admission), [("uid", os.getuid())])
+            self.assertTrue(app._admit(None, ("192.0.2.1", 1234)))
+        finally:
+            app.release()
+
+    def test_invalid_admission_parameters(self):
+        """Test that negative rates and empty bursts are rejected."""
+        with self.assertRaises(ValueError):
+            Socket_Singleton(port=get_free_port(), admission_rate=-1)
+        with self.assertRaises(ValueError):
+            Socket_Singleton(port=get_free_port(), admission_rate=5, admission_burst=0)
+
+
+class TestPull(unittest.TestCase):
+    """Tests for pulling argument sets instead of registering observers."""
+
+    def setUp(self):
+        """Set up a host without observers."""
+        self.port = get_free_port()
+        self.app = Socket_Singleton(port=self.port)
+
+    def tearDown(self):
+        """Clean up after each test."""
+        self.app.release()
+        sleep(0.2)
+
+    def test_get(self):
+        """Test get() with and without queued argument sets."""
+        with self.assertRaises(Empty):
+            self.app.get_nowait()
+        with self.assertRaises(Empty):
+            self.app.get(timeout=0.05)
+
+        run_test_app(f"default {self.port} foo bar")
+        self.assertEqual(self.app.get(timeout=2), ("foo", "bar"))
+
+        run_test_app(f"default {self.port} baz")
+        message = self.app.get(timeout=2, message=True)
+        self.assertEqual(message.args, ("baz",))
+        self.assertEqual(message.cwd, os.getcwd())
+
+    def test_messages_ends_on_release(self):
+        """Test that a worker thread iterates until the host is released."""
+        received = []
+        worker = Thread(target=lambda: received.extend(self.app.messages()))
+        worker.start()
+        self.assertTrue(wait_for(lambda: self.app._pulling))
+
+        with Socket_Singleton.connect(port=self.port, ack=True) as connection:
+            connection.send_many([("one",), ("two",)])
+            connection.flush()
+        self.assertTrue(wait_for(lambda: len(received) == 2))
+
+        self.app.release()
+        worker.join(2)
+        self.assertFalse(worker.is_alive())
+        self.assertEqual(received, [("one",), ("two",)])
+
+    def test_queue_limit_pauses_reading(self):
+        """Test that pipelined clients are not read while the queue is at queue_limit."""
+        self.app.release()
+        self.app = Socket_Singleton(port=self.port, queue_limit=10)
+        with self.assertRaises(Empty):
+            self.app.get_nowait()
+
+        with Socket_Singleton.connect(port=self.port) as connection:
+            connection.send_many((str(i),) for i in range(20))
+            connection.flush()
+            self.assertTrue(wait_for(lambda: self.app._paused))
+            queued = len(self.app.arguments)
+            self.assertGreaterEqual(queued, 10)
+
+            # Not read while paused - the frames wait in the socket buffers
+            connection.send_many((str(i),) for i in range(20, 40))
+            connection.flush()
+            sleep(0.2)
+            self.assertEqual(len(self.app.arguments), queued)
+
+            # Taking argument sets resumes reading
+            received = [self.app.get(timeout=2) for _ in range(40)]
+        self.assertEqual(received, [(str(i),) for i in range(40)])
+        self.assertGreaterEqual(self.app.stats["queue_paused"], 1)
+
+    def test_messages_async(self):
+        """Test async iteration without blocking the event loop."""
+
+        async def consume():
+            received = []
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.1, run_test_app, f"default {self.port} foo")
+            async for args in self.app.messages_async(timeout=2):
+                received.append(args)
+                break
+            return received
+
+        self.assertEqual(asyncio.run(consume()), [("foo",)])
+
+
+class TestPriority(unittest.TestCase):
+    """Tests for argument sets jumping the host queue by priority."""
+
+    def setUp(self):
+        """Set up a pull-mode host so the queue builds up."""
+        self.port = get_free_port()
+        self.app = Socket_Singleton(
+            port=self.port, priority=lambda args: 2 if args[0] == "--focus" else 0
+        )
+        with self.assertRaises(Empty):
+            self.app.get_nowait()
+
+    def tearDown(self):
+        """Clean up after each test."""
+        self.app.release()
+        sleep(0.2)
+
+    def test_priority_function_and_client_priority(self):
+        """Test that urgent argument sets are dispatched ahead of a backlog."""
+        with Socket_Singleton.connect(port=self.port, ack=True) as connection:
+            for i in range(5):
+                connection.send(("open", str(i)))
+            connection.send(("--focus",))
+            connection.send(("--quit",), priority=3)
+            connection.flush()
+
+        self.assertEqual(self.app.arguments[:3], (("--quit",), ("--focus",), ("open", "0")))
+        self.assertEqual(self.app.get_nowait(), ("--quit",))
+        self.assertEqual(self.app.get_nowait(), ("--focus",))
+        # Equal priorities stay in arrival order
+        self.assertEqual([self.app.get_nowait()[1] for _ in range(5)], list("01234"))
+
+        with self.assertRaises(ValueError):
+            Message.encode(("x",), priority=4)
+
+    def test_priority_with_traced_observer(self):
+        """Test that urgent argument sets overtake a pipelined backlog for observers too."""
+        received = []
+        app = Socket_Singleton(
+            port=get_free_port(), priority=lambda args: 3 if args[0] == "--quit" else 0
+        )
+        app.trace(received.append)
+        try:
+            with Socket_Singleton.connect(port=app.port, ack=True) as connection:
+                connection.send_many(("open", str(i)) for i in range(200))
+                connection.send(("--quit",))
+                connection.flush()
+        finally:
+            app.release()
+
+        self.assertEqual(len(received), 201)
+        self.assertEqual(received[0], ("--quit",))
+        self.assertEqual([args[1] for args in received[1:]], [str(i) for i in range(200)])
+
+
+class TestWatchdog(unittest.TestCase):
+    """Tests for slow-observer budgets and quarantine."""
+
+    def setUp(self):
+        """Set up a port for each test."""
+        self.port = get_free_port()
+        self.app = None
+
+    def tearDown(self):
+        """Clean up after each test."""
+        if self.app is not None:
+            self.app.release()
+        sleep(0.2)
+
+    def send(self, count):
+        """Send `count` argument sets over one connection and wait for the host."""
+        with Socket_Singleton.connect(port=self.port, ack=True) as connection:
+            connection.send_many((str(i),) for i in range(count))
+            connection.flush()
+
+    def test_slow_observer_is_isolated(self):
+        """Test that a repeatedly slow observer moves off the server thread."""
+        quarantined = []
+        self.app = Socket_Singleton(
+            port=self.port,
+            observer_budget=0.01,
+            quarantine="isolate",
+            quarantine_after=2,
+            on_quarantine=lambda observer, action: quarantined.append(action),
+        )
+        slow, fast = [], []
+        release_slow = Event()
+
+        def slow_observer(args):
+            if quarantined:
+                release_slow.wait(2)  # Blocks its own worker thread once isolated
+            else:
+                sleep(0.02)
+            slow.append(args)
+
+        self.app.trace(slow_observer)
+        self.app.trace(fast.append)
+        self.send(4)
+
+        # After quarantine the blocked observer no longer holds up the fast one
+        self.assertEqual(quarantined, ["isolate"])
+        self.assertEqual(len(fast), 4)
+        self.assertEqual(len(slow), 2)
+        self.assertEqual(self.app.stats["quarantined"], 1)
+        self.assertEqual(self.app.stats["slow_calls"], 2)
+
+        release_slow.set()
+        self.assertTrue(wait_for(lambda: len(slow) == 4))
+
+    def test_blocking_observer_is_left_behind(self):
+        """Test that the watchdog moves the server loop away from an observer that blocks."""
+        quarantined = []
+        self.app = Socket_Singleton(
+            port=self.port,
+            observer_budget=0.01,
+            quarantine="isolate",
+            on_quarantine=lambda observer, action: quarantined.append(action),
+        )
+        blocked, fast = [], []
+        unblock = Event()
+
+        def blocking_observer(args):
+            unblock.wait(10)  # Never returns within the test's own waits
+            blocked.append(args)
+
+        self.app.trace(blocking_observer)
+        self.app.trace(fast.append)
+        blocked_thread = self.app._thread
+        self.send(1)  # Acknowledged only once the watchdog has moved on
+        self.assertTrue(wait_for(lambda: fast == [("0",)]))
+        self.send(3)
+
+        # Quarantined on the first (blocked) call; the new server thread delivers that
+        # set to the fast observer, then the later argument sets
+        self.assertEqual(quarantined, ["isolate"])
+        self.assertNotEqual(self.app._thread, blocked_thread)
+        self.assertTrue(wait_for(lambda: len(fast) == 4))
+        self.assertEqual(fast, [("0",), ("0",), ("1",), ("2",)])
+
+        # Once unblocked, the old thread stops without calling the fast observer again,
+        # and the worker catches up
+        unblock.set()
+        self.assertTrue(wait_for(lambda: len(blocked) == 4))
+        self.assertEqual(sorted(map(tuple, blocked)), [("0",), ("0",), ("1",), ("2",)])
+        self.assertTrue(wait_for(lambda: not blocked_thread.is_alive()))
+        self.assertEqual(len(fast), 4)
+        self.assertEqual(self.app.stats["quarantined"], 1)
+
+    def test_slow_observer_is_detached(self):
+        """Test that the detach policy untraces a repeatedly slow observer."""
+        self.app = Socket_Singleton(
+            port=self.port, observer_budget=0.005, quarantine="detach", quarantine_after=1
+        )
+        calls = []
+        self.app.trace(lambda args: (calls.append(args), sleep(0.01)))
+        self.send(3)
+
+        self.assertEqual(calls, [("0",)])
+        self.assertEqual(self.app.stats["quarantined"], 1)
+
+
+class TestCache(unittest.TestCase):
+    """Tests for caching cacheable observers' results and replying with them."""
+
+    def setUp(self):
+        """Set up a port for each test."""
+        self.port = get_free_port()
+        self.app = None
+        self.calls = []
+
+    def tearDown(self):
+        """Clean up after each test."""
+        if self.app is not None:
+            self.app.release()
+        sleep(0.2)
+
+    def status(self, args):
+        """An idempotent query observer."""
+        self.calls.append(args)
+        return {"query": args[0], "open": 3}
+
+    def test_repeated_requests_are_served_from_cache(self):
+        """Test that a repeated request is answered without re-running the observer."""
+        self.app = Socket_Singleton(port=self.port, cache_size=8)
+        self.app.trace(self.status, cacheable=True)
+
+        with Socket_Singleton.connect(port=self.port) as connection:
+            first = connection.request(("--status",))
+            second = connection.request(("--status",))
+            other = connection.request(("--list-open",))
+
+        self.assertEqual(first, [{"query": "--status", "open": 3}])
+        self.assertEqual(second, first)
+        self.assertEqual(other, [{"query": "--list-open", "open": 3}])
+        self.assertEqual(self.calls, [("--status",), ("--list-open",)])
+        stats = self.app.stats
+        self.assertEqual((stats["cache_hits"], stats["cache_misses"]), (1, 2))
+
+    def test_cache_hits_reach_subscribers(self):
+        """Test that a request answered from the cache is still published and counts as activity."""
+        self.app = Socket_Singleton(port=self.port, cache_size=8)
+        self.app.trace(self.status, cacheable=True)
+
+        with Socket_Singleton.subscribe(port=self.port) as subscription:
+            with Socket_Singleton.connect(port=self.port) as connection:
+                connection.request(("--status",))
+                active = self.app._active
+                sleep(0.01)
+                connection.request(("--status",))
+
+            self.assertEqual(subscription.receive(2).args, ("--status",))
+            self.assertEqual(subscription.receive(2).args, ("--status",))
+        self.assertEqual(self.calls, [("--status",)])
+        self.assertGreater(self.app._active, active)
+
+    def test_ttl_and_lru_eviction(self):
+        """Test that expired and evicted results are recomputed."""
+        self.app = Socket_Singleton(port=self.port, cache_size=1, cache_ttl=0.2)
+        plain = []
+        self.app.trace(self.status, cacheable=True)
+        self.app.trace(plain.append)
+
+        with Socket_Singleton.connect(port=self.port, ack=True) as connection:
+            connection.send(("a",))
+            connection.send(("a",))  # Hit - plain observers still run
+            connection.send(("b",))  # Evicts ("a",)
+            connection.send(("a",))
+            connection.flush()
+            sleep(0.25)
+            self.assertEqual(connection.request(("a",)), [{"query": "a", "open": 3}])
+
+        self.assertEqual(self.calls, [("a",), ("b",), ("a",), ("a",)])
+        self.assertEqual(len(plain), 5)
+
+
+class TestSubscribe(unittest.TestCase):
+    """Tests for subscriber processes receiving the host's argument sets."""
+
+    def setUp(self):
+        """Set up a host with an observer."""
+        self.port = get_free_port()
+        self.app = Socket_Singleton(port=self.port, subscriber_buffer=64 * 1024)
+        self.received_args = []
+        self.app.trace(self.received_args.append)
+
+    def tearDown(self):
+        """Clean up after each test."""
+        self.app.release()
+        sleep(0.2)
+
+    def test_fan_out_with_routes(self):
+        """Test that subscribers receive matching argument sets alongside observers."""
+        everything = Socket_Singleton.subscribe(port=self.port)
+        opens = Socket_Singleton.subscribe(port=self.port, routes=("open",))
+        with everything, opens:
+            run_test_app(f"default {self.port} open a.txt")
+            run_test_app(f"default {self.port} --focus")
+
+            self.assertEqual(everything.receive(2).args, ("open", "a.txt"))
+            message = everything.receive(2)
+            self.assertEqual(message.args, ("--focus",))
+            self.assertIsNotNone(message.pid)
+            self.assertEqual(opens.receive(2).args, ("open", "a.txt"))
+            with self.assertRaises(TimeoutError):
+                opens.receive(0.2)
+
+        self.assertEqual(self.received_args, [("open", "a.txt"), ("--focus",)])
+
+    def test_slow_subscriber_is_dropped(self):
+        """Test that a subscriber that stops reading is disconnected, not buffered forever."""
+        with Socket_Singleton.subscribe(port=self.port) as subscription:
+            with Socket_Singleton.connect(port=self.port, ack=True) as connection:
+                connection.send_many(("open", "x" * 4096) for _ in range(4000))
+                connection.flush()
+
+            self.assertEqual(self.app.stats["subscribers_dropped"], 1)
+            self.assertEqual(len(self.received_args), 4000)
+            # Whatever was already delivered can be read; then the subscription ends
+            self.assertTrue(all(message.args[0] == "open" for message in subscription))
+
+    def test_wrong_secret_is_rejected(self):
+        """Test that subscribing requires the host's secret."""
+        app = Socket_Singleton(port=get_free_port(), secret="s3cret")
+        try:
+            with self.assertRaises(ConnectionError):
+                Socket_Singleton.subscribe(port=app.port, secret="nope")
+            Socket_Singleton.subscribe(port=app.port, secret="s3cret").close()
+        finally:
+            app.release()
+
+    def test_malformed_subscriptions_are_dropped(self):
+        """Test that the host closes malformed subscriptions and keeps serving."""
+        payloads = [
+            b"l\x00\x00\x00\x01" * 5000 + b"N",  # Nested far too deeply
+            _pack_value([None, 5]),  # Routes not iterable
+            _pack_value([None, [[1]]]),  # Unhashable route
+            _pack_value([7, None]),  # Secret not a string
+        ]
+        for payload in payloads:
+            with socket.create_connection(("127.0.0.1", self.port), 2) as sock:
+                sock.sendall(_frame(_FRAME_SUBSCRIBE, payload))
+                self.assertEqual(sock.recv(1024), b"")
+
+        self.assertTrue(self.app.listening)
+        with Socket_Singleton.connect(port=self.port, ack=True) as connection:
+            connection.send(("still", "serving"))
+            connection.flush()
+        self.assertEqual(self.received_args, [("still", "serving")])
+
+
+class TestBroker(unittest.TestCase):
+    """Tests for named singletons sharing one broker port."""
+
+    def setUp(self):
+        """Set up a broker and save argv."""
+        self.argv = sys.argv[:]
+        self.broker = SingletonBroker(port=get_free_port())
+
+    def tearDown(self):
+        """Clean up after each test."""
+        sys.argv[:] = self.argv
+        self.broker.release()
+        sleep(0.2)
+
+    def test_named_slots_route_arguments(self):
+        """Test that each name is its own singleton and clients reach the right owner."""
+        editor = Socket_Singleton(name="editor", broker=self.broker.port, strict=False)
+        viewer = Socket_Singleton(name="viewer", broker=self.broker.port, strict=False)
+        editor_args, viewer_args = [], []
+        editor.trace(editor_args.append)
+        viewer.trace(viewer_args.append)
+        try:
+            self.assertEqual(
+                SingletonBroker.list(port=self.broker.port),
+                {"editor": os.getpid(), "viewer": os.getpid()},
+            )
+            sys.argv[1:] = ["open", "a.txt"]
+            with self.assertRaises(MultipleSingletonsError):
+                Socket_Singleton(name="editor", broker=self.broker.port, strict=False)
+            self.assertTrue(wait_for(lambda: editor_args))
+            self.assertEqual(editor_args, [("open", "a.txt")])
+            self.assertEqual(viewer_args, [])
+        finally:
+            editor.release()
+            viewer.release()
+
+        # Releasing the owner frees its slot for the next claim
+        self.assertTrue(wait_for(lambda: not self.broker.slots))
+        sys.argv[1:] = []
+        app = Socket_Singleton(name="editor", broker=self.broker.port, strict=False)
+        app.release()
+
+    def test_broker_release_releases_owners(self):
+        """Test that stopping the broker stops the singletons holding its slots."""
+        app = Socket_Singleton(name="editor", broker=self.broker.port, strict=False)
+        self.broker.release()
+        self.assertTrue(wait_for(lambda: not app._listening))
+
+    def test_brokered_host_counts_clients(self):
+        """Test that routed argument sets count as clients, and thresholds are rejected."""
+        app = Socket_Singleton(name="editor", broker=self.broker.port, strict=False)
+        received = []
+        app.trace(received.append)
+        try:
+            for path in ("a.txt", "b.txt"):
+                sys.argv[1:] = ["open", path]
+                with self.assertRaises(MultipleSingletonsError):
+                    Socket_Singleton(name="editor", broker=self.broker.port, strict=False)
+            self.assertTrue(wait_for(lambda: len(received) == 2))
+            self.assertEqual(app.clients, 2)
+        finally:
+            app.release()
+
+        for threshold in ({"max_clients": 1}, {"release_threshold": 1}):
+            with self.assertRaises(ValueError):
+                Socket_Singleton(name="editor", broker=self.broker.port, **threshold)
+
+    def test_malformed_claims_are_dropped(self):
+        """Test that malformed CLAIM frames close their connection, not the broker."""
+        payloads = [
+            _pack_value([[1], None, 5]),  # Unhashable name
+            _pack_value(["editor", 7, 5]),  # Secret not a string
+            _pack_value(["editor", None, "5"]),  # pid not an integer
+            b"l\x00\x00\x00\x01" * 5000 + b"N",  # Nested far too deeply
+        ]
+        for payload in payloads:
+            with socket.create_connection(("127.0.0.1", self.broker.port), 2) as sock:
+                sock.sendall(_frame(_FRAME_CLAIM, payload))
+                self.assertEqual(sock.recv(1024), b"")
+
+        app = Socket_Singleton(name="editor", broker=self.broker.port, strict=False)
+        try:
+            self.assertTrue(app._brokered)
+            self.assertEqual(SingletonBroker.list(port=self.broker.port), {"editor": os.getpid()})
+        finally:
+            app.release()
+
+    def test_falls_back_without_broker(self):
+        """Test that an unreachable broker falls back to binding the port directly."""
+        port = get_free_port()
+        app = Socket_Singleton(port=port, name="editor", broker=get_free_port())
+        try:
+            self.assertFalse(app._brokered)
+            self.assertTrue(app._listening)
+        finally:
+            app.release()
+
+    def test_broker_requires_name(self):
+        """Test that a broker port without a name is rejected."""
+        with self.assertRaises(ValueError):
+            Socket_Singleton(broker=self.broker.port)
+
+
+class TestNamed(unittest.TestCase):
+    """Tests for name-based singletons: derived ports, discovery and identity."""
+
+    def setUp(self):
+        """Point discovery files at a temporary runtime directory and save argv."""
+        self.argv = sys.argv[:]
+        self.runtime = tempfile.TemporaryDirectory()
+        self.environ = mock.patch.dict(os.environ, {"XDG_RUNTIME_DIR": self.runtime.name})
+        self.environ.start()
+        self.name = f"named-test-{os.getpid()}-{self.id().rsplit('.', 1)[-1]}"
+
+    def tearDown(self):
+        """Clean up after each test."""
+        sys.argv[:] = self.argv
+        self.environ.stop()
+        self.runtime.cleanup()
+        sleep(0.2)
+
+    def test_derived_port_and_discovery_file(self):
+        """Test that the port comes from the name and the host records itself."""
+        port = _derive_port(self.name)
+        self.assertEqual(port, _derive_port(self.name))
+        self.assertTrue(49152 <= port <= 65535)
+
+        app = Socket_Singleton(name=self.name)
+        try:
+            self.assertEqual(app.port, port)
+            record = Socket_Singleton.discover(self.name)
+            self.assertEqual(record["port"], port)
+            self.assertEqual(record["pid"], os.getpid())
+            self.assertEqual(record["transport"], "tcp")
+        finally:
+            app.release()
+        self.assertIsNone(Socket_Singleton.discover(self.name))
+
+    def test_second_instance_reaches_host(self):
+        """Test that a second instance with the same name is a client of the host."""
+        app = Socket_Singleton(name=self.name, strict=False)
+        received = []
+        app.trace(received.append)
+        try:
+            sys.argv[1:] = ["open", "a.txt"]
+            with self.assertRaises(MultipleSingletonsError):
+                Socket_Singleton(name=self.name, strict=False)
+            self.assertTrue(wait_for(lambda: received))
+            self.assertEqual(received, [("open", "a.txt")])
+        finally:
+            app.release()
+
+    def test_discovery_record_with_reused_pid_is_verified(self):
+        """Test that a record whose pid is alive is not trusted without the handshake."""
+        port = _derive_port(self.name)
+        with socket.socket() as foreign:
+            foreign.bind(("127.0.0.1", port))
+            foreign.listen()
+            # A crashed host's record, its pid since reused by a live process
+            record = {"name": self.name, "pid": os.getpid(), "address": "127.0.0.1", "port": port}
+            with open(_discovery_path(self.name), "w", encoding="utf-8") as discovery:
+                json.dump(record, discovery)
+
+            app = Socket_Singleton(name=self.name, strict=False)
+            try:
+                self.assertTrue(app.listening)
+                self.assertEqual(app.port, port + 1)
+            finally:
+                app.release()
+
+    def test_identity_probes_are_not_clients(self):
+        """Test that identity probes don't count toward max_clients or release_threshold."""
+        app = Socket_Singleton(name=self.name, strict=False, release_threshold=3, max_clients=1)
+        received = []
+        app.trace(received.append)
+        try:
+            for _ in range(4):
+                self.assertEqual(_identify("127.0.0.1", app.port, 1)["name"], self.name)
+            sys.argv[1:] = ["open", "a.txt"]
+            with self.assertRaises(MultipleSingletonsError):
+                Socket_Singleton(name=self.name, strict=False)
+            self.assertTrue(wait_for(lambda: received))
+            self.assertEqual(received, [("open", "a.txt")])
+            self.assertEqual(app.clients, 1)
+            self.assertTrue(app.listening)
+        finally:
+            app.release()
+
+    def test_probes_past_unrelated_programs(self):
+        """Test that a port held by another program (or name) is skipped."""
+        port = _derive_port(self.name)
+        with socket.socket() as foreign:
+            foreign.bind(("127.0.0.1", port))
+            foreign.listen()
+            other = Socket_Singleton(port=port + 1, name="someone-else")
+            try:
+                app = Socket_Singleton(name=self.name)
+                try:
+                    self.assertEqual(app.port, port + 2)
+                finally:
+                    app.release()
+            finally:
+                other.release()
+
+    def test_explicit_port_held_by_another_program(self):
+        """Test that an explicit port owned by another program is not used as a host."""
+        with socket.socket() as foreign:
+            foreign.bind(("127.0.0.1", 0))
+            foreign.listen()
+            with self.assertRaises(OSError):
+                Socket_Singleton(port=foreign.getsockname()[1], name=self.name)
+
+
+class TestLockBackends(unittest.TestCase):
+    """Tests for lock backends that leave the port purely for message transport."""
+
+    def setUp(self):
+        """Point lock and discovery files at a temporary runtime directory."""
+        self.argv = sys.argv[:]
+        self.runtime = tempfile.TemporaryDirectory()
+        self.environ = mock.patch.dict(os.environ, {"XDG_RUNTIME_DIR": self.runtime.name})
+        self.environ.start()
+        self.name = f"lock-test-{os.getpid()}-{self.id().rsplit('.', 1)[-1]}"
+
+    def tearDown(self):
+        """Clean up after each test."""
+        sys.argv[:] = self.argv
+        self.environ.stop()
+        self.runtime.cleanup()
+        sleep(0.2)
+
+    def assert_exclusive(self, first, second):
+        """Check that two lock instances exclude each other until released."""
+        self.assertTrue(first.acquire())
+        self.assertFalse(second.acquire())
+        first.release()
+        self.assertTrue(second.acquire())
+        second.release()
+
+    def test_backend_must_implement_acquire_and_release(self):
+        """Test that LockBackend cannot be instantiated without acquire() and release()."""
+
+        class HalfLock(LockBackend):
+            def acquire(self):
+                return True
+
+        with self.assertRaises(TypeError):
+            LockBackend()
+        with self.assertRaises(TypeError):
+            HalfLock()
+
+    @unittest.skipIf(sys.platform == "win32", "flock is Unix only")
+    def test_file_lock(self):
+        """Test that FileLock is exclusive, even within one process."""
+        path = os.path.join(self.runtime.name, "app.lock")
+        self.assert_exclusive(FileLock(path), FileLock(path))
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "abstract sockets are Linux only")
+    def test_abstract_socket_lock(self):
+        """Test that AbstractSocketLock is exclusive."""
+        self.assert_exclusive(AbstractSocketLock(self.name), AbstractSocketLock(self.name))
+
+    @unittest.skipIf(sys.platform == "win32", "flock is Unix only")
+    def test_lock_backed_singleton(self):
+        """Test that the lock elects the host, and clients find its ephemeral port."""
+        app = Socket_Singleton(name=self.name, lock="file", strict=False)
+        received = []
+        app.trace(received.append)
+        try:
+            self.assertNotEqual(app.port, _derive_port(self.name))
+            sys.argv[1:] = ["open", "a.txt"]
+            with self.assertRaises(MultipleSingletonsError):
+                Socket_Singleton(name=self.name, lock="file", strict=False)
+            self.assertTrue(wait_for(lambda: received))
+            self.assertEqual(received, [("open", "a.txt")])
+        finally:
+            app.release()
+
+        # The lock is free again once the host has released
+        self.assertTrue(wait_for(lambda: not app._thread.is_alive()))
+        Socket_Singleton(name=self.name, lock="file").release()
+
+    @unittest.skipIf(sys.platform == "win32", "ownership checks are Unix only")
+    def test_runtime_directory_is_private(self):
+        """Test that lock files go in a per-user directory, refused if others can write to it."""
+        app = Socket_Singleton(name=self.name, lock="file", strict=False)
+        app.release()
+        directory = os.path.join(self.runtime.name, f"socket_singleton-{os.getuid()}")
+        self.assertEqual(stat.S_IMODE(os.stat(directory).st_mode), 0o700)
+        self.assertTrue(os.listdir(directory))
+
+        # A directory someone else could have planted is not trusted
+        os.chmod(directory, 0o777)
+        try:
+            with self.assertRaises(PermissionError):
+                Socket_Singleton(name=self.name, lock="file")
+        finally:
+            os.chmod(directory, 0o700)
+        with mock.patch("os.getuid", return_value=os.getuid() + 1):
+            with self.assertRaises(PermissionError):
+                _runtime_directory()
+
+    def test_invalid_lock(self):
+        """Test that unknown lock backends and unsupported combinations are rejected."""
+        with self.assertRaises(ValueError):
+            Socket_Singleton(port=get_free_port(), lock="semaphore")
+        with self.assertRaises(ValueError):
+            Socket_Singleton(name=self.name, lock="file", broker=get_free_port())
+
+
+class TestMinimalClient(unittest.TestCase):
+    """Tests for the import-light client module and the host's lazy timer."""
+
+    # Generous import-time budget for the client module, in microseconds
+    IMPORT_BUDGET = 50000
+
+    def setUp(self):
+        """Set up a host with an observer."""
+        self.src = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")
+        self.app = Socket_Singleton(port=get_free_port())
+        self.received_args = []
+        self.app.trace(self.received_args.append)
+
+    def tearDown(self):
+        """Clean up after each test."""
+        self.app.release()
+        sleep(0.2)
+
+    def test_frames_match_library(self):
+        """Test that the client module builds the same frames as the library."""
+        self.assertEqual(
+            Socket_Singleton_client._frame(_FRAME_ARGS, b"a\x00b"), _frame(_FRAME_ARGS, b"a\x00b")
+        )
+        self.assertEqual(
+            Socket_Singleton_client._frame(_FRAME_HELLO, b""), _frame(_FRAME_HELLO, b"")
+        )
+
+    def test_send_entry_point(self):
+        """Test that python -m Socket_Singleton_client send delivers arguments."""
+        command = [sys.executable, "-m", "Socket_Singleton_client", "send"]
+        result = run(
+            command + ["--port", str(self.app.port), "--", "open", "--focus"], cwd=self.src
+        )
+        self.assertEqual(result.returncode, 0)
+        self.assertTrue(wait_for(lambda: self.received_args))
+        self.assertEqual(self.received_args, [("open", "--focus")])
+
+        result = run(command + ["--port", str(get_free_port()), "--", "x"], cwd=self.src)
+        self.assertEqual(result.returncode, 1)
+
+    def test_library_send_entry_point(self):
+        """Test that python -m Socket_Singleton send is the same command."""
+        command = [sys.executable, "-m", "Socket_Singleton", "send"]
+        result = run(command + ["--port", str(self.app.port), "--", "open"], cwd=self.src)
+        self.assertEqual(result.returncode, 0)
+        self.assertTrue(wait_for(lambda: self.received_args))
+        self.assertEqual(self.received_args, [("open",)])
+
+        result = run([sys.executable, "-m", "Socket_Singleton"], cwd=self.src, stderr=PIPE)
+        self.assertEqual(result.returncode, 2)
+        self.assertIn(b"usage:", result.stderr)
+
+    def test_import_time(self):
+        """Test that the client module imports no threading and stays within budget."""
+        result = run(
+            [sys.executable, "-X", "importtime", "-c", "import Socket_Singleton_client"],
+            cwd=self.src,
+            capture_output=True,
+            text=True,
+        )
+        imports = {}
+        for line in result.stderr.splitlines():
+            if line.startswith("import time:") and "|" in line:
+                _, cumulative, module = line[len("import time:") :].split("|")
+                if cumulative.strip().isdigit():
+                    imports[module.strip()] = int(cumulative)
+
+        self.assertIn("Socket_Singleton_client", imports)
+        self.assertNotIn("threading", imports)
+        self.assertNotIn("Socket_Singleton", imports)
+        self.assertLess(imports["Socket_Singleton_client"], self.IMPORT_BUDGET)
+
+    def test_timer_is_lazy(self):
+        """Test that a host without a timeout schedules no timer."""
+        self.assertIsNone(self.app._timer)
+        app = Socket_Singleton(port=get_free_port(), timeout=60)
+        try:
+            self.assertFalse(app._timer.cancelled)
+        finally:
+            app.release()
+        self.assertTrue(app._timer.cancelled)
+
+
+class TestIdleTimeout(unittest.TestCase):
+    """Tests for the activity-based idle timeout and the shared scheduler."""
+
+    def test_scheduler_order_and_cancel(self):
+        """Test that scheduled calls run in deadline order and cancelled ones never run."""
+        scheduler = _Scheduler()
+        calls = []
+        scheduler.call_later(0.2, lambda: calls.append("late"))
+        scheduler.call_later(0.05, lambda: calls.append("early"))
+        scheduler.call_later(0.1, lambda: calls.append("cancelled")).cancel()
+        self.assertTrue(wait_for(lambda: len(calls) == 2))
+        self.assertEqual(calls, ["early", "late"])
+        # The thread exits once nothing is pending
+        self.assertTrue(wait_for(lambda: scheduler._thread is None))
+
+    def test_activity_defers_release(self):
+        """Test that clients keep an idle-timeout host alive, and silence releases it."""
+        app = Socket_Singleton(port=get_free_port(), idle_timeout=0.6)
+        app.trace(lambda args: None)
+        try:
+            for _ in range(4):
+                sleep(0.3)
+                run_test_app(f"default {app.port} ping")
+            self.assertTrue(app.listening)
+            self.assertTrue(wait_for(lambda: not app.listening, timeout=3))
+        finally:
+            app.release()
+
+    def test_instances_share_one_timer_thread(self):
+        """Test that timeouts of several instances use no per-instance Timer threads."""
+        apps = [
+            Socket_Singleton(port=get_free_port(), timeout=60, idle_timeout=30) for _ in range(3)
+        ]
+        try:
+            self.assertFalse(any(isinstance(thread, Timer) for thread in threads()))
+        finally:
+            for app in apps:
+                app.release()
+
+    def test_invalid_idle_timeout(self):
+        """Test that a negative idle timeout is rejected."""
+        with self.assertRaises(ValueError):
+            Socket_Singleton(port=get_free_port(), idle_timeout=-1)
+
+
+class TestLoopback(unittest.TestCase):
+    """In-process host/client tests over LoopbackTransport and ManualClock."""
+
+    def setUp(self):
+        """Set up a loopback transport and save argv."""
+        self.argv = sys.argv[:]
+        self.transport = LoopbackTransport()
+
+    def tearDown(self):
+        """Restore argv."""
+        sys.argv[:] = self.argv
+
+    def test_singleton_and_client_without_ports(self):
+        """Test singleton enforcement and one-shot clients over the loopback transport."""
+        app = Socket_Singleton(transport=self.transport, strict=False)
+        received = []
+        app.trace(received.append)
+        try:
+            sys.argv[1:] = ["open", "a.txt"]
+            with self.assertRaises(MultipleSingletonsError):
+                Socket_Singleton(transport=self.transport, strict=False)
+            self.assertTrue(wait_for(lambda: received))
+            self.assertEqual(received, [("open", "a.txt")])
+        finally:
+            app.release()
+
+        # Released: the loopback port can be bound again
+        Socket_Singleton(transport=self.transport).release()
+
+    def test_randomized_connections(self):
+        """Test many randomized argument streams arrive complete and in order."""
+        rng = random.Random(1337)
+        alphabet = "ab-_=/. \u00e9\u4e2d\U0001f600"
+        for _ in range(200):
+            sent = [
+                tuple(
+                    "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 12)))
+                    for _ in range(rng.randint(1, 6))
+                )
+                for _ in range(rng.randint(1, 40))
+            ]
+            app = Socket_Singleton(transport=self.transport)
+            received = []
+            app.trace(received.append)
+            try:
+                with Socket_Singleton.connect(
+                    port=app.port,
+                    ack=True,
+                    transport=self.transport,
+                    compression_threshold=rng.choice((0, 16)),
+                ) as connection:
+                    connection.send_many(sent)
+                    connection.flush()
+                self.assertTrue(wait_for(lambda: len(received) == len(sent)))
+                self.assertEqual(received, sent)
+            finally:
+                app.release()
+
+    def test_manual_clock_timeouts(self):
+        """Test that timeout and idle_timeout follow the injected clock exactly."""
+        clock = ManualClock()
+        app = Socket_Singleton(transport=self.transport, clock=clock, timeout=10)
+        clock.advance(9.9)
+        self.assertTrue(app.listening)
+        clock.advance(0.1)
+        self.assertFalse(app.listening)
+
+        app = Socket_Singleton(transport=self.transport, clock=clock, idle_timeout=5)
+        app.trace(lambda args: None)
+        try:
+            clock.advance(4)
+            with Socket_Singleton.connect(transport=self.transport, ack=True) as connection:
+                connection.send(("ping",))
+                connection.flush()
+            clock.advance(4)
+            self.assertTrue(app.listening)
+            clock.advance(1)
+            self.assertFalse(app.listening)
+        finally:
+            app.release()
+
+    def test_manual_clock_admission(self):
+        """Test that admission refills with the injected clock, not wall time."""
+        clock = ManualClock()
+        app = Socket_Singleton(
+            transport=self.transport, clock=clock, admission_rate=1, admission_burst=2
+        )
+        try:
+            for _ in range(3):
+                with self.transport.create_connection(("127.0.0.1", app.port)):
+                    pass
+            self.assertTrue(wait_for(lambda: app.stats["rejected"] == 1))
+            clock.advance(1)
+            with self.transport.create_connection(("127.0.0.1", app.port)):
+                pass
+            self.assertTrue(wait_for(lambda: app.stats["accepted"] == 3))
+            self.assertEqual(app.stats["rejected"], 1)
+        finally:
+            app.release()
+
+
+class TestLogging(unittest.TestCase):
+    """Tests for logging through the "Socket_Singleton" logger."""
+
+    class Recorder(logging.Handler):
+        """Collects records; optionally blocks until released, like a stalled pipe."""
+
+        def __init__(self, gate=None):
+            super().__init__()
+            self.records = []
+            self.gate = gate
+
+        def emit(self, record):
+            if self.gate is not None:
+                self.gate.wait(5)
+            self.records.append(record)
+
+    def setUp(self):
+        """Attach a recording handler to the root logger."""
+        self.transport = LoopbackTransport()
+        self.gate = Event()
+        self.handler = self.Recorder(self.gate)
+        logging.getLogger().addHandler(self.handler)
+
+    def tearDown(self):
+        """Detach the handler."""
+        self.gate.set()
+        logging.getLogger().removeHandler(self.handler)
+
+    def test_structured_records_reach_application_handlers(self):
+        """Test that events are logged with structured fields, without verbose."""
+        self.gate.set()
+        app = Socket_Singleton(transport=self.transport, secret="s3cret")
+        try:
+            with self.assertRaises(ConnectionError):
+                Socket_Singleton.connect(transport=self.transport, secret="nope")
+            self.assertTrue(wait_for(lambda: self.handler.records))
+            record = self.handler.records[0]
+            self.assertEqual(record.name, "Socket_Singleton")
+            self.assertEqual(record.levelno, logging.WARNING)
+            self.assertEqual(record.event, "verification_failed")
+            self.assertEqual(record.port, app.port)
+            self.assertIn("verification failed", record.getMessage())
+        finally:
+            app.release()
+
+    def test_records_propagate_normally(self):
+        """Test that the records honour assertLogs/caplog and logging.disable."""
+        self.gate.set()
+        app = Socket_Singleton(transport=self.transport)
+        app.trace(lambda args: 1 / 0)
+        try:
+            logging.disable(logging.CRITICAL)
+            try:
+                with Socket_Singleton.connect(transport=self.transport, ack=True) as connection:
+                    connection.send(("a",))
+                    connection.flush()
+            finally:
+                logging.disable(logging.NOTSET)
+            self.assertEqual(self.handler.records, [])
+
+            with self.assertLogs("Socket_Singleton", logging.WARNING) as logs:
+                with Socket_Singleton.connect(transport=self.transport, ack=True) as connection:
+                    connection.send(("b",))
+                    connection.flush()
+            self.assertEqual([record.event for record in logs.records], ["observer_error"])
+        finally:
+            app.release()
+
+    def test_slow_handler_behind_queue_handler(self):
+        """Test that a stalled handler behind a QueueHandler does not stall delivery."""
+        queue = SimpleQueue()
+        listener = QueueListener(queue, self.handler)
+        logger = logging.getLogger("Socket_Singleton")
+        queue_handler = QueueHandler(queue)
+        logger.addHandler(queue_handler)
+        logger.propagate = False
+        listener.start()
+
+        app = Socket_Singleton(transport=self.transport)
+        received = []
+
+        def failing(args):
+            received.append(args)
+            raise ValueError("boom")
+
+        app.trace(failing)
+        try:
+            with Socket_Singleton.connect(transport=self.transport) as connection:
+                connection.send_many([("a",), ("b",), ("c",)])
+            # The handler is still blocked on the first record
+            self.assertTrue(wait_for(lambda: len(received) == 3))
+            self.assertEqual(self.handler.records, [])
+            self.gate.set()
+            self.assertTrue(wait_for(lambda: len(self.handler.records) == 3))
+            self.assertTrue(all(r.event == "observer_error" for r in self.handler.records))
+        finally:
+            app.release()
+            listener.stop()
+            logger.removeHandler(queue_handler)
+            logger.propagate = True
+
+    def test_rate_limit(self):
+        """Test that floods of one event type are suppressed and counted."""
+        limit = _LogRateLimit(burst=3, window=0.2)
+        self.assertEqual([limit.admit("flood") for _ in range(5)], [0, 0, 0, None, None])
+        self.assertEqual(limit.admit("other"), 0)
+        sleep(0.25)
+        self.assertEqual(limit.admit("flood"), 2)
+
+
+class TestWeakObservers(unittest.TestCase):
+    """Tests for observers traced with weak=True."""
+
+    class Window:
+        """A short-lived object subscribing one of its methods."""
+
+        def __init__(self):
+            self.received = []
+            self.widgets = [bytearray(64) for _ in range(4)]
+
+        def on_args(self, args):
+            self.received.append(args)
+
+    def setUp(self):
+        """Set up a loopback host and save argv."""
+        self.argv = sys.argv[:]
+        self.transport = LoopbackTransport()
+        self.app = Socket_Singleton(transport=self.transport, strict=False)
+
+    def tearDown(self):
+        """Release the host and restore argv."""
+        self.app.release()
+        sys.argv[:] = self.argv
+
+    def send(self, *args):
+        """Send one argument set from a client over the loopback transport."""
+        sys.argv[1:] = list(args)
+        with self.assertRaises(MultipleSingletonsError):
+            Socket_Singleton(transport=self.transport, strict=False)
+
+    def test_weak_observer_does_not_keep_object_alive(self):
+        """Test that a discarded object's observer is unregistered and not called."""
+        kept, dropped = self.Window(), self.Window()
+        self.app.trace(kept.on_args, weak=True)
+        self.app.trace(dropped.on_args, weak=True)
+        self.assertEqual(len(self.app._observers), 2)
+
+        dropped_ref = weakref.ref(dropped)
+        del dropped
+        self.assertIsNone(dropped_ref())
+        self.assertEqual(len(self.app._observers), 1)
+
+        self.send("open", "a.txt")
+        self.assertTrue(wait_for(lambda: kept.received))
+        self.assertEqual(kept.received, [("open", "a.txt")])
+
+    def test_dead_observer_is_pruned_during_dispatch(self):
+        """Test that dispatch drops an entry whose referent is already gone."""
+        received = []
+
+        def observer(args):
+            received.append(args)
+
+        self.app.trace(observer, weak=True)
+        key = next(iter(self.app._observers))
+        # Simulate a referent collected before its callback ran
+        with mock.patch.object(self.app, "_observers", {lambda: None: self.app._observers[key]}):
+            self.send("late")
+            self.assertTrue(wait_for(lambda: not self.app._observers))
+        self.assertEqual(received, [])
+
+    def test_unusable_weak_reference_is_rejected(self):
+        """Test that weak=True raises TypeError rather than dropping the observer at once."""
+        received = []
+        with self.assertRaises(TypeError):
+            self.app.trace(received.append, weak=True)
+        with self.assertRaises(TypeError):
+            self.app.trace(object().__str__, weak=True)
+        self.assertEqual(len(self.app._observers), 0)
+
+    def test_untrace_weak_observer(self):
+        """Test that untrace() finds observers traced with weak=True."""
+        window = self.Window()
+        self.app.trace(window.on_args, weak=True)
+        self.app.untrace(window.on_args)
+        self.assertEqual(self.app._observers, {})
+
+    def test_steady_state_memory(self):
+        """Test that 100k discarded subscribers leave neither entries nor memory behind."""
+        keeper = self.Window()
+        self.app.trace(keeper.on_args, weak=True)
+
+        def churn(count):
+            for _ in range(count):
+                window = self.Window()
+                self.app.trace(window.on_args, weak=True)
+                del window
+
+        tracemalloc.start()
+        try:
+            churn(10_000)  # Warm up allocator pools and dict sizes
+            gc.collect()
+            baseline = tracemalloc.get_traced_memory()[0]
+            churn(100_000)
+            gc.collect()
+            growth = tracemalloc.get_traced_memory()[0] - baseline
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(len(self.app._observers), 1)
+        self.assertLess(growth, 64 * 1024)
+
+        self.send("still", "alive")
+        self.assertTrue(wait_for(lambda: keeper.received))
+        self.assertEqual(keeper.received, [("still", "alive")])
+
+
+class TestSoak(unittest.TestCase):
+    """
+    Long-run memory tests: per-connection state must not accumulate in the host.
+
+    The connection count defaults to a quick run; set SOAK_CONNECTIONS (e.g. to
+    3000000) for a full soak.
+    """
+
+    CONNECTIONS = int(os.environ.get("SOAK_CONNECTIONS", 50_000))
+    WARMUP = 5_000
+    SAMPLES = 10
+    # Allowed growth from the first sample after warm-up
+    TRACED_BOUND = 256 * 1024
+    RSS_BOUND = 8 * 1024 * 1024
+
+    def setUp(self):
+        """Start a loopback host that counts what it receives."""
+        self.transport = LoopbackTransport()
+        self.app = Socket_Singleton(transport=self.transport, strict=False)
+        self.received = 0
+        self.app.trace(self.count)
+
+    def tearDown(self):
+        """Release the host."""
+        self.app.release()
+
+    def count(self, args):
+        """Observer: count argument sets."""
+        self.received += 1
+
+    @staticmethod
+    def rss():
+        """Resident set size in bytes, or None where /proc is unavailable."""
+        try:
+            with open("/proc/self/statm") as statm:
+                return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError):
+            return None
+
+    def drive(self, connections):
+        """Send one argument set per new client connection, keeping the host in step."""
+        address = (self.app.address, self.app.port)
+        data = _frame(_FRAME_HELLO, b"") + _frame(_FRAME_ARGS, b"open\x00a.txt")
+        target = self.received + connections
+        for sent in range(target - connections + 1, target + 1):
+            with self.transport.create_connection(address) as sock:
+                sock.sendall(data)
+            if sent % 500 == 0:
+                # Bound the in-flight socket pairs (and file descriptors)
+                self.assertTrue(wait_for(lambda: self.received >= sent - 250, timeout=10))
+        self.assertTrue(wait_for(lambda: self.received == target, timeout=10))
+
+    def test_host_has_no_instance_dict(self):
+        """Test that hosts and client connections use __slots__ layouts."""
+        self.assertFalse(hasattr(self.app, "__dict__"))
+        with Socket_Singleton.connect(port=self.app.port, transport=self.transport) as connection:
+            self.assertFalse(hasattr(connection, "__dict__"))
+
+    def test_memory_is_steady_across_connections(self):
+        """Test that traced memory and RSS stay bounded over many connections."""
+        self.drive(self.WARMUP)
+        gc.collect()
+        tracemalloc.start()
+        try:
+            traced, rss = [], []
+            for _ in range(self.SAMPLES):
+                self.drive(self.CONNECTIONS // self.SAMPLES)
+                gc.collect()
+                traced.append(tracemalloc.get_traced_memory()[0])
+                rss.append(self.rss())
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(self.app.stats["accepted"], self.received)
+        self.assertEqual(len(self.app._peers), 0)
+        self.assertLess(max(traced) - traced[0], self.TRACED_BOUND, traced)
+        if rss[0] is not None:
+            self.assertLess(max(rss) - rss[0], self.RSS_BOUND, rss)
+
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "requires Unix domain sockets")
+class TestEndpoints(unittest.TestCase):
+    """Tests for one host listening on several endpoints."""
+
+    def setUp(self):
+        """Set up ports, a Unix socket path and an observer."""
+        self.argv = sys.argv[:]
+        self.port = get_free_port()
+        self.extra_port = get_free_port()
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "app.sock")
+        self.endpoints = [self.path, ("127.0.0.1", self.extra_port)]
+        self.app = None
+        self.received = []
+
+    def tearDown(self):
+        """Clean up after each test."""
+        sys.argv[:] = self.argv
+        if self.app is not None:
+            self.app.release()
+        self.directory.cleanup()
+        sleep(0.2)
+
+    def start(self, endpoints=None):
+        """Start the host with the given (default: all test) endpoints."""
+        endpoints = self.endpoints if endpoints is None else endpoints
+        self.app = Socket_Singleton(port=self.port, endpoints=endpoints, strict=False)
+        self.app.trace(self.received.append)
+
+    def test_every_endpoint_feeds_the_same_observers(self):
+        """Test that argument sets arrive through the primary and every extra endpoint."""
+        self.start()
+        with Socket_Singleton.connect(port=self.port) as connection:
+            connection.send(("primary",))
+        with Socket_Singleton.connect(port=self.extra_port) as connection:
+            connection.send(("tcp",))
+        with socket.socket(socket.AF_UNIX) as sock:
+            sock.connect(self.path)
+            sock.sendall(_frame(_FRAME_HELLO, b"") + _frame(_FRAME_ARGS, b"unix"))
+
+        self.assertTrue(wait_for(lambda: len(self.received) == 3))
+        self.assertEqual(sorted(map(tuple, self.received)), [("primary",), ("tcp",), ("unix",)])
+
+    def test_clients_pick_the_cheapest_endpoint(self):
+        """Test that clients prefer the Unix socket and fall back to TCP."""
+        self.start()
+        reversed_endpoints = self.endpoints[::-1]
+        with Socket_Singleton.connect(port=self.port, endpoints=reversed_endpoints) as connection:
+            self.assertEqual(connection._sock.family, socket.AF_UNIX)
+            connection.send(("fast",))
+
+        missing = os.path.join(self.directory.name, "missing.sock")
+        with Socket_Singleton.connect(port=self.port, endpoints=[missing]) as connection:
+            self.assertEqual(connection._sock.family, socket.AF_INET)
+            connection.send(("fallback",))
+
+        sys.argv[1:] = ["one-shot"]
+        with self.assertRaises(MultipleSingletonsError):
+            Socket_Singleton(port=self.port, endpoints=self.endpoints, strict=False)
+
+        self.assertTrue(wait_for(lambda: len(self.received) == 3))
+        self.assertEqual(
+            sorted(map(tuple, self.received)), [("fallback",), ("fast",), ("one-shot",)]
+        )
+
+    def test_primary_endpoint_is_the_lock(self):
+        """Test that a second host is a client, and release frees every endpoint."""
+        with socket.socket(socket.AF_UNIX) as stale:
+            stale.bind(self.path)  # Socket file left behind by a crashed host
+        self.start()
+        with self.assertRaises(MultipleSingletonsError):
+            Socket_Singleton(port=self.port, endpoints=self.endpoints, strict=False)
+
+        self.app.release()
+        self.app = None
+        self.assertFalse(os.path.exists(self.path))
+        with self.assertRaises(OSError):
+            socket.create_connection(("127.0.0.1", self.extra_port), 1).close()
+
+    def test_ipv6_endpoint(self):
+        """Test listening on an IPv6 loopback endpoint."""
+        if not socket.has_ipv6:
+            self.skipTest("IPv6 is not available")
+        try:
+            with socket.socket(socket.AF_INET6) as probe:
+                probe.bind(("::1", 0))
+        except OSError:
+            self.skipTest("IPv6 loopback is not available")
+
+        self.start([("::1", self.extra_port)])
+        with Socket_Singleton.connect(address="::1", port=self.extra_port) as connection:
+            self.assertEqual(connection._sock.family, socket.AF_INET6)
+            connection.send(("v6",))
+        self.assertTrue(wait_for(lambda: self.received))
+        self.assertEqual(self.received, [("v6",)])
+
+    def test_unix_endpoint_must_be_a_socket(self):
+        """Test that a regular file at a Unix endpoint path is left alone and skipped."""
+        with open(self.path, "w") as notes:
+            notes.write("keep me")
+        self.start()
+        self.assertEqual([endpoint for _, endpoint in self.app._listeners], self.endpoints[1:])
+        self.app.release()
+        with open(self.path) as notes:
+            self.assertEqual(notes.read(), "keep me")
+
+    def test_endpoint_validation(self):
+        """Test that malformed or unsupported endpoint combinations are rejected."""
+        with self.assertRaises(ValueError):
+            Socket_Singleton(port=self.port, endpoints=[("127.0.0.1",)])
+        with self.assertRaises(ValueError):
+            Socket_Singleton(port=self.port, endpoints=[("127.0.0.1", 0)])
+        with self.assertRaises(ValueError):
+            Socket_Singleton(endpoints=[self.path], transport=LoopbackTransport())
+
+
 if __name__ == "__main__":
     unittest.main()